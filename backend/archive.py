@@ -0,0 +1,419 @@
+"""Архив прошедших месяцев: неизменяемые двоичные сегменты, читаемые через mmap.
+
+Прошлые смены не редактируются, поэтому ShiftStore переносит месяцы
+старше MYSHIFT_ARCHIVE_DAYS в каталог <файл смен>.archive/, по файлу
+<YYYY-MM>.seg на месяц, а в JSON файле остаётся только рабочее окно.
+
+Сегмент (все числа little-endian):
+    заголовок    MAGIC, версия, дней в месяце, ordinal первого дня,
+                 число записей, число строк
+    индекс дней  (дней + 1) x uint32: номер первой записи каждого дня
+    индекс ID    записи x uint32: номера записей по возрастанию ID
+    записи       RECORD фиксированной ширины, по (день, ID)
+    строки       (строк + 1) x uint32 смещений и UTF-8 данные: имена,
+                 роли и дополнительные поля смен (JSON)
+
+Записи читаются из mmap массивом NumPy без копирования: выборка за
+период открывает только сегменты своих месяцев и берёт из них срез по
+индексу дней. Сегмент не меняется на месте: если в уже архивный месяц
+попадут новые смены, сегмент собирается заново и подменяется rename.
+"""
+import mmap
+import os
+import struct
+import tempfile
+import threading
+from array import array
+from datetime import date as date_type
+from typing import List, Dict, Any, Iterable, Optional, Tuple
+
+import numpy as np
+
+import codec
+import metrics
+from shift_records import ShiftRecord, ShiftColumns, MISSING, employees, roles
+
+MAGIC = b"MSAR"
+VERSION = 1
+HEADER = struct.Struct("<4sHHiII")
+RECORD = np.dtype([
+    ("id", "<i8"), ("day", "<i4"), ("start", "<i2"), ("end", "<i2"),
+    ("employee", "<i4"), ("role", "<i4"), ("version", "<i4"), ("extra", "<i4"),
+])
+SUFFIX = ".seg"
+
+
+class ArchivedShift(Exception):
+    """Смена в архиве: архивные месяцы только читаются"""
+
+    def __init__(self, shift_id):
+        super().__init__(f"Shift {shift_id} is archived")
+        self.shift_id = shift_id
+
+
+def month_key(day: int) -> str:
+    return date_type.fromordinal(day).strftime("%Y-%m")
+
+
+def month_bounds(month: str) -> Tuple[int, int]:
+    """Ordinal первого дня месяца и первого дня следующего"""
+    first = date_type.fromisoformat(month + "-01")
+    following = date_type(first.year + first.month // 12, first.month % 12 + 1, 1)
+    return first.toordinal(), following.toordinal()
+
+
+def archivable(record: ShiftRecord) -> bool:
+    """В сегмент попадают смены с целым ID и датой YYYY-MM-DD"""
+    return isinstance(record.id, int) and not isinstance(record.id, bool) and record.day is not None
+
+
+# ЗАПИСЬ
+
+def encode_segment(records: List[ShiftRecord], first_day: int, days: int) -> bytes:
+    """Сегмент для дней [first_day, first_day + days): записи должны быть archivable"""
+    next_day = first_day + days
+    records = sorted(records, key=lambda r: (r.day, r.id))
+
+    strings: List[str] = []
+    string_ids: Dict[str, int] = {}
+
+    def intern(value: Optional[str]) -> int:
+        if value is None:
+            return MISSING
+        found = string_ids.get(value)
+        if found is None:
+            found = string_ids[value] = len(strings)
+            strings.append(value)
+        return found
+
+    rows = []
+    for r in records:
+        if not first_day <= r.day < next_day:
+            raise ValueError(f"Shift {r.id} is outside of the segment days")
+        rows.append((
+            r.id, r.day,
+            MISSING if r.start is None else r.start,
+            MISSING if r.end is None else r.end,
+            intern(employees.value(r.employee)) if r.employee is not None else MISSING,
+            intern(roles.value(r.role)) if r.role is not None else MISSING,
+            MISSING if r.version is None else r.version,
+            intern(codec.dumps(r.extra).decode("utf-8")) if r.extra else MISSING,
+        ))
+    table = np.array(rows, dtype=RECORD)
+
+    day_index = np.searchsorted(table["day"], np.arange(first_day, next_day + 1)).astype("<u4")
+    id_index = np.argsort(table["id"], kind="stable").astype("<u4")
+    encoded = [value.encode("utf-8") for value in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype="<u4")
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    return b"".join([
+        HEADER.pack(MAGIC, VERSION, days, first_day, len(records), len(strings)),
+        day_index.tobytes(), id_index.tobytes(), table.tobytes(), offsets.tobytes(),
+    ] + encoded)
+
+
+def write_segment(path: str, month: str, records: List[ShiftRecord]) -> None:
+    """Атомарно записывает сегмент месяца (временный файл + rename)"""
+    first_day, next_day = month_bounds(month)
+    for r in records:
+        if not first_day <= r.day < next_day:
+            raise ValueError(f"Shift {r.id} does not belong to {month}")
+    data = encode_segment(records, first_day, next_day - first_day)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".segment-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    metrics.count_bytes("write", len(data))
+
+
+# ЧТЕНИЕ
+
+class Segment:
+    """Сегмент поверх буфера: mmap файла (open) или общей памяти (snapshot.py)"""
+
+    def __init__(self, buffer, offset: int = 0):
+        self.path: Optional[str] = None
+        self.signature = None
+        self._mmap = buffer
+        magic, version, days, self.first_day, count, string_count = HEADER.unpack_from(buffer, offset)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Buffer does not hold a shift segment")
+        self.days = days
+        offset += HEADER.size
+        self.day_index = np.frombuffer(self._mmap, dtype="<u4", count=days + 1, offset=offset)
+        offset += self.day_index.nbytes
+        self.id_index = np.frombuffer(self._mmap, dtype="<u4", count=count, offset=offset)
+        offset += self.id_index.nbytes
+        self.records = np.frombuffer(self._mmap, dtype=RECORD, count=count, offset=offset)
+        offset += self.records.nbytes
+        self._string_offsets = np.frombuffer(self._mmap, dtype="<u4", count=string_count + 1, offset=offset)
+        self._strings_start = offset + self._string_offsets.nbytes
+        self._strings: Dict[int, str] = {}
+        self._extras: Dict[int, Dict[str, Any]] = {}
+        self._sorted_ids: Optional[np.ndarray] = None
+
+    @classmethod
+    def open(cls, path: str) -> "Segment":
+        with open(path, "rb") as f:
+            st = os.fstat(f.fileno())
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if st.st_size else b""
+        segment = cls(buffer)
+        segment.path = path
+        segment.signature = (st.st_ino, st.st_mtime_ns, st.st_size)
+        return segment
+
+    def __len__(self):
+        return len(self.records)
+
+    def string(self, index: int) -> str:
+        value = self._strings.get(index)
+        if value is None:
+            start = self._strings_start + int(self._string_offsets[index])
+            end = self._strings_start + int(self._string_offsets[index + 1])
+            value = self._strings[index] = bytes(self._mmap[start:end]).decode("utf-8")
+        return value
+
+    def _extra(self, index: int) -> Optional[Dict[str, Any]]:
+        if index == MISSING:
+            return None
+        value = self._extras.get(index)
+        if value is None:
+            # Один объект на сегмент для одинаковых наборов полей, как в ShiftRecord
+            value = self._extras[index] = codec.loads(self.string(index))
+        return value
+
+    def _global_ids(self, column: np.ndarray, table) -> np.ndarray:
+        """Номера строк сегмента -> номера в общей таблице строк процесса"""
+        result = np.full(len(column), MISSING, dtype=np.int64)
+        present = column != MISSING
+        if present.any():
+            values, inverse = np.unique(column[present], return_inverse=True)
+            lookup = np.array([table.id(self.string(int(v))) for v in values], dtype=np.int64)
+            result[present] = lookup[inverse]
+        return result
+
+    def span(self, lo_day: Optional[int], hi_day: Optional[int]) -> Tuple[int, int]:
+        """Номера записей [начало, конец) для дней периода"""
+        lo = 0 if lo_day is None else min(max(lo_day - self.first_day, 0), self.days)
+        hi = self.days if hi_day is None else min(max(hi_day - self.first_day + 1, 0), self.days)
+        if lo >= hi:
+            return 0, 0
+        return int(self.day_index[lo]), int(self.day_index[hi])
+
+    def to_records(self, rows: np.ndarray) -> List[ShiftRecord]:
+        staff = self._global_ids(rows["employee"], employees).tolist()
+        role_ids = self._global_ids(rows["role"], roles).tolist()
+        result = []
+        for (shift_id, day, start, end, _, _, version, extra), employee, role in zip(
+                rows.tolist(), staff, role_ids):
+            result.append(ShiftRecord(
+                shift_id, day,
+                None if start == MISSING else start,
+                None if end == MISSING else end,
+                None if employee == MISSING else employee,
+                None if role == MISSING else role,
+                None if version == MISSING else version,
+                self._extra(extra),
+            ))
+        return result
+
+    def columns(self, lo: int, hi: int) -> ShiftColumns:
+        rows = self.records[lo:hi]
+
+        def column(values):
+            return array("i", np.ascontiguousarray(values, dtype=np.intc).tobytes())
+
+        return ShiftColumns(
+            column(rows["day"]), column(rows["start"]), column(rows["end"]),
+            column(self._global_ids(rows["employee"], employees)),
+            column(self._global_ids(rows["role"], roles)),
+        )
+
+    def sorted_ids(self) -> np.ndarray:
+        if self._sorted_ids is None:
+            self._sorted_ids = self.records["id"][self.id_index]
+        return self._sorted_ids
+
+    def find(self, shift_id: int) -> Optional[int]:
+        """Номер записи со сменой shift_id"""
+        ids = self.sorted_ids()
+        position = int(np.searchsorted(ids, shift_id))
+        if position < len(ids) and ids[position] == shift_id:
+            return int(self.id_index[position])
+        return None
+
+    def ids_after(self, after_id: Optional[int], limit: int) -> List[Tuple[int, int]]:
+        """До limit пар (ID, номер записи) с ID больше after_id"""
+        ids = self.sorted_ids()
+        start = 0 if after_id is None else int(np.searchsorted(ids, after_id, side="right"))
+        stop = min(start + limit, len(ids))
+        return list(zip(ids[start:stop].tolist(), self.id_index[start:stop].tolist()))
+
+
+class SegmentSet:
+    """Выборки по набору сегментов; набор задаёт _overlapping"""
+
+    def _overlapping(self, lo_day: Optional[int], hi_day: Optional[int]) -> List[Segment]:
+        raise NotImplementedError
+
+    def records(self, lo_day: Optional[int] = None, hi_day: Optional[int] = None) -> List[ShiftRecord]:
+        """Смены периода по (день, ID); открываются только нужные сегменты"""
+        result: List[ShiftRecord] = []
+        for segment in self._overlapping(lo_day, hi_day):
+            lo, hi = segment.span(lo_day, hi_day)
+            if hi > lo:
+                with metrics.phase("storage_read"):
+                    result.extend(segment.to_records(segment.records[lo:hi]))
+        return result
+
+    def columns(self, lo_day: Optional[int] = None, hi_day: Optional[int] = None) -> ShiftColumns:
+        result = ShiftColumns()
+        for segment in self._overlapping(lo_day, hi_day):
+            lo, hi = segment.span(lo_day, hi_day)
+            if hi > lo:
+                result.extend(segment.columns(lo, hi))
+        return result
+
+    def get(self, shift_id) -> Optional[ShiftRecord]:
+        if not isinstance(shift_id, int):
+            return None
+        for segment in self._overlapping(None, None):
+            position = segment.find(shift_id)
+            if position is not None:
+                return segment.to_records(segment.records[position:position + 1])[0]
+        return None
+
+    def records_after(self, after_id: Optional[int], limit: int) -> List[ShiftRecord]:
+        """До limit смен с ID больше after_id, по возрастанию ID"""
+        candidates = []
+        for segment in self._overlapping(None, None):
+            candidates.extend((shift_id, position, segment) for shift_id, position in
+                              segment.ids_after(after_id, limit))
+        candidates.sort(key=lambda item: item[0])
+        return [segment.to_records(segment.records[position:position + 1])[0]
+                for _, position, segment in candidates[:limit]]
+
+    def count(self) -> int:
+        return sum(len(segment) for segment in self._overlapping(None, None))
+
+
+class Archive(SegmentSet):
+    """Сегменты одного хранилища смен, по месяцам.
+
+    Список файлов перечитывается в refresh() (ShiftStore вызывает его при
+    перезагрузке JSON файла); изменённый другим процессом сегмент
+    открывается заново.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._segments: Dict[str, Segment] = {}
+        # month -> (ordinal первого дня, ordinal первого дня следующего месяца)
+        self._months: Dict[str, Tuple[int, int]] = {}
+        self.refresh()
+
+    def _path(self, month: str) -> str:
+        return os.path.join(self.directory, month + SUFFIX)
+
+    def refresh(self) -> None:
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            names = []
+        months = {}
+        for name in names:
+            if name.endswith(SUFFIX):
+                try:
+                    months[name[:-len(SUFFIX)]] = month_bounds(name[:-len(SUFFIX)])
+                except ValueError:
+                    continue
+        with self._lock:
+            self._months = months
+            for month in list(self._segments):
+                segment = self._segments[month]
+                if month not in months or self._signature(month) != segment.signature:
+                    del self._segments[month]
+
+    def _signature(self, month: str):
+        try:
+            st = os.stat(self._path(month))
+        except OSError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def months(self) -> List[str]:
+        with self._lock:
+            return sorted(self._months)
+
+    def has_day(self, day: int) -> bool:
+        with self._lock:
+            bounds = self._months.get(month_key(day))
+        return bounds is not None
+
+    def last_day(self) -> Optional[int]:
+        """Последний день последнего архивного месяца"""
+        with self._lock:
+            return max((bounds[1] - 1 for bounds in self._months.values()), default=None)
+
+    def segment(self, month: str) -> Optional[Segment]:
+        with self._lock:
+            segment = self._segments.get(month)
+            if segment is not None or month not in self._months:
+                return segment
+        with metrics.phase("storage_read"):
+            try:
+                segment = Segment.open(self._path(month))
+            except (OSError, ValueError, struct.error):
+                return None
+        with self._lock:
+            return self._segments.setdefault(month, segment)
+
+    def _overlapping(self, lo_day: Optional[int], hi_day: Optional[int]) -> List[Segment]:
+        """Сегменты месяцев, пересекающихся с периодом, по возрастанию"""
+        with self._lock:
+            months = sorted(
+                month for month, (first, following) in self._months.items()
+                if (lo_day is None or following > lo_day) and (hi_day is None or first <= hi_day)
+            )
+        return [segment for segment in map(self.segment, months) if segment is not None]
+
+    # ИЗМЕНЕНИЕ
+
+    def add(self, records: Iterable[ShiftRecord]) -> List[str]:
+        """Переносит записи в сегменты их месяцев; возвращает затронутые месяцы.
+
+        Уже существующий сегмент месяца собирается заново вместе с новыми
+        записями (запись с тем же ID заменяет архивную).
+        """
+        by_month: Dict[str, List[ShiftRecord]] = {}
+        for record in records:
+            by_month.setdefault(month_key(record.day), []).append(record)
+        for month, fresh in sorted(by_month.items()):
+            existing = self.segment(month)
+            if existing is not None:
+                ids = {record.id for record in fresh}
+                kept = [r for r in existing.to_records(existing.records) if r.id not in ids]
+                fresh = kept + fresh
+            write_segment(self._path(month), month, fresh)
+        self.refresh()
+        return sorted(by_month)
+
+    def clear(self) -> None:
+        """Удаляет все сегменты (для replace_all)"""
+        for month in self.months():
+            try:
+                os.unlink(self._path(month))
+            except OSError:
+                pass
+        self.refresh()
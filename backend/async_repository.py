@@ -0,0 +1,252 @@
+"""Асинхронный доступ к сменам для FastAPI приложения (main.py).
+
+Обработчики main.py работают в цикле asyncio, а ShiftStore блокирует:
+stat файла, перечитывание, запись с fsync, ожидание блокировки. Здесь
+чтения обслуживаются из собственного снимка в памяти, который
+обновляется событиями хранилища, а проверка файла на чужие изменения
+выполняется в потоке не чаще раза в FRESHNESS секунд и одна на всех
+ожидающих. Одинаковые одновременные чтения получают один результат.
+
+Записи идут через одну задачу-писателя: всё, что накопилось в очереди,
+выполняется одной транзакцией в потоке и сохраняется одной записью
+с fsync, поэтому цикл не ждёт диск, а частые записи не множат fsync.
+
+SharedShiftStore (snapshot.py, несколько воркеров) сам читает из общей
+памяти, поэтому для него снимок не строится и чтения идут в хранилище.
+"""
+import asyncio
+import bisect
+import time
+from typing import List, Dict, Any, Callable, Optional, Tuple
+
+import metrics
+
+# Как долго снимок считается свежим без проверки файла, сек
+FRESHNESS = 0.5
+# Сколько операций писатель объединяет в одну запись
+MAX_WRITE_BATCH = 256
+
+
+def _copy(result):
+    if isinstance(result, list):
+        return [dict(shift) for shift in result]
+    return dict(result) if result is not None else None
+
+
+class AsyncShiftRepository:
+    def __init__(self, store):
+        self.store = store
+        self._shared = getattr(store, "shared", False)
+        self._by_id: Dict[int, Dict[str, Any]] = {}
+        self._by_date: Dict[str, Dict[int, Dict[str, Any]]] = {}
+        self._dates: List[str] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._writes: Optional[asyncio.Queue] = None
+        self._writer: Optional[asyncio.Task] = None
+        self._inflight: Dict[Tuple, asyncio.Future] = {}
+        self._checked_at = 0.0
+        # Выставляется из любого потока, когда хранилище перечитало файл
+        self._reload_needed = True
+        # События, пришедшие пока поток читал смены для перестройки снимка
+        self._replay: Optional[List[Tuple[Any, Any]]] = None
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._writes = asyncio.Queue()
+        if not self._shared:
+            self.store.add_listener(self._on_change)
+            await self._refresh()
+        self._writer = self._loop.create_task(self._write_loop())
+
+    async def stop(self):
+        if self._writer is not None:
+            self._writer.cancel()
+            self._writer = None
+
+    # СНИМОК
+
+    def _on_change(self, kind, old, new):
+        if kind == "reload":
+            self._reload_needed = True
+        elif self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._apply, old, new)
+
+    def _apply(self, old, new):
+        if self._replay is not None:
+            self._replay.append((old, new))
+        if new is not None:
+            current = self._by_id.get(new["id"])
+            # Событие могло устареть, если снимок уже перестроен по файлу
+            if current is not None and current.get("version", 1) > new.get("version", 1):
+                return
+            self._put(new)
+        elif old is not None:
+            self._remove(old["id"])
+
+    def _put(self, shift):
+        self._remove(shift["id"])
+        self._by_id[shift["id"]] = shift
+        date = shift.get("date")
+        if date not in self._by_date:
+            self._by_date[date] = {}
+            bisect.insort(self._dates, date)
+        self._by_date[date][shift["id"]] = shift
+
+    def _remove(self, shift_id):
+        shift = self._by_id.pop(shift_id, None)
+        if shift is None:
+            return
+        date = shift.get("date")
+        bucket = self._by_date.get(date)
+        if bucket is not None:
+            bucket.pop(shift_id, None)
+            if not bucket:
+                del self._by_date[date]
+                del self._dates[bisect.bisect_left(self._dates, date)]
+
+    def _rebuild(self, shifts):
+        self._by_id, self._by_date, self._dates = {}, {}, []
+        for shift in shifts:
+            self._put(shift)
+
+    def _sync(self) -> Optional[List[Dict[str, Any]]]:
+        """В потоке: проверка файла и, если он сменился, полная выборка"""
+        self.store.refresh()
+        if self._reload_needed:
+            self._reload_needed = False
+            return self.store.all()
+        return None
+
+    async def _refresh(self):
+        # Выборка могла быть сделана до событий, применённых за время ожидания:
+        # они накатываются поверх (устаревшие отсекает проверка версии в _apply)
+        self._replay = []
+        try:
+            shifts = await asyncio.to_thread(self._sync)
+        finally:
+            replay, self._replay = self._replay, None
+        if shifts is not None:
+            self._rebuild(shifts)
+            for old, new in replay:
+                self._apply(old, new)
+        self._checked_at = time.monotonic()
+
+    async def _coalesce(self, key: Tuple, make: Callable):
+        """Одновременные одинаковые запросы ждут один и тот же результат"""
+        future = self._inflight.get(key)
+        if future is None:
+            future = self._inflight[key] = self._loop.create_task(make())
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(future)
+
+    async def _read(self, key: Tuple, compute: Callable, shared: Optional[Callable] = None):
+        # Результат общий для одновременных запросов, а словари - те же, что в
+        # снимке: каждый вызывающий получает свои копии и может их менять
+        return _copy(await self._read_shared(key, compute, shared))
+
+    async def _read_shared(self, key: Tuple, compute: Callable, shared: Optional[Callable]):
+        if self._shared:
+            # Переход на новое поколение снимка может ждать ответа мастера
+            return await self._coalesce(key, lambda: asyncio.to_thread(shared))
+
+        async def run():
+            stale = self._reload_needed or time.monotonic() - self._checked_at > FRESHNESS
+            metrics.cache_access("snapshot", not stale)
+            if stale:
+                await self._coalesce(("refresh",), self._refresh)
+            return compute()
+        return await self._coalesce(key, run)
+
+    # ЧТЕНИЕ
+
+    async def all(self) -> List[Dict[str, Any]]:
+        return await self._read(("all",), lambda: list(self._by_id.values()), self.store.all)
+
+    async def get(self, shift_id: int) -> Optional[Dict[str, Any]]:
+        return await self._read(("get", shift_id), lambda: self._by_id.get(shift_id),
+                                lambda: self.store.get(shift_id))
+
+    async def by_date(self, date: str) -> List[Dict[str, Any]]:
+        return await self._read(("date", date), lambda: list(self._by_date.get(date, {}).values()),
+                                lambda: self.store.by_date(date))
+
+    async def date_range(self, date_from: Optional[str] = None,
+                         date_to: Optional[str] = None) -> List[Dict[str, Any]]:
+        def compute():
+            lo = bisect.bisect_left(self._dates, date_from) if date_from else 0
+            hi = bisect.bisect_right(self._dates, date_to) if date_to else len(self._dates)
+            result: List[Dict[str, Any]] = []
+            for date in self._dates[lo:hi]:
+                result.extend(self._by_date[date].values())
+            return result
+        return await self._read(("range", date_from, date_to), compute,
+                                lambda: self.store.date_range(date_from, date_to))
+
+    # ЗАПИСЬ
+
+    async def create(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        return await self._submit(self.store.create, data)
+
+    async def update(self, shift_id: int, changes: Dict[str, Any],
+                     expected_version: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        return await self._submit(self.store.update, shift_id, changes, expected_version)
+
+    async def delete(self, shift_id: int) -> bool:
+        return await self._submit(self.store.delete, shift_id)
+
+    async def _submit(self, fn, *args):
+        future = self._loop.create_future()
+        self._writes.put_nowait((fn, args, future))
+        return await future
+
+    async def _write_loop(self):
+        # Пачка общая для многих запросов, а задача могла родиться внутри одного из них
+        metrics.detach()
+        while True:
+            batch = [await self._writes.get()]
+            while len(batch) < MAX_WRITE_BATCH and not self._writes.empty():
+                batch.append(self._writes.get_nowait())
+            try:
+                results = await asyncio.to_thread(self._run_batch, batch)
+            except Exception as e:
+                results = [(False, e)] * len(batch)
+            for (_, _, future), (ok, value) in zip(batch, results):
+                if future.cancelled():
+                    continue
+                if ok:
+                    future.set_result(value)
+                else:
+                    future.set_exception(value)
+
+    def _run_batch(self, batch) -> List[Tuple[bool, Any]]:
+        """В потоке: пачка операций под одной блокировкой и одна запись на диск"""
+        results = []
+        with self.store.transaction():
+            for fn, args, _ in batch:
+                try:
+                    results.append((True, fn(*args)))
+                except Exception as e:
+                    results.append((False, e))
+        return results
+
+
+_repositories: Dict[Tuple[int, int], AsyncShiftRepository] = {}
+_starting: Dict[Tuple[int, int], asyncio.Future] = {}
+
+
+async def get_repository(store) -> AsyncShiftRepository:
+    """Один запущенный репозиторий на хранилище (в пределах цикла asyncio)"""
+    loop = asyncio.get_running_loop()
+    key = (id(store), id(loop))
+    repository = _repositories.get(key)
+    if repository is not None and repository.store is store and repository._loop is loop:
+        return repository
+    if key not in _starting:
+        async def start():
+            created = AsyncShiftRepository(store)
+            await created.start()
+            _repositories[key] = created
+            return created
+        _starting[key] = loop.create_task(start())
+        _starting[key].add_done_callback(lambda _: _starting.pop(key, None))
+    return await asyncio.shield(_starting[key])
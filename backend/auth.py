@@ -1,12 +1,28 @@
 import jwt
 import bcrypt
 import datetime
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from collections import OrderedDict
 from functools import wraps
-from flask import request, jsonify
+from flask import g, request, jsonify
+
+import metrics
 
 JWT_SECRET = "your-super-secret-key-change-in-production"
 JWT_ALGORITHM = "HS256"
 
+# Сколько проверенных токенов держать в памяти
+TOKEN_CACHE_SIZE = 1024
+
+# Пул процессов для bcrypt: число воркеров (0 - считать в потоке запроса)
+# и сколько операций может ждать в очереди, прежде чем отвечать 429
+PASSWORD_WORKERS = int(os.environ.get("MYSHIFT_PASSWORD_WORKERS", os.cpu_count() or 2))
+PASSWORD_QUEUE_LIMIT = int(os.environ.get("MYSHIFT_PASSWORD_QUEUE", max(PASSWORD_WORKERS, 1) * 8))
+
 def hash_password(password):
     hashed = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
     return hashed.decode('utf-8')  # Возвращаем строку вместо bytes
@@ -14,39 +30,145 @@ def hash_password(password):
 def verify_password(password, hashed):
     return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
 
-def generate_token(user_id, username, role):
+
+class PasswordQueueFull(Exception):
+    """Очередь проверки паролей переполнена, клиенту стоит повторить позже"""
+
+
+_password_pool = None
+_password_pool_lock = threading.Lock()
+_password_slots = threading.BoundedSemaphore(PASSWORD_QUEUE_LIMIT)
+
+def _get_password_pool():
+    global _password_pool
+    with _password_pool_lock:
+        if _password_pool is None:
+            _password_pool = ProcessPoolExecutor(
+                max_workers=PASSWORD_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+        return _password_pool
+
+def _run_password_task(fn, *args):
+    """Выполняет bcrypt в пуле процессов, не занимая CPU потока запроса"""
+    if not _password_slots.acquire(blocking=False):
+        raise PasswordQueueFull()
+    try:
+        if PASSWORD_WORKERS <= 0:
+            return fn(*args)
+        return _get_password_pool().submit(fn, *args).result()
+    finally:
+        _password_slots.release()
+
+def verify_password_in_pool(password, hashed):
+    return _run_password_task(verify_password, password, hashed)
+
+def hash_password_in_pool(password):
+    return _run_password_task(hash_password, password)
+
+def generate_token(user_id, username, role, store='default'):
     payload = {
         'user_id': user_id,
         'username': username,
         'role': role,
+        'store': store,
         'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=24)
     }
     return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
 
+
+class TokenCache:
+    """LRU уже проверенных токенов: подпись -> (токен, claims).
+
+    Запись живёт до exp токена, поэтому повторные запросы с тем же
+    токеном не вызывают jwt.decode.
+    """
+
+    def __init__(self, maxsize=TOKEN_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token):
+        signature = token.rpartition('.')[2]
+        with self._lock:
+            item = self._items.get(signature)
+            if item is None:
+                return None
+            cached_token, payload = item
+            if cached_token != token or payload.get('exp', 0) <= time.time():
+                del self._items[signature]
+                return None
+            self._items.move_to_end(signature)
+            return payload
+
+    def put(self, token, payload):
+        signature = token.rpartition('.')[2]
+        with self._lock:
+            self._items[signature] = (token, payload)
+            self._items.move_to_end(signature)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+token_cache = TokenCache()
+
 def verify_token(token):
+    payload = token_cache.get(token)
+    metrics.cache_access("token", payload is not None)
+    if payload is not None:
+        return payload
     try:
         payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-        return payload
     except jwt.ExpiredSignatureError:
         return None
     except jwt.InvalidTokenError:
         return None
-
-def login_required(f):
-    @wraps(f)
-    def decorated(*args, **kwargs):
-        token = request.headers.get('Authorization')
-        if not token:
-            return jsonify({"error": "Token required"}), 401
-
+    token_cache.put(token, payload)
+    return payload
+
+def authenticate_request():
+    """Проверяет токен текущего запроса один раз и кладёт claims в контекст.
+
+    Возвращает (payload, None) или (None, ответ с ошибкой 401).
+    Повторные вызовы в том же запросе берут результат из flask.g.
+    """
+    if 'auth_result' in g:
+        return g.auth_result
+
+    with metrics.phase("auth"):
+        g.auth_result = _authenticate()
+    return g.auth_result
+
+def _authenticate():
+    token = request.headers.get('Authorization')
+    if not token:
+        result = (None, (jsonify({"error": "Token required"}), 401))
+    else:
         if token.startswith('Bearer '):
             token = token[7:]
-
         payload = verify_token(token)
         if not payload:
-            return jsonify({"error": "Invalid token"}), 401
+            result = (None, (jsonify({"error": "Invalid token"}), 401))
+        else:
+            request.user = payload
+            result = (payload, None)
+    return result
 
-        request.user = payload
+def has_role(payload, required_role):
+    # Админ должен иметь доступ ко всему
+    return payload.get('role') in ('admin', required_role)
+
+def login_required(f):
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        payload, error = authenticate_request()
+        if error:
+            return error
         return f(*args, **kwargs)
     return decorated
 
@@ -54,31 +176,14 @@ def role_required(required_role):
     def decorator(f):
         @wraps(f)
         def decorated(*args, **kwargs):
-            token = request.headers.get('Authorization')
-            if not token:
-                return jsonify({"error": "Token required"}), 401
-
-            if token.startswith('Bearer '):
-                token = token[7:]
+            # Под login_required токен уже проверен - здесь только чтение claims
+            payload, error = authenticate_request()
+            if error:
+                return error
 
-            payload = verify_token(token)
-            if not payload:
-                return jsonify({"error": "Invalid token"}), 401
-
-            # ПРОВЕРЬ ЭТУ ЛОГИКУ:
-            user_role = payload.get('role')
-            print(f"User role: {user_role}, Required: {required_role}")  # ← отладка
-
-            # Админ должен иметь доступ ко всему
-            if user_role == 'admin':
-                request.user = payload
-                return f(*args, **kwargs)
-
-            # Для не-админов проверяем соответствие роли
-            if user_role != required_role:
+            if not has_role(payload, required_role):
                 return jsonify({"error": "Insufficient permissions"}), 403
 
-            request.user = payload
             return f(*args, **kwargs)
         return decorated
-    return decorator
\ No newline at end of file
+    return decorator
@@ -0,0 +1,55 @@
+import sys
+
+import pytest
+
+# Добавляем путь к бэкенду
+sys.path.append('/home/kalikrit/myshift')
+
+import auth
+import database as db
+from simple_app import app
+
+
+SHIFT = {
+    'date': '2025-11-20',
+    'start_time': '09:00',
+    'end_time': '17:00',
+    'employee': 'кассир1',
+    'role': 'cashier'
+}
+
+
+def shift(date, start, end, employee='кассир1', role='cashier', **extra):
+    return {'date': date, 'start_time': start, 'end_time': end, 'employee': employee, 'role': role, **extra}
+
+
+def token_headers(role='admin', store='default'):
+    return {'Authorization': f'Bearer {auth.generate_token(1, role, role, store)}'}
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """Клиент с отдельными файлами смен и пользователей"""
+    import simple_app
+    monkeypatch.setattr(simple_app, 'SHIFTS_FILE', str(tmp_path / 'shifts.json'))
+    monkeypatch.setattr(simple_app, 'USERS_FILE', str(tmp_path / 'users.json'))
+    with app.test_client() as client:
+        yield client
+
+
+@pytest.fixture
+def manager_client(client):
+    """Тот же клиент с токеном менеджера в каждом запросе"""
+    client.environ_base['HTTP_AUTHORIZATION'] = token_headers('manager')['Authorization']
+    return client
+
+
+@pytest.fixture
+def headers():
+    return token_headers()
+
+
+@pytest.fixture
+def store(client, tmp_path):
+    """Хранилище, с которым работает client"""
+    return db.get_shift_store(str(tmp_path / 'shifts.json'))
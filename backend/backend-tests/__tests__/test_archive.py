@@ -0,0 +1,89 @@
+import json
+import os
+import sys
+from datetime import date, timedelta
+
+import pytest
+
+# Добавляем путь к бэкенду
+sys.path.append('/home/kalikrit/myshift')
+
+import archive
+import shift_store
+from shift_records import ShiftRecord
+from shift_store import ShiftStore
+
+OLD = [
+    {'id': 1, 'date': '2024-01-15', 'start_time': '09:00', 'end_time': '17:00',
+     'employee': 'кассир1', 'role': 'cashier', 'version': 2, 'required': True},
+    {'id': 2, 'date': '2024-01-15', 'start_time': '9:30', 'end_time': '18:00', 'role': 'cashier'},
+    {'id': 3, 'date': '2024-02-01', 'start_time': '22:00', 'end_time': '06:00',
+     'employee': 'менеджер1', 'role': 'manager', 'version': 1},
+]
+
+
+def recent(days_ago, shift_id):
+    day = (date.today() - timedelta(days=days_ago)).isoformat()
+    return {'id': shift_id, 'date': day, 'start_time': '10:00', 'end_time': '14:00',
+            'employee': 'кассир2', 'role': 'cashier', 'version': 1}
+
+
+@pytest.fixture
+def path(tmp_path):
+    path = tmp_path / 'shifts.json'
+    path.write_text(json.dumps(OLD + [recent(1, 10)]), encoding='utf-8')
+    return str(path)
+
+
+def test_segment_roundtrip(tmp_path):
+    records = [ShiftRecord.from_dict(shift) for shift in OLD[:2]]
+    segment_path = str(tmp_path / '2024-01.seg')
+    archive.write_segment(segment_path, '2024-01', records)
+
+    segment = archive.Segment.open(segment_path)
+    assert segment.span(archive.month_bounds('2024-01')[0] + 14, None) == (0, 2)
+    assert segment.span(None, archive.month_bounds('2024-01')[0] + 13) == (0, 0)
+    assert [r.to_dict() for r in segment.to_records(segment.records)] == OLD[:2]
+    with pytest.raises(ValueError):
+        archive.write_segment(segment_path, '2024-02', records)
+
+
+def test_old_months_move_to_archive(path):
+    store = ShiftStore(path, flush_delay=0, archive_days=30)
+    assert store.count() == 4
+    assert sorted(os.listdir(path + '.archive')) == ['2024-01.seg', '2024-02.seg']
+    # В файле осталось только рабочее окно
+    assert [s['id'] for s in json.loads(open(path, encoding='utf-8').read())] == [10]
+
+    assert store.date_range('2024-01-01', '2024-01-31') == OLD[:2]
+    assert store.by_date('2024-02-01') == [OLD[2]]
+    assert store.by_employee('кассир1', '2024-01-15') == [OLD[0]]
+    assert store.get(3) == OLD[2]
+    assert [s['id'] for s in store.iter_shifts(after_id=1, limit=3)] == [2, 3, 10]
+    assert len(store.columns('2024-01-01', None)) == 4
+    with pytest.raises(archive.ArchivedShift):
+        store.update(1, {'end_time': '18:00'})
+    with pytest.raises(archive.ArchivedShift):
+        store.delete(3)
+
+    # Смена в архивном месяце попадает в архив при следующей записи
+    late = store.create({'date': '2024-01-20', 'start_time': '08:00', 'end_time': '12:00',
+                         'employee': 'кассир3', 'role': 'cashier'})
+    store.create(recent(2, None))
+    assert store.is_archived(late['id'])
+    assert [s['date'] for s in store.date_range('2024-01-01', '2024-01-31')] == ['2024-01-15'] * 2 + ['2024-01-20']
+
+    # Другой процесс видит тот же архив
+    other = ShiftStore(path, flush_delay=0, archive_days=0)
+    assert other.count() == 6 and other.get(late['id']) == late
+
+
+def test_archived_shifts_are_read_only_over_api(path, client, headers, monkeypatch):
+    # client работает с тем же tmp_path/shifts.json, хранилище создаётся первым запросом
+    monkeypatch.setattr(shift_store, 'ARCHIVE_DAYS', 30)
+    assert client.get('/shifts/2024-01-15', headers=headers).get_json() == OLD[:2]
+    assert client.put('/shifts/1', json={'end_time': '18:00'}, headers=headers).status_code == 409
+    assert client.delete('/shifts/3', headers=headers).status_code == 409
+    response = client.post('/shifts/batch', json={'operations': [{'op': 'delete', 'id': 2}]}, headers=headers)
+    assert response.status_code == 409 and response.get_json()['index'] == 0
+    assert client.put('/shifts/10', json={'end_time': '15:00'}, headers=headers).status_code == 200
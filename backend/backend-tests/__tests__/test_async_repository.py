@@ -0,0 +1,95 @@
+import pytest
+import asyncio
+import json
+import sys
+
+# Добавляем путь к бэкенду
+sys.path.append('/home/kalikrit/myshift')
+
+import async_repository
+from async_repository import AsyncShiftRepository
+from shift_store import ShiftStore
+
+SHIFT = {
+    'date': '2025-11-20',
+    'start_time': '09:00',
+    'end_time': '17:00',
+    'employee': 'кассир1',
+    'role': 'cashier'
+}
+
+def test_concurrent_writes_batched(tmp_path, monkeypatch):
+    """Одновременные записи объединяются писателем, чтения видят свои записи"""
+    store = ShiftStore(str(tmp_path / 'shifts.json'), flush_delay=0)
+    writes = []
+    original_write = ShiftStore._write
+    monkeypatch.setattr(ShiftStore, '_write', lambda self: writes.append(1) or original_write(self))
+
+    async def scenario():
+        repository = AsyncShiftRepository(store)
+        await repository.start()
+        created = await asyncio.gather(*[repository.create({**SHIFT, 'employee': f'кассир{i}'})
+                                         for i in range(50)])
+        assert len({shift['id'] for shift in created}) == 50
+        assert len(await repository.by_date('2025-11-20')) == 50
+
+        updated = await repository.update(created[0]['id'], {'start_time': '10:00'})
+        assert (await repository.get(created[0]['id']))['version'] == updated['version'] == 2
+        assert await repository.delete(created[1]['id'])
+        assert len(await repository.date_range('2025-11-01', '2025-11-30')) == 49
+        await repository.stop()
+
+    asyncio.run(scenario())
+    assert len(writes) < 10
+    assert len(json.loads((tmp_path / 'shifts.json').read_text(encoding='utf-8'))) == 49
+
+def test_reads_coalesced_and_refreshed(tmp_path, monkeypatch):
+    """Одинаковые одновременные чтения считаются один раз; чужая запись видна после проверки"""
+    path = tmp_path / 'shifts.json'
+    store = ShiftStore(str(path), flush_delay=0)
+    store.create(SHIFT)
+    monkeypatch.setattr(async_repository, 'FRESHNESS', 0)
+
+    async def scenario():
+        repository = AsyncShiftRepository(store)
+        await repository.start()
+        refreshes = []
+        original_refresh = store.refresh
+        monkeypatch.setattr(store, 'refresh', lambda: refreshes.append(1) or original_refresh())
+        results = await asyncio.gather(*[repository.all() for _ in range(20)])
+        assert len(refreshes) == 1 and all(result == results[0] for result in results)
+
+        # Вызывающий получает копии: правка результата не портит снимок и чужие ответы
+        results[0][0]['employee'] = 'изменено'
+        assert results[1][0]['employee'] == SHIFT['employee']
+        assert (await repository.get(results[0][0]['id']))['employee'] == SHIFT['employee']
+
+        path.write_text(json.dumps([{**SHIFT, 'id': 7, 'version': 1}]), encoding='utf-8')
+        assert [shift['id'] for shift in await repository.all()] == [7]
+        await repository.stop()
+
+    asyncio.run(scenario())
+
+def test_events_during_refresh_survive_rebuild(tmp_path):
+    """Событие, пришедшее пока поток читал старые смены, не теряется при перестройке"""
+    store = ShiftStore(str(tmp_path / 'shifts.json'), flush_delay=0)
+    shift = store.create(SHIFT)
+
+    async def scenario():
+        repository = AsyncShiftRepository(store)
+        await repository.start()
+        original_sync = repository._sync
+
+        def stale_sync():
+            shifts = original_sync()
+            # Запись между выборкой и перестройкой: событие успевает примениться раньше
+            store.update(shift['id'], {'start_time': '10:00'})
+            return shifts
+
+        repository._sync = stale_sync
+        repository._reload_needed = True
+        await repository._refresh()
+        assert (await repository.get(shift['id']))['version'] == 2
+        await repository.stop()
+
+    asyncio.run(scenario())
@@ -0,0 +1,74 @@
+import pytest
+import json
+import sys
+
+# Добавляем путь к бэкенду
+sys.path.append('/home/kalikrit/myshift')
+
+import auth
+from simple_app import app
+
+@pytest.fixture
+def decode_calls(monkeypatch):
+    """Считает вызовы jwt.decode"""
+    calls = []
+    original_decode = auth.jwt.decode
+
+    def counting_decode(*args, **kwargs):
+        calls.append(args[0])
+        return original_decode(*args, **kwargs)
+
+    auth.token_cache.clear()
+    monkeypatch.setattr(auth.jwt, 'decode', counting_decode)
+    return calls
+
+def test_token_verified_once(decode_calls):
+    """Токен декодируется один раз и дальше берётся из кэша"""
+    token = auth.generate_token(1, 'admin', 'admin')
+
+    assert auth.verify_token(token)['username'] == 'admin'
+    assert auth.verify_token(token)['username'] == 'admin'
+    assert len(decode_calls) == 1
+
+def test_tampered_token_not_served_from_cache(decode_calls):
+    """Подмена payload при той же подписи не проходит через кэш"""
+    token = auth.generate_token(1, 'viewer', 'viewer')
+    auth.verify_token(token)
+
+    header, _, signature = token.split('.')
+    forged_payload = auth.generate_token(1, 'viewer', 'admin').split('.')[1]
+    assert auth.verify_token(f'{header}.{forged_payload}.{signature}') is None
+
+def test_stacked_decorators_decode_once(decode_calls):
+    """login_required + role_required проверяют токен один раз за запрос"""
+    token = auth.generate_token(1, 'viewer', 'viewer')
+
+    with app.test_client() as client:
+        response = client.delete('/shifts/1', headers={'Authorization': f'Bearer {token}'})
+
+    assert response.status_code == 403
+    assert json.loads(response.data)['error'] == 'Insufficient permissions'
+    assert len(decode_calls) == 1
+
+def test_password_pool_roundtrip():
+    """Хэширование и проверка пароля через пул процессов"""
+    hashed = auth.hash_password_in_pool('secret')
+    assert auth.verify_password_in_pool('secret', hashed)
+    assert not auth.verify_password_in_pool('wrong', hashed)
+
+def test_login_returns_429_when_queue_full(monkeypatch):
+    """Переполненная очередь bcrypt даёт 429 вместо ожидания"""
+    import simple_app
+
+    def busy(*args):
+        raise auth.PasswordQueueFull()
+
+    monkeypatch.setattr(simple_app, 'verify_password_in_pool', busy)
+    monkeypatch.setattr(simple_app.db, 'get_user_by_username',
+                        lambda username, users_file=None: {'id': 1, 'username': username, 'password': 'x'})
+
+    with app.test_client() as client:
+        response = client.post('/auth/login', json={'username': 'admin', 'password': 'secret'})
+
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == '1'
@@ -0,0 +1,61 @@
+import pytest
+import json
+import sys
+
+# Добавляем путь к бэкенду
+sys.path.append('/home/kalikrit/myshift')
+
+from conftest import SHIFT
+from shift_store import ShiftStore
+
+def test_batch_applies_with_one_write(manager_client, store, monkeypatch):
+    """Создание, изменение и удаление одним пакетом - одна запись файла"""
+    first = store.create(SHIFT)
+    second = store.create({**SHIFT, 'employee': 'кассир2'})
+    store.flush()
+
+    writes = []
+    original_write = ShiftStore._write
+    monkeypatch.setattr(ShiftStore, '_write', lambda self: writes.append(1) or original_write(self))
+
+    response = manager_client.post('/shifts/batch', json={'operations': [
+        {'op': 'update', 'id': first['id'], 'changes': {'start_time': '10:00'}, 'version': 1},
+        {'op': 'delete', 'id': second['id']},
+        {'op': 'create', 'shift': {**SHIFT, 'employee': 'кассир3'}},
+    ]})
+    store.flush()
+
+    assert response.status_code == 200
+    results = json.loads(response.data)['results']
+    assert [r['status'] for r in results] == [200, 200, 201]
+    assert results[0]['shift']['version'] == 2
+    assert results[2]['shift']['employee'] == 'кассир3'
+    assert sorted(s['employee'] for s in store.all()) == ['кассир1', 'кассир3']
+    assert len(writes) == 1
+
+def test_batch_is_atomic(manager_client, store):
+    """Ошибка в любой операции - не применяется ни одна"""
+    shift = store.create(SHIFT)
+    store.update(shift['id'], {'employee': 'кассир2'})
+
+    response = manager_client.post('/shifts/batch', json={'operations': [
+        {'op': 'create', 'shift': SHIFT},
+        {'op': 'update', 'id': shift['id'], 'changes': {'employee': 'кассир3'}, 'version': 1},
+    ]})
+
+    assert response.status_code == 409
+    data = json.loads(response.data)
+    assert data['index'] == 1
+    assert data['current']['version'] == 2
+    assert store.count() == 1
+
+    response = manager_client.post('/shifts/batch', json={'operations': [{'op': 'delete', 'id': 999}]})
+    assert response.status_code == 404
+    assert manager_client.post('/shifts/batch', json={'operations': [{'op': 'move'}]}).status_code == 400
+
+@pytest.mark.parametrize('body', [[{'op': 'delete', 'id': 1}], 'operations', 42, None])
+def test_batch_rejects_non_object_body(manager_client, body):
+    """Тело не объект JSON - 400 в формате остальных ошибок пакета"""
+    response = manager_client.post('/shifts/batch', data=json.dumps(body), content_type='application/json')
+    assert response.status_code == 400
+    assert json.loads(response.data) == {'error': 'Body must be a JSON object with operations', 'index': None}
@@ -0,0 +1,54 @@
+import json
+import os
+import sys
+
+# Добавляем путь к бэкенду и к бенчмаркам
+sys.path.append('/home/kalikrit/myshift')
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'benchmarks'))
+
+import data
+import bench_api
+
+
+def test_generate_dataset(tmp_path):
+    info = data.generate(str(tmp_path), stores=2, employees=7, days=5)
+    default = json.loads((tmp_path / 'shifts.json').read_text(encoding='utf-8'))
+    other = json.loads((tmp_path / 'shifts.store1.json').read_text(encoding='utf-8'))
+    users = json.loads((tmp_path / 'users.json').read_text(encoding='utf-8'))
+
+    assert info['shifts'] == len(default) + len(other)
+    assert {s['date'] for s in default} <= set(info['dates'])
+    assert all(s['employee'].startswith('store1-') for s in other)
+    assert [u['store'] for u in users] == ['default', 'store1']
+
+
+def test_scenarios_through_flask_client(tmp_path):
+    info = data.generate(str(tmp_path), stores=1, employees=5, days=3)
+    target = bench_api.FlaskClientTarget(info)
+    try:
+        results = bench_api.run_scenarios(target, info, count=5,
+                                          only=['by_date', 'create', 'update', 'delete', 'generate'])
+    finally:
+        target.close()
+
+    assert set(results) == {'by_date', 'create', 'update', 'delete', 'generate'}
+    assert all(r['errors'] == 0 and r['requests'] > 0 for r in results.values())
+    # Созданные бенчмарком смены удалены, остались исходные и сгенерированные на будущие даты
+    shifts = json.loads((tmp_path / 'shifts.json').read_text(encoding='utf-8'))
+    assert len([s for s in shifts if s['date'] in info['dates']]) == info['shifts']
+
+
+def test_compare_flags_regressions():
+    def report(p50, p99, errors=0):
+        return {'scenarios': {'by_date': {'p50_ms': p50, 'p99_ms': p99, 'errors': errors}}}
+
+    assert bench_api.compare(report(1.1, 2.0), report(1.0, 2.0), tolerance=0.25) == []
+    regressions = bench_api.compare(report(1.5, 2.0, errors=1), report(1.0, 2.0), tolerance=0.25)
+    assert [(r['metric'], r['change']) for r in regressions] == [('p50_ms', 0.5), ('errors', None)]
+
+
+def test_percentile_nearest_rank():
+    values = [float(i) for i in range(1, 101)]
+    assert bench_api.percentile(values, 50) == 50.0
+    assert bench_api.percentile(values, 99) == 99.0
+    assert bench_api.percentile([3.0], 99) == 3.0
@@ -0,0 +1,113 @@
+import json
+import sys
+
+# Добавляем путь к бэкенду
+sys.path.append('/home/kalikrit/myshift')
+
+from conftest import SHIFT
+
+def test_etag_and_304(manager_client):
+    """Повторный GET с If-None-Match без изменений даёт 304, изменение даты - 200"""
+    manager_client.post('/shifts', json=SHIFT)
+    first = manager_client.get('/shifts/2025-11-20')
+    etag = first.headers['ETag']
+    assert first.headers['Last-Modified']
+
+    assert manager_client.get('/shifts/2025-11-20', headers={'If-None-Match': etag}).status_code == 304
+
+    # Изменение другой даты не сбрасывает ETag этой
+    manager_client.post('/shifts', json={**SHIFT, 'date': '2025-11-21'})
+    assert manager_client.get('/shifts/2025-11-20', headers={'If-None-Match': etag}).status_code == 304
+
+    all_etag = manager_client.get('/shifts').headers['ETag']
+    manager_client.post('/shifts', json={**SHIFT, 'employee': 'кассир3'})
+    response = manager_client.get('/shifts/2025-11-20', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert len(json.loads(response.data)) == 2
+    assert manager_client.get('/shifts', headers={'If-None-Match': all_etag}).status_code == 200
+
+def test_changes_since(manager_client):
+    """Дельта: только изменённые смены, удалённые - с op delete"""
+    kept = json.loads(manager_client.post('/shifts', json=SHIFT).data)
+    removed = json.loads(manager_client.post('/shifts', json={**SHIFT, 'employee': 'кассир3'}).data)
+    version = json.loads(manager_client.get('/shifts/changes').data)['version']
+
+    manager_client.put(f'/shifts/{kept["id"]}', json={'employee': 'кассир2'})
+    manager_client.delete(f'/shifts/{removed["id"]}')
+    added = json.loads(manager_client.post('/shifts', json=SHIFT).data)
+    manager_client.delete(f'/shifts/{added["id"]}')
+
+    data = json.loads(manager_client.get(f'/shifts/changes?since={version}').data)
+    assert data['reset'] is False
+    assert [(c['op'], c['id']) for c in data['changes']] == [('update', kept['id']), ('delete', removed['id'])]
+    assert data['changes'][0]['shift']['employee'] == 'кассир2'
+
+    again = json.loads(manager_client.get(f'/shifts/changes?since={data["version"]}').data)
+    assert again['changes'] == []
+    assert json.loads(manager_client.get('/shifts/changes?since=other-1').data)['reset'] is True
+
+def test_versions_shared_between_workers(tmp_path):
+    """Два экземпляра хранилища (воркеры) отдают одни версии и понимают чужой since"""
+    from changelog import ChangeLog
+    from shift_store import ShiftStore
+
+    path = str(tmp_path / 'shifts.json')
+    first, second = ShiftStore(path, flush_delay=0), ShiftStore(path, flush_delay=0)
+    first_log, second_log = ChangeLog(first), ChangeLog(second)
+    assert first_log.version() == second_log.version()
+
+    created = first.create(SHIFT)
+    version = second_log.version()
+    assert version == first_log.version() and version != '0-0'
+    assert first_log.version('2025-11-20') == second_log.version('2025-11-20')
+
+    second.update(created['id'], {'employee': 'кассир2'})
+    data = first_log.changes_since(version)
+    assert data['reset'] is False
+    assert [(c['op'], c['shift']['employee']) for c in data['changes']] == [('update', 'кассир2')]
+    assert data['version'] == second_log.version()
+
+    first.replace_all([])
+    assert second_log.changes_since(version)['reset'] is True
+
+
+def test_journal_rewritten_when_full(tmp_path):
+    """Переполненный журнал переписывается, старые версии получают reset"""
+    from changelog import ChangeLog, ChangeJournal
+    from shift_store import ShiftStore
+
+    path = str(tmp_path / 'shifts.json')
+    store = ShiftStore(path, flush_delay=0)
+    store.change_journal = ChangeJournal(path + '.changes', max_entries=3)
+    log = ChangeLog(store)
+    start = store.create(SHIFT)
+    version = log.version()
+    for employee in ('a', 'b', 'c', 'd', 'e', 'f', 'g'):
+        store.update(start['id'], {'employee': employee})
+
+    reader = ChangeLog(ShiftStore(path, flush_delay=0))
+    assert reader.version() == log.version()
+    assert len(open(path + '.changes', encoding='utf-8').readlines()) <= 7
+    assert reader.changes_since(version)['reset'] is True
+    recent = log.version()
+    store.update(start['id'], {'employee': 'h'})
+    assert [c['shift']['employee'] for c in reader.changes_since(recent)['changes']] == ['h']
+
+
+def test_no_etag_while_changes_are_deferred(manager_client, store):
+    """С отложенной записью (flush_delay > 0) новая смена не прячется за 304"""
+    manager_client.post('/shifts', json=SHIFT)
+    etag = manager_client.get('/shifts/2025-11-20').headers['ETag']
+    version = manager_client.get('/shifts/changes').get_json()['version']
+
+    store.flush_delay = 60
+    manager_client.post('/shifts', json={**SHIFT, 'employee': 'кассир2'})
+    response = manager_client.get('/shifts/2025-11-20', headers={'If-None-Match': etag})
+    assert response.status_code == 200 and 'ETag' not in response.headers
+    assert len(response.get_json()) == 2
+
+    store.flush()
+    response = manager_client.get('/shifts/2025-11-20', headers={'If-None-Match': etag})
+    assert response.status_code == 200 and response.headers['ETag'] != etag
+    changes = manager_client.get(f'/shifts/changes?since={version}').get_json()['changes']
+    assert [c['shift']['employee'] for c in changes] == ['кассир2']
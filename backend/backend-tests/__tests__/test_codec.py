@@ -0,0 +1,53 @@
+import json
+import sys
+
+# Добавляем путь к бэкенду
+sys.path.append('/home/kalikrit/myshift')
+
+import codec
+from shift_store import ShiftStore
+
+
+def test_dumps_is_compact_utf8():
+    data = [{'id': 1, 'employee': 'кассир1'}]
+    raw = codec.dumps(data)
+    assert isinstance(raw, bytes)
+    assert raw == '[{"id":1,"employee":"кассир1"}]'.encode('utf-8')
+    assert codec.loads(raw) == data
+    assert codec.loads(raw.decode('utf-8')) == data
+
+
+def test_falls_back_for_values_orjson_rejects():
+    assert json.loads(codec.dumps({1: 'a', 'big': 2 ** 70})) == {'1': 'a', 'big': 2 ** 70}
+
+
+def test_store_writes_compact_file_and_reads_indented(tmp_path):
+    path = tmp_path / 'shifts.json'
+    shift = {'id': 1, 'date': '2025-11-20', 'start_time': '09:00', 'end_time': '17:00',
+             'employee': 'кассир1', 'role': 'cashier'}
+    path.write_text(json.dumps([shift], indent=2, ensure_ascii=False), encoding='utf-8')
+
+    store = ShiftStore(str(path), flush_delay=0)
+    assert store.all() == [shift]
+    store.update(1, {'end_time': '18:00'})
+
+    text = path.read_text(encoding='utf-8')
+    assert '\n' not in text and 'кассир1' in text
+    assert json.loads(text)[0]['version'] == 2
+
+
+def test_flask_responses_use_codec():
+    from simple_app import app
+    with app.test_request_context():
+        from flask import jsonify
+        response = jsonify({'employee': 'кассир1'})
+    assert response.mimetype == 'application/json'
+    assert response.get_data() == codec.dumps({'employee': 'кассир1'})
+
+
+def test_flask_dumps_honours_json_options():
+    from simple_app import app
+    assert app.json.dumps({'b': 1, 'a': 2}, sort_keys=True) == json.dumps({'a': 2, 'b': 1})
+    assert app.json.dumps({'a': 1}, indent=2) == '{\n  "a": 1\n}'
+    assert app.json.dumps({'a': {1, 2}}, default=sorted) == '{"a": [1, 2]}'
+    assert app.json.dumps({'employee': 'кассир1'}) == '{"employee":"кассир1"}'
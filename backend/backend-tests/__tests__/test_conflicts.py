@@ -0,0 +1,105 @@
+import json
+import sys
+import threading
+
+import pytest
+
+# Добавляем путь к бэкенду
+sys.path.append('/home/kalikrit/myshift')
+
+import conflicts
+from conftest import shift
+from shift_store import ShiftStore
+
+
+def test_index_overlap_rest_and_overnight(tmp_path):
+    store = ShiftStore(str(tmp_path / 'shifts.json'))
+    index = conflicts.ConflictIndex(store, lambda employee: 11)
+    night = store.create(shift('2025-11-20', '22:00', '06:00'))
+    store.create(shift('2025-11-22', '09:00', '17:00'))
+
+    # Ночная смена продолжается до 06:00 следующего дня
+    found = index.check(shift('2025-11-21', '05:00', '08:00'))
+    assert [c['type'] for c in found] == ['overlap']
+    assert found[0]['shift_id'] == night['id'] and found[0]['minutes'] == 60
+
+    found = index.check(shift('2025-11-21', '12:00', '20:00'))
+    assert [c['type'] for c in found] == ['rest']
+    assert found[0]['minutes'] == 360 and found[0]['required_minutes'] == 660
+
+    # Две смены в один день - не нарушение отдыха; другой сотрудник не мешает
+    assert index.check(shift('2025-11-22', '18:00', '20:00')) == []
+    assert index.check(shift('2025-11-21', '05:00', '08:00', employee='кассир2')) == []
+
+    # Индекс следит за изменениями хранилища
+    store.delete(night['id'])
+    assert index.check(shift('2025-11-21', '05:00', '08:00')) == []
+
+
+def test_create_and_update_reject_overlaps(client, headers):
+    first = client.post('/shifts', json=shift('2025-11-20', '09:00', '17:00'), headers=headers).get_json()
+
+    response = client.post('/shifts', json=shift('2025-11-20', '16:00', '20:00'), headers=headers)
+    assert response.status_code == 409
+    assert response.get_json()['conflicts'][0]['shift_id'] == first['id']
+
+    # Нехватка отдыха не блокирует запись, но возвращается в заголовке
+    response = client.post('/shifts', json=shift('2025-11-21', '02:00', '06:00'), headers=headers)
+    assert response.status_code == 201
+    assert json.loads(response.headers['X-Shift-Conflicts'])[0]['type'] == 'rest'
+
+    # Сдвиг смены внутри её же интервала - не пересечение с собой
+    response = client.put(f"/shifts/{first['id']}", json={'start_time': '08:00'}, headers=headers)
+    assert response.status_code == 200
+    reported = json.loads(response.headers['X-Shift-Conflicts'])
+    assert [c['type'] for c in reported] == ['rest'] and reported[0]['shift_id'] != first['id']
+
+
+def test_batch_checks_shifts_of_the_same_batch(client, headers):
+    response = client.post('/shifts/batch', json={'operations': [
+        {'op': 'create', 'shift': shift('2025-11-20', '09:00', '17:00')},
+        {'op': 'create', 'shift': shift('2025-11-20', '12:00', '18:00')},
+    ]}, headers=headers)
+    assert response.status_code == 409
+    body = response.get_json()
+    assert body['index'] == 1 and body['conflicts'][0]['type'] == 'overlap'
+    assert client.get('/shifts/2025-11-20', headers=headers).get_json() == []
+
+
+def test_policy_flag_and_audit_endpoint(client, headers, monkeypatch):
+    monkeypatch.setattr(conflicts, 'CONFLICT_POLICY', 'flag')
+    client.post('/shifts', json=shift('2025-11-20', '09:00', '17:00'), headers=headers)
+    response = client.post('/shifts', json=shift('2025-11-20', '16:00', '20:00'), headers=headers)
+    assert response.status_code == 201
+
+    response = client.get('/employees/кассир1/conflicts?from=2025-11-01&to=2025-11-30', headers=headers)
+    assert response.status_code == 200
+    found = response.get_json()
+    assert len(found) == 1 and found[0]['type'] == 'overlap' and found[0]['minutes'] == 60
+    assert client.get('/employees/кассир1/conflicts?from=2025-12-01', headers=headers).get_json() == []
+    assert client.get('/employees/кассир1/conflicts?from=bad', headers=headers).status_code == 400
+
+
+def test_index_builds_from_cold_store(tmp_path):
+    # Первое обращение перечитывает файл, и хранилище уведомляет индекс (reload)
+    path = tmp_path / 'shifts.json'
+    path.write_text(json.dumps([{**shift('2025-11-20', '09:00', '17:00'), 'id': 1},
+                                {**shift('2025-11-20', '16:00', '20:00'), 'id': 2}]), encoding='utf-8')
+    index = conflicts.ConflictIndex(ShiftStore(str(path)))
+    result = []
+    worker = threading.Thread(target=lambda: result.append(index.audit('кассир1')), daemon=True)
+    worker.start()
+    worker.join(5)
+    assert not worker.is_alive(), 'audit deadlocked on a cold store'
+    assert [c['shift_ids'] for c in result[0]] == [[1, 2]]
+
+
+@pytest.mark.parametrize('body', [None, [1, 2], 'shift', 42])
+def test_write_endpoints_reject_non_object_body(client, headers, body):
+    created = client.post('/shifts', json=shift('2025-11-20', '09:00', '17:00'), headers=headers).get_json()
+    raw = {'data': 'null' if body is None else json.dumps(body), 'content_type': 'application/json', 'headers': headers}
+    for response in (client.post('/shifts', **raw), client.put(f"/shifts/{created['id']}", **raw),
+                     client.post('/auth/register', **raw), client.post('/auth/login', **raw)):
+        assert response.status_code == 400
+        assert response.get_json() == {'error': 'Body must be a JSON object'}
+    assert client.put(f"/shifts/{created['id']}", headers=headers).status_code == 400
@@ -0,0 +1,91 @@
+import pytest
+import sys
+
+# Добавляем путь к бэкенду
+sys.path.append('/home/kalikrit/myshift')
+
+from conftest import shift
+from coverage_engine import analyze_coverage, parse_minutes
+
+RULES = {
+    "cashier": [
+        {"start": "07:00", "end": "10:00", "min": 1, "max": 2},
+        {"start": "10:00", "end": "14:00", "min": 2, "max": 3}
+    ]
+}
+
+def test_parse_minutes():
+    """Разбор времени HH:MM"""
+    assert parse_minutes('07:30') == 450
+    assert parse_minutes('24:00') == 1440
+    assert parse_minutes(None) is None
+    assert parse_minutes('25:00') is None
+
+def test_full_coverage():
+    """Смены закрывают все интервалы"""
+    shifts = [
+        shift('2025-11-20', '07:00', '15:00'),
+        shift('2025-11-20', '10:00', '14:00', employee='кассир2'),
+    ]
+
+    day = analyze_coverage(shifts, RULES, ['2025-11-20'])[0]
+
+    assert day['status'] == 'good'
+    assert day['shift_count'] == 2
+    assert [c['actual_min'] for c in day['roles']['cashier']] == [1, 2]
+
+def test_gaps_per_day():
+    """Недобор считается в минутах отдельно для каждого дня периода"""
+    shifts = [
+        shift('2025-11-20', '07:30', '14:00'),
+        shift('2025-11-20', '10:00', '14:00', employee='кассир2'),
+        shift('2025-11-21', '07:00', '14:00'),
+        shift('2025-11-21', '07:00', '14:00', employee='кассир2'),
+        shift('2025-11-21', '08:00', '09:00', employee='кассир3'),
+    ]
+
+    report = analyze_coverage(shifts, RULES, ['2025-11-20', '2025-11-21', '2025-11-22'])
+
+    morning = report[0]['roles']['cashier'][0]
+    assert morning['status'] == 'under'
+    assert morning['understaffed_minutes'] == 30
+
+    assert report[1]['roles']['cashier'][0]['overstaffed_minutes'] == 60
+    assert report[1]['roles']['cashier'][1]['status'] == 'ok'
+    assert report[2]['status'] == 'critical'
+    assert report[2]['shift_count'] == 0
+
+def test_cache_applies_deltas(tmp_path):
+    """Кэш обновляется по событиям хранилища и совпадает с полным пересчётом"""
+    from coverage_engine import CoverageCache
+    from shift_store import ShiftStore
+
+    store = ShiftStore(str(tmp_path / 'shifts.json'), flush_delay=0)
+    first = store.create(shift('2025-11-20', '07:00', '15:00'))
+    store.create(shift('2025-11-21', '07:00', '14:00'))
+    cache = CoverageCache(store, RULES)
+    dates = ['2025-11-20', '2025-11-21']
+    cache.report(dates)
+
+    second = store.create(shift('2025-11-20', '10:00', '14:00', employee='кассир2'))
+    store.update(first['id'], {'start_time': '08:00'})
+    store.delete(second['id'])
+    store.update(first['id'], {'date': '2025-11-21'})
+
+    assert cache.report(dates) == analyze_coverage(store.all(), RULES, dates)
+    assert cache.report(dates)[0]['shift_count'] == 0
+
+def test_cache_reloads_on_external_write(tmp_path):
+    """Запись другим процессом сбрасывает кэш"""
+    import json
+    from coverage_engine import CoverageCache
+    from shift_store import ShiftStore
+
+    path = tmp_path / 'shifts.json'
+    store = ShiftStore(str(path), flush_delay=0)
+    store.create(shift('2025-11-20', '07:00', '15:00'))
+    cache = CoverageCache(store, RULES)
+    assert cache.report(['2025-11-20'])[0]['shift_count'] == 1
+
+    path.write_text(json.dumps([]), encoding='utf-8')
+    assert cache.report(['2025-11-20'])[0]['shift_count'] == 0
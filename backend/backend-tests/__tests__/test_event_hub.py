@@ -0,0 +1,94 @@
+import pytest
+import asyncio
+import json
+import sys
+import threading
+
+# Добавляем путь к бэкенду
+sys.path.append('/home/kalikrit/myshift')
+
+from event_hub import EventHub
+from shift_store import ShiftStore
+
+SHIFT = {
+    'date': '2025-11-20',
+    'start_time': '09:00',
+    'end_time': '17:00',
+    'employee': 'кассир1',
+    'role': 'cashier'
+}
+
+async def next_event(subscriber):
+    return await asyncio.wait_for(subscriber.queue.get(), 1)
+
+def test_events_scoped_by_date(tmp_path):
+    """Подписчик получает события своего периода; пачка создания - generate"""
+    store = ShiftStore(str(tmp_path / 'shifts.json'), flush_delay=0)
+
+    async def scenario():
+        hub = EventHub()
+        november = await hub.subscribe(store, '2025-11-01', '2025-11-30')
+        december = await hub.subscribe(store, '2025-12-01', '2025-12-31')
+
+        shift = await asyncio.to_thread(store.create, SHIFT)
+        assert await next_event(november) == ('create', {'shift': shift, 'seq': 1})
+
+        store.create_many([SHIFT, {**SHIFT, 'employee': 'кассир2'}])
+        event, data = await next_event(november)
+        assert event == 'generate' and len(data['shifts']) == 2
+
+        store.update(shift['id'], {'date': '2025-12-01'})
+        assert (await next_event(december))[0] == 'update'
+        assert (await next_event(november))[1]['old_date'] == '2025-11-20'
+        assert december.queue.empty()
+        await hub.stop()
+
+    asyncio.run(scenario())
+
+def test_external_write_diffed(tmp_path):
+    """Изменение файла другим процессом превращается в точные события"""
+    path = tmp_path / 'shifts.json'
+    store = ShiftStore(str(path), flush_delay=0)
+    kept = store.create(SHIFT)
+    removed = store.create(SHIFT)
+
+    async def scenario():
+        hub = EventHub()
+        subscriber = await hub.subscribe(store)
+        path.write_text(json.dumps([
+            {**kept, 'employee': 'кассир2', 'version': 2},
+            {**SHIFT, 'id': 10, 'version': 1},
+        ], ensure_ascii=False), encoding='utf-8')
+        store.refresh()
+
+        events = [await next_event(subscriber) for _ in range(3)]
+        assert sorted(event for event, _ in events) == ['create', 'delete', 'update']
+        assert [d for e, d in events if e == 'delete'][0]['id'] == removed['id']
+        await hub.stop()
+
+    asyncio.run(scenario())
+
+def test_store_reads_off_the_loop(tmp_path):
+    """Снимок подписки и разница после reload читаются не в потоке цикла"""
+    path = tmp_path / 'shifts.json'
+    store = ShiftStore(str(path), flush_delay=0)
+    store.create(SHIFT)
+    loop_threads = []
+    original = store.all
+
+    def all_shifts():
+        loop_threads.append(threading.current_thread() is threading.main_thread())
+        return original()
+    store.all = all_shifts
+
+    async def scenario():
+        hub = EventHub()
+        subscriber = await hub.subscribe(store)
+        path.write_text(json.dumps([{**SHIFT, 'id': 10, 'version': 1}], ensure_ascii=False), encoding='utf-8')
+        store.refresh()
+        events = [await next_event(subscriber) for _ in range(2)]
+        assert sorted(event for event, _ in events) == ['create', 'delete']
+        await hub.stop()
+
+    asyncio.run(scenario())
+    assert loop_threads == [False, False]
@@ -0,0 +1,30 @@
+import json
+import sys
+from datetime import date, timedelta
+
+# Добавляем путь к бэкенду
+sys.path.append('/home/kalikrit/myshift')
+
+def day(offset):
+    return (date.today() + timedelta(days=offset)).isoformat()
+
+def test_generate_range(manager_client):
+    """Генерация за период пропускает прошедшие и занятые даты"""
+    manager_client.post(f'/shifts/generate/{day(2)}')
+
+    response = manager_client.post(f'/shifts/generate?from={day(-1)}&to={day(3)}')
+    data = json.loads(response.data)
+
+    assert response.status_code == 200
+    assert [d['status'] for d in data['dates']] == ['skipped', 'generated', 'generated', 'skipped', 'generated']
+    assert data['dates'][0]['reason'] == 'past'
+    assert data['dates'][3]['reason'] == 'exists'
+    assert data['created'] == sum(d['created'] for d in data['dates']) > 0
+
+    shifts = json.loads(manager_client.get(f'/shifts?from={day(0)}&to={day(3)}').data)
+    assert len({s['id'] for s in shifts}) == len(shifts) == data['created'] + data['dates'][3]['existing']
+
+def test_generate_range_validation(manager_client):
+    """Без периода или с неверным периодом - 400"""
+    assert manager_client.post('/shifts/generate').status_code == 400
+    assert manager_client.post(f'/shifts/generate?from={day(3)}&to={day(0)}').status_code == 400
@@ -0,0 +1,66 @@
+import sys
+import time
+
+import pytest
+
+# Добавляем путь к бэкенду
+sys.path.append('/home/kalikrit/myshift')
+
+import metrics
+from conftest import SHIFT
+
+
+@pytest.fixture(autouse=True)
+def clean_registry():
+    metrics.registry.reset()
+    yield
+    metrics.registry.reset()
+
+
+def test_nested_phases_are_not_double_counted():
+    timer = metrics.start_request()
+    with metrics.phase('auth'):
+        time.sleep(0.01)
+        with metrics.phase('storage_read'):
+            time.sleep(0.02)
+            with metrics.phase('storage_read'):
+                time.sleep(0.005)
+    assert 0.009 < timer.phases['auth'] < 0.02
+    assert 0.024 < timer.phases['storage_read'] < 0.04
+    metrics.finish_request('/x', 'GET', 200)
+
+    histogram = metrics.registry.histogram('myshift_request_phase_seconds',
+                                           method='GET', phase='compute', route='/x')
+    assert histogram.count == 1
+    # Без открытого запроса фазы ничего не пишут
+    with metrics.phase('auth'):
+        pass
+    assert metrics.current() is None
+
+
+def test_render_prometheus_text():
+    metrics.registry.observe('myshift_request_duration_seconds', (('route', '/a"b'),), 0.003)
+    metrics.count_bytes('read', 100)
+    text = metrics.registry.render()
+    assert '# TYPE myshift_request_duration_seconds histogram' in text
+    assert 'myshift_request_duration_seconds_bucket{route="/a\\"b",le="0.0025"} 0' in text
+    assert 'myshift_request_duration_seconds_bucket{route="/a\\"b",le="0.005"} 1' in text
+    assert 'myshift_request_duration_seconds_bucket{route="/a\\"b",le="+Inf"} 1' in text
+    assert 'myshift_storage_bytes_total{direction="read"} 100' in text
+
+
+def test_metrics_endpoint_reports_routes_phases_and_caches(client, headers):
+    client.post('/shifts', json=SHIFT, headers=headers)
+    first = client.get('/shifts/2025-11-20', headers=headers)
+    client.get('/shifts/2025-11-20', headers={**headers, 'If-None-Match': first.headers['ETag']})
+
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    text = response.get_data(as_text=True)
+    assert 'myshift_request_duration_seconds_count{method="POST",route="/shifts",status="201"} 1' in text
+    assert 'myshift_request_duration_seconds_count{method="GET",route="/shifts/<date>",status="304"} 1' in text
+    assert 'myshift_request_phase_seconds_count{method="GET",phase="auth",route="/shifts/<date>"} 2' in text
+    assert 'myshift_request_phase_seconds_count{method="GET",phase="encode",route="/shifts/<date>"} 1' in text
+    assert 'myshift_cache_requests_total{cache="etag",result="hit"} 1' in text
+    assert 'myshift_cache_requests_total{cache="token",result="hit"}' in text
@@ -0,0 +1,80 @@
+import sys
+
+import pytest
+
+# Добавляем путь к бэкенду
+sys.path.append('/home/kalikrit/myshift')
+
+import reports
+from conftest import shift, token_headers
+from shift_records import ShiftColumns
+from shift_store import ShiftStore
+
+
+# Неделя с понедельника 2025-11-17: у кассира1 44 часа, у менеджера1 - смена через полночь
+WEEK = [shift(f'2025-11-{day}', '08:00', '19:00') for day in (17, 18, 19, 20)] + [
+    shift('2025-11-24', '09:00', '13:00'),
+    shift('2025-11-21', '22:00', '06:00', employee='менеджер1', role='manager'),
+    shift('2025-11-21', '9:00', '12:00', employee='кассир2'),
+]
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ShiftStore(str(tmp_path / 'shifts.json'))
+    for item in WEEK:
+        store.create(item)
+    return store
+
+
+def test_groups_and_overtime(store):
+    columns = reports.store_columns(store, '2025-11-01', '2025-11-30')
+    assert len(columns) == len(WEEK)
+    # Тот же результат для хранилищ без колонок
+    fallback = ShiftColumns.from_dicts(store.date_range('2025-11-01', '2025-11-30'))
+    assert list(fallback.start) == list(columns.start)
+
+    by_employee = reports.hours_report(columns, 'employee', lambda name: 40)
+    assert by_employee['groups'] == [
+        {'employee': 'кассир1', 'shifts': 5, 'hours': 48.0, 'overtime_hours': 4.0, 'employees': 1},
+        {'employee': 'кассир2', 'shifts': 1, 'hours': 3.0, 'overtime_hours': 0.0, 'employees': 1},
+        {'employee': 'менеджер1', 'shifts': 1, 'hours': 8.0, 'overtime_hours': 0.0, 'employees': 1},
+    ]
+
+    by_week = reports.hours_report(columns, 'week', lambda name: 40)
+    assert [(g['week'], g['hours'], g['employees']) for g in by_week['groups']] == [
+        ('2025-11-17', 55.0, 3), ('2025-11-24', 4.0, 1)]
+
+    by_role = reports.hours_report(columns, 'role', lambda name: 40)
+    assert by_role['totals'] == by_week['totals'] == by_employee['totals']
+    assert by_role['groups'][0]['overtime_hours'] == 4.0
+
+    empty = reports.hours_report(reports.store_columns(store, '2026-01-01', '2026-01-31'), 'role')
+    assert empty['groups'] == [] and empty['totals']['shifts'] == 0
+    with pytest.raises(ValueError):
+        reports.hours_report(columns, 'month')
+
+
+def test_report_endpoint_json_and_csv(client, headers):
+    for item in WEEK[:3]:
+        client.post('/shifts', json=item, headers=headers)
+
+    response = client.get('/reports/hours?from=2025-11-01&to=2025-11-30&group_by=role', headers=headers)
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['groups'] == [{'role': 'cashier', 'shifts': 3, 'hours': 33.0,
+                               'overtime_hours': 0.0, 'employees': 1}]
+
+    response = client.get('/reports/hours?from=2025-11-01&to=2025-11-30&format=csv', headers=headers)
+    assert response.mimetype == 'text/csv'
+    assert response.get_data(as_text=True).splitlines() == [
+        'employee,shifts,hours,overtime_hours,employees',
+        'кассир1,3,33.0,0.0,1',
+        'total,3,33.0,0.0,1',
+    ]
+
+    assert client.get('/reports/hours?from=2025-11-30&to=2025-11-01', headers=headers).status_code == 400
+    assert client.get('/reports/hours?from=2025-11-01&to=2025-11-30&group_by=x',
+                      headers=headers).status_code == 400
+    user = token_headers('user')
+    assert client.get('/reports/hours?from=2025-11-01&to=2025-11-30', headers=user).status_code == 403
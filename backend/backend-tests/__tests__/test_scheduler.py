@@ -0,0 +1,80 @@
+import pytest
+import sys
+import time
+
+# Добавляем путь к бэкенду
+sys.path.append('/home/kalikrit/myshift')
+
+from coverage_engine import analyze_coverage, shift_span
+from scheduler import build_schedule, make_roster
+
+RULES = {
+    "cashier": [
+        {"start": "07:00", "end": "10:00", "min": 1, "max": 2},
+        {"start": "10:00", "end": "14:00", "min": 2, "max": 3},
+        {"start": "14:00", "end": "18:00", "min": 3, "max": 4},
+        {"start": "18:00", "end": "20:00", "min": 2, "max": 3}
+    ],
+    "technician": [
+        {"start": "09:00", "end": "17:00", "min": 1, "max": 1}
+    ]
+}
+
+WEEK = [f'2025-11-{day}' for day in range(17, 24)]
+
+def roster(cashiers=10, technicians=3, constraints=None):
+    return make_roster({
+        'cashier': [f'кассир{i}' for i in range(cashiers)],
+        'technician': [f'техник{i}' for i in range(technicians)],
+    }, constraints)
+
+def test_week_meets_minimums():
+    """При достатке сотрудников все минимумы закрыты, недельные часы не превышены"""
+    result = build_schedule(RULES, roster(), WEEK)
+
+    assert result['unmet'] == []
+    report = analyze_coverage(result['shifts'], RULES, WEEK)
+    assert all(check['understaffed_minutes'] == 0
+               for day in report for checks in day['roles'].values() for check in checks)
+    assert max(result['hours'].values()) <= 40
+    # Минимум кассиров - 27 часов в день; лишних смен быть не должно
+    cashier_hours = sum(h for name, h in result['hours'].items() if name.startswith('кассир'))
+    assert cashier_hours <= 27 * 7 * 1.2
+
+def test_constraints_respected():
+    """Выходные, даты отпуска, лимит часов и отдых между сменами"""
+    constraints = {
+        'кассир0': {'availability': {0: None, 1: ['12:00', '20:00']}},
+        'кассир1': {'unavailable': ['2025-11-19']},
+        'кассир2': {'max_hours': 12},
+    }
+    result = build_schedule(RULES, roster(constraints=constraints), WEEK)
+    shifts = result['shifts']
+
+    def of(name):
+        return [s for s in shifts if s['employee'] == name]
+
+    assert all(s['date'] != '2025-11-17' for s in of('кассир0'))
+    assert all(s['start_time'] >= '12:00' for s in of('кассир0') if s['date'] == '2025-11-18')
+    assert all(s['date'] != '2025-11-19' for s in of('кассир1'))
+    assert result['hours'].get('кассир2', 0) <= 12
+
+    for shift in shifts:
+        same_day = [s for s in of(shift['employee']) if s['date'] == shift['date']]
+        assert len(same_day) == 1
+        for other in of(shift['employee']):
+            if int(other['date'][-2:]) == int(shift['date'][-2:]) + 1:
+                rest = shift_span(other)[0] + 24 * 60 - shift_span(shift)[1]
+                assert rest >= 11 * 60
+
+def test_unmet_reported():
+    """Нехватка людей не ломает генерацию, а попадает в unmet"""
+    result = build_schedule(RULES, roster(cashiers=1, technicians=1), WEEK[:1])
+    assert any(gap['role'] == 'cashier' for gap in result['unmet'])
+
+def test_200_employees_fast():
+    """Неделя для 200 сотрудников в нескольких магазинах меньше чем за секунду"""
+    started = time.perf_counter()
+    for store in range(4):
+        build_schedule(RULES, roster(cashiers=40, technicians=10), WEEK, time_budget=0.2)
+    assert time.perf_counter() - started < 1.0
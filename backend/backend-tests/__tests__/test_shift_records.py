@@ -0,0 +1,74 @@
+import json
+import sys
+
+# Добавляем путь к бэкенду
+sys.path.append('/home/kalikrit/myshift')
+
+from shift_records import ShiftRecord, day_number
+from shift_store import ShiftStore
+from coverage_engine import CoverageCache
+
+
+def test_round_trip_keeps_shift_as_is():
+    shift = {'id': 1, 'date': '2025-11-20', 'start_time': '09:00', 'end_time': '17:00',
+             'employee': 'кассир1', 'role': 'cashier', 'required': True, 'version': 3}
+    assert ShiftRecord.from_dict(shift).to_dict() == shift
+
+
+def test_nonstandard_values_survive():
+    """Значения, которые нельзя сжать без потерь, хранятся как есть"""
+    shift = {'id': 2, 'date': '20.11.2025', 'start_time': '9:00', 'end_time': None,
+             'employee': 42, 'notes': ['a', 'b']}
+    record = ShiftRecord.from_dict(shift)
+    assert record.day is None and record.start is None
+    assert record.to_dict() == shift
+    assert day_number('2025-1-5') is None
+
+
+def test_records_share_strings_and_extras():
+    a = ShiftRecord.from_dict({'id': 1, 'date': '2025-11-20', 'start_time': '09:00', 'end_time': '17:00',
+                               'employee': 'кассир1', 'role': 'cashier', 'required': True})
+    b = ShiftRecord.from_dict({'id': 2, 'date': '2025-11-21', 'start_time': '10:00', 'end_time': '18:00',
+                               'employee': 'кассир1', 'role': 'cashier', 'required': True})
+    assert a.employee == b.employee and a.role == b.role
+    assert a.extra is b.extra
+    assert not hasattr(a, '__dict__')
+
+
+def test_store_reads_and_writes_plain_dicts(tmp_path):
+    path = tmp_path / 'shifts.json'
+    shifts = [
+        {'id': 1, 'date': '2025-11-20', 'start_time': '09:00', 'end_time': '17:00',
+         'employee': 'кассир1', 'role': 'cashier'},
+        {'id': 2, 'date': 'завтра', 'start_time': '09:00', 'end_time': '17:00',
+         'employee': 'кассир2', 'role': 'cashier'},
+    ]
+    path.write_text(json.dumps(shifts, ensure_ascii=False), encoding='utf-8')
+    store = ShiftStore(str(path), flush_delay=0)
+
+    assert store.by_date('2025-11-20') == [shifts[0]]
+    assert store.by_date('завтра') == [shifts[1]]
+    assert store.by_employee('кассир1', '2025-11-20') == [shifts[0]]
+    assert store.by_employee('никто', '2025-11-20') == []
+    assert store.date_range('2025-11-01', '2025-11-30') == [shifts[0]]
+
+    store.update(1, {'end_time': '18:00'})
+    saved = json.loads(path.read_text(encoding='utf-8'))
+    assert saved[0] == {**shifts[0], 'end_time': '18:00', 'version': 2}
+    assert saved[1] == shifts[1]
+
+
+def test_coverage_uses_compact_spans(tmp_path):
+    store = ShiftStore(str(tmp_path / 'shifts.json'), flush_delay=0)
+    store.create({'date': '2025-11-20', 'start_time': '09:00', 'end_time': '17:00',
+                  'employee': 'кассир1', 'role': 'cashier'})
+    store.create({'date': '2025-11-20', 'start_time': '9:30', 'end_time': '12:00',
+                  'employee': 'кассир2', 'role': 'cashier'})
+    assert store.spans('2025-11-20', '2025-11-20') == [
+        ('2025-11-20', 'cashier', 540, 1020),
+        ('2025-11-20', 'cashier', '9:30', 720),
+    ]
+
+    rules = {'cashier': [{'start': '10:00', 'end': '12:00', 'min': 2, 'max': 2}]}
+    report = CoverageCache(store, rules).report(['2025-11-20'])
+    assert report[0]['roles']['cashier'][0]['status'] == 'ok'
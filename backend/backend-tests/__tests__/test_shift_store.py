@@ -0,0 +1,179 @@
+import pytest
+import json
+import os
+import sys
+import time
+
+# Добавляем путь к бэкенду
+sys.path.append('/home/kalikrit/myshift')
+
+from shift_store import ShiftStore
+
+SHIFT = {
+    'date': '2025-11-20',
+    'start_time': '09:00',
+    'end_time': '17:00',
+    'employee': 'кассир1',
+    'role': 'cashier'
+}
+
+@pytest.fixture
+def shifts_path(tmp_path):
+    """Путь к файлу смен во временной папке"""
+    return str(tmp_path / 'shifts.json')
+
+def test_write_behind_batches_changes(shifts_path):
+    """Изменения попадают на диск одной записью после flush"""
+    store = ShiftStore(shifts_path, flush_delay=60)
+    first = store.create(SHIFT)
+    second = store.create(SHIFT)
+    assert not os.path.exists(shifts_path)
+
+    # Правка после проверки версии записывается сразу, вместе с отложенными сменами
+    store.update(first['id'], {'employee': 'кассир2'})
+    assert os.path.exists(shifts_path)
+    assert store.flush()
+
+    with open(shifts_path, encoding='utf-8') as f:
+        saved = json.load(f)
+    assert [s['id'] for s in saved] == [first['id'], second['id']]
+    assert saved[0]['employee'] == 'кассир2'
+    assert not any(name.endswith('.tmp') for name in os.listdir(os.path.dirname(shifts_path)))
+
+def test_timer_flushes_automatically(shifts_path):
+    """Отложенная запись срабатывает сама по таймеру"""
+    store = ShiftStore(shifts_path, flush_delay=0.05)
+    store.create(SHIFT)
+
+    deadline = time.time() + 2
+    while not os.path.exists(shifts_path) and time.time() < deadline:
+        time.sleep(0.01)
+
+    with open(shifts_path, encoding='utf-8') as f:
+        assert len(json.load(f)) == 1
+
+def test_reloads_after_external_change(shifts_path):
+    """Файл, изменённый другим процессом, перечитывается"""
+    store = ShiftStore(shifts_path, flush_delay=0)
+    store.create(SHIFT)
+    assert store.count() == 1
+
+    with open(shifts_path, 'w', encoding='utf-8') as f:
+        json.dump([{**SHIFT, 'id': 7}, {**SHIFT, 'id': 8}], f)
+
+    assert [s['id'] for s in store.all()] == [7, 8]
+    assert store.create(SHIFT)['id'] == 9
+
+def test_indexes_follow_updates_and_deletes(shifts_path):
+    """Индексы по дате и сотруднику обновляются при изменениях"""
+    store = ShiftStore(shifts_path, flush_delay=60)
+    shift = store.create(SHIFT)
+    other = store.create({**SHIFT, 'date': '2025-11-21'})
+
+    store.update(shift['id'], {'date': '2025-11-22', 'employee': 'кассир3'})
+    assert store.by_date('2025-11-20') == []
+    assert [s['id'] for s in store.by_date('2025-11-22')] == [shift['id']]
+    assert [s['id'] for s in store.by_employee('кассир3', '2025-11-22')] == [shift['id']]
+    assert [s['id'] for s in store.all()] == [shift['id'], other['id']]
+
+    assert store.delete(other['id'])
+    assert store.get(other['id']) is None
+    assert store.by_employee('кассир1', '2025-11-21') == []
+
+def test_date_range(shifts_path):
+    """Выборка за период включает обе границы"""
+    store = ShiftStore(shifts_path, flush_delay=60)
+    for day in ('2025-10-31', '2025-11-01', '2025-11-15', '2025-11-30', '2025-12-01'):
+        store.create({**SHIFT, 'date': day})
+
+    dates = [s['date'] for s in store.date_range('2025-11-01', '2025-11-30')]
+    assert dates == ['2025-11-01', '2025-11-15', '2025-11-30']
+    assert len(store.date_range(date_from='2025-11-30')) == 2
+    assert len(store.date_range(date_to='2025-10-31')) == 1
+
+def _create_in_process(path, count):
+    store = ShiftStore(path, flush_delay=0)
+    for _ in range(count):
+        store.create(SHIFT)
+
+def test_concurrent_processes_keep_all_shifts(shifts_path):
+    """Несколько процессов пишут в один файл без потерь и дублей ID"""
+    import multiprocessing
+    workers = [multiprocessing.Process(target=_create_in_process, args=(shifts_path, 20)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    ids = [s['id'] for s in ShiftStore(shifts_path).all()]
+    assert len(ids) == 80
+    assert len(set(ids)) == 80
+
+def test_pending_changes_survive_external_write(shifts_path):
+    """Несохранённые изменения накатываются поверх чужой записи"""
+    ours = ShiftStore(shifts_path, flush_delay=60)
+    theirs = ShiftStore(shifts_path, flush_delay=0)
+    mine = ours.create(SHIFT)
+    other = theirs.create(SHIFT)
+    assert mine['id'] != other['id']
+
+    ours.flush()
+    assert {s['id'] for s in ShiftStore(shifts_path).all()} == {mine['id'], other['id']}
+
+def test_version_conflict(shifts_path):
+    """Обновление с устаревшей версией отклоняется"""
+    from shift_store import VersionConflict
+    store = ShiftStore(shifts_path, flush_delay=60)
+    shift = store.create(SHIFT)
+    assert shift['version'] == 1
+
+    updated = store.update(shift['id'], {'employee': 'кассир2'}, expected_version=1)
+    assert updated['version'] == 2
+
+    with pytest.raises(VersionConflict) as e:
+        store.update(shift['id'], {'employee': 'кассир3'}, expected_version=1)
+    assert e.value.current['employee'] == 'кассир2'
+
+def test_iter_shifts_cursor(shifts_path):
+    """Обход по курсору идёт по возрастанию ID порциями"""
+    store = ShiftStore(shifts_path, flush_delay=60)
+    ids = [store.create(SHIFT)['id'] for _ in range(10)]
+    store.delete(ids[3])
+
+    assert [s['id'] for s in store.iter_shifts(chunk_size=3)] == ids[:3] + ids[4:]
+    assert [s['id'] for s in store.iter_shifts(after_id=ids[1], limit=4, chunk_size=3)] == [ids[2]] + ids[4:7]
+    assert list(store.iter_shifts(after_id=ids[-1])) == []
+
+@pytest.mark.parametrize('flush_delay', [None, 60])
+def test_version_check_across_store_instances(shifts_path, flush_delay):
+    """Два воркера на одном файле: вторая правка той же версии - конфликт"""
+    from shift_store import VersionConflict
+    kwargs = {} if flush_delay is None else {'flush_delay': flush_delay}
+    first = ShiftStore(shifts_path, **kwargs)
+    second = ShiftStore(shifts_path, **kwargs)
+    shift = first.create(SHIFT)
+    first.flush()
+
+    assert second.update(shift['id'], {'employee': 'кассир2'}, expected_version=1)['version'] == 2
+    with pytest.raises(VersionConflict):
+        first.update(shift['id'], {'employee': 'кассир3'}, expected_version=1)
+    assert ShiftStore(shifts_path).get(shift['id'])['employee'] == 'кассир2'
+
+def test_failed_write_is_reported_and_rolled_back(shifts_path, monkeypatch):
+    """Ошибка записи (диск полон) доходит до вызывающего, а память откатывается к файлу"""
+    store = ShiftStore(shifts_path, flush_delay=0)
+    kept = store.create(SHIFT)
+
+    def full_disk(*args):
+        raise OSError(28, 'No space left on device')
+
+    with monkeypatch.context() as m:
+        m.setattr(os, 'replace', full_disk)
+        with pytest.raises(OSError):
+            store.create(SHIFT)
+        with pytest.raises(OSError):
+            store.update(kept['id'], {'employee': 'кассир2'})
+
+    assert store.all() == [kept]
+    assert [s['id'] for s in ShiftStore(shifts_path).all()] == [kept['id']]
+    assert not [name for name in os.listdir(os.path.dirname(shifts_path)) if name.endswith('.tmp')]
@@ -0,0 +1,102 @@
+import asyncio
+import json
+import sys
+from datetime import date, timedelta
+
+import pytest
+
+# Добавляем путь к бэкенду
+sys.path.append('/home/kalikrit/myshift')
+
+import snapshot
+from async_repository import AsyncShiftRepository
+from conftest import shift
+from shift_records import ShiftRecord
+from shift_store import VersionConflict
+
+OLD = {'id': 1, 'date': '2024-01-15', 'start_time': '09:00', 'end_time': '17:00',
+       'employee': 'кассир1', 'role': 'cashier', 'version': 1}
+
+
+def test_snapshot_keeps_shifts_outside_segment_window():
+    # Опечатка в годе не должна прятать остальные смены из снимка
+    shifts = [{**shift('2026-10-%02d' % day, '10:00', '14:00', 'кассир2'), 'id': day, 'version': 1} for day in (1, 2, 3)]
+    shifts.append({**shift('9999-10-01', '10:00', '14:00', 'кассир2'), 'id': 4, 'version': 1})
+    data = snapshot.encode_snapshot([ShiftRecord.from_dict(s) for s in shifts])
+    block = snapshot.shared_memory.SharedMemory(create=True, size=len(data))
+    try:
+        block.buf[:len(data)] = data
+        view = snapshot.Snapshot(block)
+        assert len(view.segment) == 3 and [r.id for r in view.irregular] == [4]
+        assert view.count() == 4 and view.get(4).to_dict() == shifts[3]
+        del view
+    finally:
+        block.close()
+        block.unlink()
+
+
+@pytest.fixture
+def master(monkeypatch):
+    monkeypatch.setenv('MYSHIFT_FLUSH_DELAY', '0')
+    monkeypatch.setenv('MYSHIFT_ARCHIVE_DAYS', '30')
+    master = snapshot.start_master()
+    yield master
+    master.stop()
+
+
+@pytest.fixture
+def path(tmp_path):
+    path = tmp_path / 'shifts.json'
+    path.write_text(json.dumps([OLD]), encoding='utf-8')
+    return str(path)
+
+
+def test_worker_reads_snapshot_and_forwards_writes(master, path):
+    store = snapshot.SharedShiftStore(path, snapshot.SnapshotClient(master.address, master.key))
+    events = []
+    store.add_listener(lambda kind, old, new: events.append((kind, (new or old or {}).get('id'))))
+
+    # Старый месяц мастер перенёс в архив, воркер читает его через mmap
+    assert store.is_archived(1) and store.get(1) == OLD
+    today = date.today().isoformat()
+    created = store.create(shift(today, '10:00', '14:00', 'кассир2'))
+    assert events == [('create', created['id'])]
+    assert store.by_date(today) == [created]
+    assert store.date_range('2024-01-01', None) == [OLD, created]
+    assert store.by_employee('кассир2', today) == [created]
+    odd = store.create(shift('завтра', '10:00', '14:00', 'кассир2'))
+    assert store.by_date('завтра') == [odd] and store.count() == 3
+    assert [s['id'] for s in store.iter_shifts(after_id=1)] == [created['id'], odd['id']]
+
+    # Запись другого воркера: новое поколение и событие update
+    other = snapshot.SnapshotClient(master.address, master.key)
+    generation = store.generation
+    other.request('call', path, 'update', (created['id'], {'end_time': '18:00'}, None))
+    assert store.get(created['id'])['end_time'] == '18:00' and store.generation > generation
+    assert events[-1] == ('update', created['id'])
+
+    with pytest.raises(VersionConflict):
+        store.update(created['id'], {'end_time': '19:00'}, 1)
+    with pytest.raises(snapshot.ArchivedShift):
+        store.delete(1)
+
+    # В транзакции воркер видит свои записи до её завершения
+    with store.transaction():
+        extra = store.create(shift((date.today() + timedelta(days=1)).isoformat(), '10:00', '14:00', 'кассир2'))
+        assert store.get(extra['id']) == extra
+    saved = json.loads(open(path, encoding='utf-8').read())
+    assert sorted(s['id'] for s in saved) == [created['id'], odd['id'], extra['id']]
+
+
+def test_async_repository_reads_shared_store(master, path):
+    store = snapshot.SharedShiftStore(path, snapshot.SnapshotClient(master.address, master.key))
+
+    async def run():
+        repository = AsyncShiftRepository(store)
+        await repository.start()
+        created = await repository.create(shift('2024-01-15', '10:00', '14:00', 'кассир2'))
+        assert await repository.by_date('2024-01-15') == [OLD, created]
+        assert await repository.get(created['id']) == created
+        await repository.stop()
+
+    asyncio.run(run())
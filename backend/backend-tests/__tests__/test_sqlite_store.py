@@ -0,0 +1,85 @@
+import pytest
+import json
+import sys
+
+# Добавляем путь к бэкенду
+sys.path.append('/home/kalikrit/myshift')
+
+from shift_store import VersionConflict
+from sqlite_store import SqliteShiftStore, migrate
+
+SHIFT = {
+    'date': '2025-11-20',
+    'start_time': '09:00',
+    'end_time': '17:00',
+    'employee': 'кассир1',
+    'role': 'cashier'
+}
+
+@pytest.fixture
+def store(tmp_path):
+    """Пустая SQLite база во временной папке"""
+    return SqliteShiftStore(str(tmp_path / 'myshift.sqlite3'))
+
+def test_wal_mode(store):
+    """База открывается в режиме WAL"""
+    mode = store._connect().execute('PRAGMA journal_mode').fetchone()[0]
+    assert mode == 'wal'
+
+def test_crud_and_lookups(store):
+    """Создание, выборки по индексам, обновление и удаление"""
+    shift = store.create({**SHIFT, 'required': True})
+    store.create({**SHIFT, 'date': '2025-11-21'})
+
+    assert store.get(shift['id']) == {'id': shift['id'], **SHIFT, 'required': True, 'version': 1}
+    assert [s['id'] for s in store.by_employee('кассир1', '2025-11-20')] == [shift['id']]
+    assert len(store.date_range('2025-11-20', '2025-11-21')) == 2
+
+    updated = store.update(shift['id'], {'employee': 'кассир2', 'role': None}, expected_version=1)
+    assert updated['employee'] == 'кассир2'
+    assert updated['role'] == 'cashier'
+    assert updated['version'] == 2
+    with pytest.raises(VersionConflict):
+        store.update(shift['id'], {'employee': 'кассир3'}, expected_version=1)
+    assert store.by_date('2025-11-20')[0]['employee'] == 'кассир2'
+
+    assert store.delete(shift['id'])
+    assert not store.delete(shift['id'])
+    assert store.count() == 1
+
+def test_migrate_json_files(tmp_path):
+    """Перенос shifts.json и users.json в базу"""
+    shifts_file = tmp_path / 'shifts.json'
+    users_file = tmp_path / 'users.json'
+    shifts_file.write_text(json.dumps([{'id': 14, **SHIFT, 'required': True}]), encoding='utf-8')
+    users_file.write_text(json.dumps([{'id': 1, 'username': 'admin', 'role': 'admin'}]), encoding='utf-8')
+    db_file = str(tmp_path / 'myshift.sqlite3')
+
+    assert migrate(str(shifts_file), str(users_file), db_file) == {'shifts': 1, 'users': 1}
+
+    store = SqliteShiftStore(db_file)
+    assert store.get(14)['required'] is True
+    assert store.get_users()[0]['username'] == 'admin'
+    assert store.create(SHIFT)['id'] == 15
+
+    with pytest.raises(RuntimeError):
+        migrate(str(shifts_file), str(users_file), db_file)
+
+def test_listeners_after_commit(store, tmp_path):
+    """События уходят после COMMIT, откат их отменяет, чужая запись даёт reload"""
+    events = []
+    store.add_listener(lambda kind, old, new: events.append(kind))
+
+    with pytest.raises(RuntimeError):
+        with store.transaction():
+            store.create(SHIFT)
+            raise RuntimeError()
+    assert events == []
+
+    shift = store.create(SHIFT)
+    store.delete(shift['id'])
+    assert events == ['create', 'delete']
+
+    SqliteShiftStore(store.path).create(SHIFT)
+    store.refresh()
+    assert events[-1] == 'reload'
@@ -0,0 +1,43 @@
+import json
+import sys
+
+# Добавляем путь к бэкенду
+sys.path.append('/home/kalikrit/myshift')
+
+import database as db
+from conftest import SHIFT, token_headers
+
+def test_store_path():
+    """Магазин default остаётся в исходном файле, остальные - в своих"""
+    assert db.store_path('data/shifts.json') == 'data/shifts.json'
+    assert db.store_path('data/shifts.json', 'msk-1') == 'data/shifts.msk-1.json'
+    # Имена старых пользователей не проверялись: они кодируются, а не выходят из каталога
+    assert db.store_path('data/shifts.json', '../etc') == 'data/shifts.%2E%2E%2Fetc.json'
+    assert db.store_path('data/shifts.json', 'store 7') == 'data/shifts.store%207.json'
+
+def test_shifts_isolated_per_store(client, tmp_path):
+    """Смены одного магазина не видны другому и лежат в отдельном файле"""
+    response = client.post('/shifts', json=SHIFT, headers=token_headers(store='msk-1'))
+    assert response.status_code == 201
+
+    assert len(json.loads(client.get('/shifts', headers=token_headers(store='msk-1')).data)) == 1
+    assert json.loads(client.get('/shifts', headers=token_headers(store='spb-2')).data) == []
+    assert json.loads(client.get('/shifts/2025-11-20', headers=token_headers(store='default')).data) == []
+
+    db.get_shift_store(str(tmp_path / 'shifts.json'), 'msk-1').flush()
+    assert (tmp_path / 'shifts.msk-1.json').exists()
+    assert not (tmp_path / 'shifts.spb-2.json').exists()
+
+def test_register_rejects_bad_store(client):
+    """Имя магазина из register проверяется до записи пользователя"""
+    response = client.post('/auth/register', headers=token_headers(store='default'),
+                           json={'username': 'u', 'password': 'p', 'store': '../x'})
+    assert response.status_code == 400
+
+def test_legacy_store_name(client, tmp_path):
+    """Пользователь с магазином, зарегистрированным до проверки имён, работает со своими сменами"""
+    assert client.post('/shifts', json=SHIFT, headers=token_headers(store='store 7')).status_code == 201
+    assert len(json.loads(client.get('/shifts', headers=token_headers(store='store 7')).data)) == 1
+    assert json.loads(client.get('/shifts', headers=token_headers(store='store_7')).data) == []
+    db.get_shift_store(str(tmp_path / 'shifts.json'), 'store 7').flush()
+    assert (tmp_path / 'shifts.store%207.json').exists()
@@ -0,0 +1,60 @@
+import sys
+
+import pytest
+
+# Добавляем путь к бэкенду
+sys.path.append('/home/kalikrit/myshift')
+
+import summary
+from conftest import shift
+from shift_store import ShiftStore
+from simple_app import COVERAGE_RULES
+
+
+def test_month_helpers():
+    assert len(summary.month_dates('2024-02')) == 29
+    assert summary.month_dates('2025-11')[-1] == '2025-11-30'
+    assert summary.shift_minutes('22:00', '06:00') == 480
+    assert summary.shift_minutes(540, 1020) == 480
+    assert summary.shift_minutes('x', '06:00') == 0
+    for bad in ('2025-13', '2025-1', 'november'):
+        with pytest.raises(ValueError):
+            summary.parse_month(bad)
+
+
+def test_incremental_updates_match_full_rebuild(tmp_path):
+    store = ShiftStore(str(tmp_path / 'shifts.json'))
+    store.create(shift('2025-11-01', '09:00', '17:00'))
+    rollup = summary.MonthSummary(store, COVERAGE_RULES)
+    assert rollup.report('2025-11')['days'][0]['roles'] == {'cashier': {'shifts': 1, 'hours': 8.0}}
+
+    night = store.create(shift('2025-11-01', '22:00', '06:00', employee='кассир2'))
+    store.create(shift('2025-11-02', '08:00', '12:30', employee='менеджер1', role='manager'))
+    store.create(shift('2025-12-01', '08:00', '12:00'))
+    store.update(night['id'], {'end_time': '02:00'})
+
+    report = rollup.report('2025-11')
+    assert report == summary.MonthSummary(store, COVERAGE_RULES).report('2025-11')
+    assert report['days'][0]['roles'] == {'cashier': {'shifts': 2, 'hours': 12.0}}
+    assert report['totals'] == {'shift_count': 3, 'roles': {'cashier': {'shifts': 2, 'hours': 12.0},
+                                                            'manager': {'shifts': 1, 'hours': 4.5}}}
+
+    store.delete(night['id'])
+    assert rollup.report('2025-11')['days'][0]['shift_count'] == 1
+
+
+def test_month_endpoint(client, headers):
+    client.post('/shifts', json=shift('2025-11-20', '09:00', '17:00'), headers=headers)
+
+    response = client.get('/summary/month/2025-11', headers=headers)
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['month'] == '2025-11' and len(body['days']) == 30
+    day = body['days'][19]
+    assert day['date'] == '2025-11-20' and day['shift_count'] == 1
+    assert day['coverage'] == 'critical' and day['issues'] > 0
+    assert body['days'][0]['coverage'] == 'critical' and body['days'][0]['shift_count'] == 0
+
+    again = client.get('/summary/month/2025-11', headers={**headers, 'If-None-Match': response.headers['ETag']})
+    assert again.status_code == 304
+    assert client.get('/summary/month/2025-1', headers=headers).status_code == 400
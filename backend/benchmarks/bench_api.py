@@ -0,0 +1,380 @@
+"""Бенчмарк API: задержки p50/p90/p99 и пропускная способность по сценариям.
+
+Данные генерируются заново (data.py) во временном каталоге. Запросы идут
+через тестовый клиент Flask (без сети) или по HTTP к серверу, который
+скрипт поднимает сам (--serve) или который уже запущен (--url).
+
+    python benchmarks/bench_api.py --stores 4 --employees 50 --days 90 --out results.json
+    python benchmarks/bench_api.py --serve --workers 4 --concurrency 8
+    python benchmarks/bench_api.py --app fastapi --serve --workers 4
+    python benchmarks/bench_api.py --baseline baseline.json   # код 2 при регрессии
+
+Результаты сохраняются в JSON; --baseline сравнивает p50 и p99 с прошлым
+запуском и считает регрессией рост больше чем на --tolerance.
+"""
+import argparse
+import http.client
+import math
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from typing import List, Dict, Any, Callable, Optional, Tuple
+from urllib.parse import urlsplit
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..'))
+
+import codec
+import data
+
+# Запрос сценария: (метод, путь, тело или None)
+Request = Tuple[str, str, Optional[Dict[str, Any]]]
+
+
+# ЦЕЛИ
+
+class FlaskClientTarget:
+    """Запросы через app.test_client() в этом же процессе"""
+    name = "flask-client"
+
+    def __init__(self, dataset: Dict[str, Any]):
+        import simple_app
+        self._app = simple_app
+        self._saved = (simple_app.SHIFTS_FILE, simple_app.USERS_FILE)
+        simple_app.SHIFTS_FILE = dataset["shifts_file"]
+        simple_app.USERS_FILE = dataset["users_file"]
+        self.client = simple_app.app.test_client()
+
+    def request(self, method: str, path: str, body=None, headers=None) -> Tuple[int, bytes]:
+        response = self.client.open(path, method=method, json=body, headers=headers or {})
+        return response.status_code, response.get_data()
+
+    def close(self):
+        # Отложенная запись должна успеть до удаления временного каталога
+        from shift_store import flush_all
+        flush_all()
+        self._app.SHIFTS_FILE, self._app.USERS_FILE = self._saved
+
+
+class HttpTarget:
+    """Запросы по HTTP/1.1 с keep-alive, одно соединение на поток"""
+    name = "http"
+
+    def __init__(self, url: str):
+        parts = urlsplit(url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self._local = threading.local()
+
+    def _connection(self) -> http.client.HTTPConnection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = http.client.HTTPConnection(self.host, self.port, timeout=60)
+            connection.connect()
+            # Без Nagle: иначе маленькие ответы ждут задержанного ACK (~40 мс)
+            connection.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return connection
+
+    def request(self, method: str, path: str, body=None, headers=None) -> Tuple[int, bytes]:
+        headers = dict(headers or {})
+        payload = None
+        if body is not None:
+            payload = codec.dumps(body)
+            headers["Content-Type"] = "application/json"
+        for attempt in (1, 2):
+            connection = self._connection()
+            try:
+                connection.request(method, path, body=payload, headers=headers)
+                response = connection.getresponse()
+                return response.status, response.read()
+            except (http.client.HTTPException, OSError):
+                # Сервер закрыл keep-alive соединение - одна повторная попытка
+                connection.close()
+                self._local.connection = None
+                if attempt == 2:
+                    raise
+
+    def close(self):
+        pass
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _has_module(name: str) -> bool:
+    import importlib.util
+    return importlib.util.find_spec(name) is not None
+
+
+class ServerTarget(HttpTarget):
+    """Поднимает serve.py под gunicorn/uvicorn в отдельном процессе"""
+
+    def __init__(self, app: str, dataset: Dict[str, Any], workers: int = 1):
+        port = _free_port()
+        if app == "fastapi":
+            server = "uvicorn"
+            command = [sys.executable, '-m', 'uvicorn', 'serve:fastapi_app', '--port', str(port),
+                       '--workers', str(workers), '--log-level', 'warning']
+        elif _has_module("gunicorn"):
+            server = "gunicorn"
+            command = [sys.executable, '-m', 'gunicorn', '-w', str(workers), '-b', f'127.0.0.1:{port}',
+                       '--log-level', 'warning', 'serve:flask_app']
+        else:
+            # Без gunicorn - встроенный сервер werkzeug, один процесс
+            server = "werkzeug"
+            command = [sys.executable, 'serve.py', 'flask', str(port)]
+        self.name = f"{app}:{server}"
+        env = {**os.environ, "MYSHIFT_BENCH_DATA": dataset["directory"]}
+        if workers > 1:
+            # Несколько процессов на одном файле: каждое изменение сразу на диск
+            env["MYSHIFT_FLUSH_DELAY"] = "0"
+        self.process = subprocess.Popen(command, cwd=BENCH_DIR, env=env,
+                                        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        super().__init__(f"http://127.0.0.1:{port}")
+        self._wait_ready()
+
+    def _wait_ready(self, timeout: float = 30.0):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"Сервер завершился с кодом {self.process.returncode}")
+            try:
+                if self.request("GET", "/")[0] == 200:
+                    return
+            except OSError:
+                self._local.connection = None
+            time.sleep(0.2)
+        self.close()
+        raise RuntimeError("Сервер не ответил за отведённое время")
+
+    def close(self):
+        self.process.terminate()
+        try:
+            self.process.wait(10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+# ИЗМЕРЕНИЕ
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Перцентиль по ближайшему рангу"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, math.ceil(q / 100 * len(sorted_values)) - 1)
+    return sorted_values[min(index, len(sorted_values) - 1)]
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> Dict[str, Any]:
+    values = sorted(latencies)
+    return {
+        "requests": len(values),
+        "errors": errors,
+        "p50_ms": round(percentile(values, 50) * 1000, 3),
+        "p90_ms": round(percentile(values, 90) * 1000, 3),
+        "p99_ms": round(percentile(values, 99) * 1000, 3),
+        "mean_ms": round(sum(values) / len(values) * 1000, 3) if values else 0.0,
+        "rps": round(len(values) / elapsed, 1) if elapsed > 0 else 0.0,
+    }
+
+
+def measure(target, requests: List[Request], headers: Dict[str, str], expect: Tuple[int, ...],
+            concurrency: int = 1, on_response: Optional[Callable[[bytes], None]] = None) -> Dict[str, Any]:
+    latencies: List[float] = []
+    errors = 0
+    lock = threading.Lock()
+
+    def one(req: Request):
+        nonlocal errors
+        method, path, body = req
+        started = time.perf_counter()
+        try:
+            status, payload = target.request(method, path, body, headers)
+        except OSError:
+            status, payload = 0, b''
+        took = time.perf_counter() - started
+        with lock:
+            latencies.append(took)
+            if status not in expect:
+                errors += 1
+            elif on_response is not None:
+                on_response(payload)
+
+    started = time.perf_counter()
+    if concurrency <= 1:
+        for req in requests:
+            one(req)
+    else:
+        with ThreadPoolExecutor(concurrency) as pool:
+            list(pool.map(one, requests))
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+
+# СЦЕНАРИИ
+
+def run_scenarios(target, dataset: Dict[str, Any], app: str = "flask", count: int = 200,
+                  concurrency: int = 1, only: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+    dates = dataset["dates"]
+    username = dataset["users"][0]
+    results: Dict[str, Dict[str, Any]] = {}
+
+    def wanted(name):
+        return only is None or name in only
+
+    headers: Dict[str, str] = {}
+    if app == "flask":
+        login = ("POST", "/auth/login", {"username": username, "password": dataset["password"]})
+        status, payload = target.request(*login)
+        if status != 200:
+            raise RuntimeError(f"Вход {username} не удался: {status} {payload[:200]!r}")
+        headers = {"Authorization": f"Bearer {codec.loads(payload)['token']}"}
+        if wanted("login"):
+            # bcrypt дорогой: для входа меньше запросов
+            results["login"] = measure(target, [login] * max(1, count // 10), {}, (200,), concurrency)
+
+    # Чтения: разогрев, чтобы не мерить первую загрузку файла
+    target.request("GET", f"/shifts/{dates[0]}", None, headers)
+    week = (dates[0], dates[min(6, len(dates) - 1)])
+    reads = {
+        "list_all": [("GET", "/shifts", None)] * max(1, count // 10),
+        "list_week": [("GET", f"/shifts?from={week[0]}&to={week[1]}", None)] * count,
+        "by_date": [("GET", f"/shifts/{dates[i % len(dates)]}", None) for i in range(count)],
+    }
+    for name, requests in reads.items():
+        if wanted(name):
+            results[name] = measure(target, requests, headers, (200,), concurrency)
+
+    created: List[Dict[str, Any]] = []
+    # Свой сотрудник на каждую смену: одинаковые смены одного сотрудника отклоняются как пересечение
+    new_shifts = [{"date": dates[-1], "start_time": "09:00", "end_time": "13:00",
+                   "employee": f"bench{i}", "role": "cashier"} for i in range(count)]
+    if wanted("create") or wanted("update") or wanted("delete"):
+        results["create"] = measure(target, [("POST", "/shifts", shift) for shift in new_shifts], headers,
+                                    (200, 201), concurrency, lambda payload: created.append(codec.loads(payload)))
+    if app != "flask":
+        return {name: value for name, value in results.items() if wanted(name)}
+
+    if wanted("update"):
+        results["update"] = measure(target, [("PUT", f"/shifts/{s['id']}", {"end_time": "14:00"}) for s in created],
+                                    headers, (200,), concurrency)
+    if created:
+        # Созданные смены удаляются в любом случае, чтобы не менять данные
+        results["delete"] = measure(target, [("DELETE", f"/shifts/{s['id']}", None) for s in created],
+                                    headers, (200,), concurrency)
+    if wanted("report"):
+        report = ("GET", f"/reports/hours?from={dates[0]}&to={dates[-1]}&group_by=employee", None)
+        results["report"] = measure(target, [report] * max(1, count // 10), headers, (200,), concurrency)
+    if wanted("generate"):
+        # Генерация разрешена только для будущих дат без смен
+        first = date.today() + timedelta(days=400)
+        days = [(first + timedelta(days=i)).isoformat() for i in range(max(1, count // 10))]
+        results["generate"] = measure(target, [("POST", f"/shifts/generate/{d}", None) for d in days],
+                                      headers, (200,), concurrency)
+    return {name: value for name, value in results.items() if wanted(name)}
+
+
+# СРАВНЕНИЕ С БАЗОВЫМ ЗАПУСКОМ
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float = 0.25) -> List[Dict[str, Any]]:
+    """Сценарии, у которых p50 или p99 выросли больше чем на tolerance"""
+    regressions = []
+    for name, result in current["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(name)
+        if not base:
+            continue
+        for metric in ("p50_ms", "p99_ms"):
+            if base[metric] > 0 and result[metric] > base[metric] * (1 + tolerance):
+                regressions.append({"scenario": name, "metric": metric,
+                                    "baseline": base[metric], "current": result[metric],
+                                    "change": round(result[metric] / base[metric] - 1, 3)})
+        if result["errors"] > base.get("errors", 0):
+            regressions.append({"scenario": name, "metric": "errors",
+                                "baseline": base.get("errors", 0), "current": result["errors"], "change": None})
+    return regressions
+
+
+def print_table(report: Dict[str, Any]):
+    print(f"{report['meta']['target']}: {report['meta']['dataset']['shifts']} смен, "
+          f"concurrency {report['meta']['concurrency']}")
+    print(f"{'scenario':<12}{'n':>7}{'err':>5}{'p50, ms':>10}{'p90, ms':>10}{'p99, ms':>10}{'rps':>9}")
+    for name, r in report["scenarios"].items():
+        print(f"{name:<12}{r['requests']:>7}{r['errors']:>5}{r['p50_ms']:>10.2f}"
+              f"{r['p90_ms']:>10.2f}{r['p99_ms']:>10.2f}{r['rps']:>9.1f}")
+
+
+def run(args) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory(prefix="myshift-bench-") as directory:
+        dataset = data.generate(directory, args.stores, args.employees, args.days)
+        if args.url:
+            target = HttpTarget(args.url)
+        elif args.serve:
+            target = ServerTarget(args.app, dataset, args.workers)
+        elif args.app == "flask":
+            target = FlaskClientTarget(dataset)
+        else:
+            raise SystemExit("FastAPI приложение меряется только через --serve или --url")
+        try:
+            scenarios = run_scenarios(target, dataset, args.app, args.requests,
+                                      args.concurrency, args.only.split(',') if args.only else None)
+        finally:
+            target.close()
+
+    return {
+        "meta": {
+            "target": f"{args.app}:{args.url}" if args.url else target.name,
+            "workers": args.workers,
+            "concurrency": args.concurrency,
+            "dataset": {"stores": args.stores, "employees": args.employees,
+                        "days": args.days, "shifts": dataset["shifts"]},
+            "codec": codec.CODEC,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "scenarios": scenarios,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк API смен")
+    parser.add_argument('--stores', type=int, default=1)
+    parser.add_argument('--employees', type=int, default=50)
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--requests', type=int, default=200, help='запросов на сценарий')
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--only', help='сценарии через запятую')
+    parser.add_argument('--app', choices=['flask', 'fastapi'], default='flask')
+    parser.add_argument('--serve', action='store_true', help='поднять сервер (serve.py) в отдельном процессе')
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--url', help='уже запущенный сервер с данными data.py с теми же --stores/--employees/--days')
+    parser.add_argument('--out', help='сохранить результаты в JSON')
+    parser.add_argument('--baseline', help='JSON прошлого запуска для сравнения')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    args = parser.parse_args()
+
+    report = run(args)
+    print_table(report)
+    if args.out:
+        with open(args.out, 'wb') as f:
+            f.write(codec.dumps_file(report, pretty=True))
+
+    if args.baseline:
+        with open(args.baseline, 'rb') as f:
+            regressions = compare(report, codec.loads(f.read()), args.tolerance)
+        for r in regressions:
+            print(f"РЕГРЕССИЯ {r['scenario']} {r['metric']}: {r['baseline']} -> {r['current']}")
+        if regressions:
+            sys.exit(2)
+
+
+if __name__ == '__main__':
+    main()
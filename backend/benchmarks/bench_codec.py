@@ -0,0 +1,113 @@
+"""Сравнение кодеков JSON на синтетических файлах смен.
+
+Запуск из папки backend:
+    python benchmarks/bench_codec.py --sizes 10000,100000,1000000
+
+Для каждого размера меряется запись и чтение файла смен: прежний формат
+(json, indent=2), компактный json и orjson, если он установлен.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+ROLES = ["cashier", "manager"]
+
+
+def make_shifts(count: int, seed: int = 1):
+    rng = random.Random(seed)
+    employees = [f"сотрудник{i}" for i in range(200)]
+    shifts = []
+    for i in range(count):
+        start = rng.randrange(7, 15)
+        shifts.append({
+            "id": i + 1,
+            "date": f"2025-{rng.randrange(1, 13):02d}-{rng.randrange(1, 29):02d}",
+            "start_time": f"{start:02d}:00",
+            "end_time": f"{start + rng.choice((4, 6, 8)):02d}:00",
+            "employee": rng.choice(employees),
+            "role": rng.choice(ROLES),
+            "version": 1,
+        })
+    return shifts
+
+
+CODECS = {
+    "json-indent": (
+        lambda data: json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8'),
+        json.loads,
+    ),
+    "json-compact": (
+        lambda data: json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8'),
+        json.loads,
+    ),
+}
+if orjson is not None:
+    CODECS["orjson"] = (orjson.dumps, orjson.loads)
+
+
+def best_of(fn, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+    return min(times)
+
+
+def run(sizes, repeat: int):
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            shifts = make_shifts(size)
+            for name, (dumps, loads) in CODECS.items():
+                path = os.path.join(tmp, f"{name}.json")
+
+                def write():
+                    with open(path, 'wb') as f:
+                        f.write(dumps(shifts))
+
+                def read():
+                    with open(path, 'rb') as f:
+                        return loads(f.read())
+
+                write_time = best_of(write, repeat)
+                read_time = best_of(read, repeat)
+                results.append({
+                    "codec": name,
+                    "shifts": size,
+                    "bytes": os.path.getsize(path),
+                    "write_s": round(write_time, 4),
+                    "read_s": round(read_time, 4),
+                })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='10000,100000,1000000')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--json', action='store_true', help='вывести результаты в JSON')
+    args = parser.parse_args()
+
+    results = run([int(s) for s in args.sizes.split(',')], args.repeat)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'codec':<14}{'shifts':>10}{'MB':>9}{'write, s':>11}{'read, s':>10}")
+    for r in results:
+        print(f"{r['codec']:<14}{r['shifts']:>10}{r['bytes'] / 1e6:>9.1f}{r['write_s']:>11.3f}{r['read_s']:>10.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""Синтетические данные для бенчмарков: N магазинов x M сотрудников x D дней.
+
+Каждый магазин получает свой файл смен (shifts.<магазин>.json, первый
+магазин - default, shifts.json) и менеджера в общем users.json. Сотрудник
+работает примерно 5 дней из 7, одну смену в день.
+
+    python benchmarks/data.py --out /tmp/myshift-bench --stores 4 --employees 50 --days 90
+"""
+import argparse
+import os
+import random
+import sys
+from datetime import date, timedelta
+from typing import List, Dict, Any
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import codec
+import database as db
+from auth import hash_password
+
+PASSWORD = "bench-password"
+START_DATE = date(2025, 1, 6)
+ROLES = ["cashier"] * 4 + ["manager"]
+SHIFT_TEMPLATES = [("07:00", "15:00"), ("09:00", "17:00"), ("12:00", "20:00"), ("10:00", "14:00")]
+
+
+def store_names(stores: int) -> List[str]:
+    return [db.DEFAULT_STORE] + [f"store{i}" for i in range(1, stores)]
+
+
+def make_shifts(employees: int, days: int, start: date = START_DATE,
+                store: str = db.DEFAULT_STORE, seed: int = 1) -> List[Dict[str, Any]]:
+    """Смены одного магазина с ID от 1"""
+    rng = random.Random(f"{seed}-{store}")
+    staff = [(f"{store}-emp{i}", ROLES[i % len(ROLES)]) for i in range(employees)]
+    shifts = []
+    for offset in range(days):
+        day = (start + timedelta(days=offset)).isoformat()
+        for name, role in staff:
+            if rng.random() < 5 / 7:
+                start_time, end_time = rng.choice(SHIFT_TEMPLATES)
+                shifts.append({
+                    "id": len(shifts) + 1,
+                    "date": day,
+                    "start_time": start_time,
+                    "end_time": end_time,
+                    "employee": name,
+                    "role": role,
+                    "version": 1,
+                })
+    return shifts
+
+
+def generate(directory: str, stores: int = 1, employees: int = 50, days: int = 30,
+             start: date = START_DATE, seed: int = 1) -> Dict[str, Any]:
+    """Пишет файлы смен и пользователей, возвращает описание набора"""
+    os.makedirs(directory, exist_ok=True)
+    shifts_file = os.path.join(directory, "shifts.json")
+    users_file = os.path.join(directory, "users.json")
+
+    # Один хэш на всех: bcrypt медленный, а пароль одинаковый
+    password_hash = hash_password(PASSWORD)
+    users = []
+    total = 0
+    for store in store_names(stores):
+        shifts = make_shifts(employees, days, start, store, seed)
+        total += len(shifts)
+        with open(db.store_path(shifts_file, store), 'wb') as f:
+            codec.write_file(f, shifts)
+        users.append({"id": len(users) + 1, "username": f"manager-{store}",
+                      "password": password_hash, "role": "manager", "store": store})
+    with open(users_file, 'wb') as f:
+        codec.write_file(f, users)
+
+    return {
+        "directory": directory,
+        "shifts_file": shifts_file,
+        "users_file": users_file,
+        "stores": stores,
+        "employees": employees,
+        "days": days,
+        "shifts": total,
+        "dates": [(start + timedelta(days=i)).isoformat() for i in range(days)],
+        "users": [u["username"] for u in users],
+        "password": PASSWORD,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Синтетические shifts.json/users.json для бенчмарков")
+    parser.add_argument('--out', required=True)
+    parser.add_argument('--stores', type=int, default=1)
+    parser.add_argument('--employees', type=int, default=50)
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    info = generate(args.out, args.stores, args.employees, args.days, seed=args.seed)
+    print(f"{info['shifts']} смен в {info['stores']} магазинах: {args.out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+"""Приложения с данными бенчмарка для запуска настоящим сервером.
+
+Каталог данных берётся из MYSHIFT_BENCH_DATA (см. data.py):
+    MYSHIFT_BENCH_DATA=/tmp/myshift-bench gunicorn -w 4 serve:flask_app
+    MYSHIFT_BENCH_DATA=/tmp/myshift-bench uvicorn serve:fastapi_app --workers 4
+Без gunicorn Flask приложение можно поднять встроенным сервером:
+    python serve.py flask 8001
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import database as db
+import simple_app
+
+DATA_DIR = os.environ.get("MYSHIFT_BENCH_DATA", ".")
+
+simple_app.SHIFTS_FILE = db.SHIFTS_FILE = os.path.join(DATA_DIR, "shifts.json")
+simple_app.USERS_FILE = db.USERS_FILE = os.path.join(DATA_DIR, "users.json")
+
+flask_app = simple_app.app
+
+
+def __getattr__(name):
+    # FastAPI импортируется только когда нужен
+    if name == "fastapi_app":
+        import main
+        return main.app
+    raise AttributeError(name)
+
+
+if __name__ == '__main__':
+    from werkzeug.serving import run_simple
+    if sys.argv[1:2] != ['flask']:
+        sys.exit("usage: python serve.py flask [port]")
+    port = int(sys.argv[2]) if len(sys.argv) > 2 else 8001
+    run_simple('127.0.0.1', port, flask_app, threaded=True)
@@ -0,0 +1,267 @@
+"""Счётчики изменений и журнал для условных GET и дельта-синхронизации.
+
+Каждое создание, изменение или удаление смены получает следующий номер;
+номер запоминается для хранилища целиком и для даты смены, и из них
+строятся ETag ответов GET. Последние изменения лежат в журнале, и клиент,
+знающий свою версию, забирает только их через /shifts/changes?since=.
+
+Версия имеет вид "<эпоха>-<номер>". У файлового хранилища журнал общий
+для всех процессов (ChangeJournal, <файл>.changes): ShiftStore дописывает
+его под межпроцессной блокировкой после записи файла смен, эпоха лежит в
+заголовке журнала. Поэтому любой воркер отдаёт тот же ETag и понимает
+версию, выданную другим. Хранилища без такого журнала (SQLite) ведут его
+в памяти по событиям, и эпоха там своя у каждого процесса.
+
+Если нужных записей в журнале уже нет (переполнение, замена всех смен,
+новый файл журнала), клиенту отвечают reset и он загружает всё.
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from typing import List, Dict, Any, Optional, Tuple
+
+# Сколько последних изменений держать для /shifts/changes
+MAX_LOG_ENTRIES = 10000
+
+
+class _History:
+    """Номера изменений хранилища и дат и последние записи журнала"""
+
+    def __init__(self, epoch: str, max_entries: int):
+        self.epoch = epoch
+        self.seq = 0
+        # Изменения до этого номера из журнала уже недоступны
+        self.floor = 0
+        self.entries: "deque[Tuple[int, str, Any, Optional[Dict[str, Any]]]]" = deque(maxlen=max_entries)
+        self.date_seq: Dict[str, int] = {}
+        self.modified = time.time()
+        # Время последнего сброса: дата без своих изменений считается изменённой тогда
+        self.reset_time = self.modified
+        self.date_modified: Dict[str, float] = {}
+
+    def reset(self, seq: int, when: float):
+        """Что именно поменялось, неизвестно: все даты считаются изменёнными"""
+        self.seq = self.floor = seq
+        self.entries.clear()
+        self.date_seq.clear()
+        self.date_modified.clear()
+        self.modified = self.reset_time = when
+
+    def add(self, seq: int, kind: str, shift_id, shift: Optional[Dict[str, Any]],
+            dates: List[str], when: float):
+        self.seq = seq
+        self.modified = when
+        if len(self.entries) == self.entries.maxlen:
+            self.floor = self.entries[0][0]
+        self.entries.append((seq, kind, shift_id, shift))
+        for date in dates:
+            self.date_seq[date] = seq
+            self.date_modified[date] = when
+
+
+def _change_item(seq: int, kind: str, old, new, when: float) -> Dict[str, Any]:
+    if kind == "reload":
+        return {"seq": seq, "op": "reset", "time": when}
+    shift = new if new is not None else old
+    return {
+        "seq": seq,
+        "op": kind,
+        "id": shift["id"],
+        "shift": new,
+        "dates": [item.get("date") for item in (old, new) if item is not None],
+        "time": when,
+    }
+
+
+class ChangeJournal:
+    """Общий для процессов журнал изменений файла смен.
+
+    Первая строка - заголовок {"epoch", "floor", "time"}, дальше по строке
+    JSON на изменение. Строки дописываются под блокировкой хранилища после
+    записи файла смен, поэтому номер в журнале не опережает данные на
+    диске. Читатель дочитывает файл с запомненного смещения; разросшийся
+    журнал переписывается целиком, и читатели по новому inode читают его
+    заново.
+    """
+
+    def __init__(self, path: str, max_entries: int = MAX_LOG_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        # ChangeLog читает историю под этой же блокировкой
+        self.lock = threading.RLock()
+        self._inode = None
+        self._offset = 0
+        # Изменения после последнего сброса (для переписывания файла)
+        self._items: "deque[Dict[str, Any]]" = deque(maxlen=max_entries)
+        self._lines = 0
+        self._broken = False
+        self.history: Optional[_History] = None
+
+    def read(self) -> Optional[_History]:
+        """Дочитывает новые строки; None, пока журнала нет"""
+        with self.lock:
+            try:
+                f = open(self.path, 'rb')
+            except OSError:
+                self._inode, self._offset, self.history = None, 0, None
+                return None
+            with f:
+                inode = os.fstat(f.fileno()).st_ino
+                if inode != self._inode:
+                    self._inode, self._offset, self._lines, self.history = inode, 0, 0, None
+                    self._items.clear()
+                f.seek(self._offset)
+                data = f.read()
+            # Недописанная строка (упавший процесс) читается, когда появится её конец
+            end = data.rfind(b"\n") + 1
+            self._broken = end < len(data)
+            for line in data[:end].splitlines():
+                try:
+                    self._parse(json.loads(line))
+                except (ValueError, KeyError, TypeError):
+                    self._broken = True
+            self._offset += end
+            return self.history
+
+    def _parse(self, item: Dict[str, Any]):
+        if "epoch" in item:
+            self.history = _History(item["epoch"], self.max_entries)
+            self.history.reset(item["floor"], item["time"])
+            return
+        if self.history is None:
+            return
+        self._lines += 1
+        if item["op"] == "reset":
+            self.history.reset(item["seq"], item["time"])
+            self._items.clear()
+        else:
+            self.history.add(item["seq"], item["op"], item["id"], item["shift"], item["dates"], item["time"])
+            self._items.append(item)
+
+    def append(self, changes: List[Tuple[str, Any, Any]]) -> None:
+        """Дописывает изменения (kind, old, new); вызывать под блокировкой хранилища"""
+        history = self.read()
+        seq = history.seq if history is not None else 0
+        now = time.time()
+        items = [_change_item(seq + number, kind, old, new, now)
+                 for number, (kind, old, new) in enumerate(changes, 1)]
+        if history is None or self._broken or self._lines + len(items) > 2 * self.max_entries:
+            self._rewrite(history, items, now)
+        else:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(''.join(json.dumps(item, ensure_ascii=False) + '\n' for item in items))
+        self.read()
+
+    def _rewrite(self, history: Optional[_History], items: List[Dict[str, Any]], now: float):
+        if history is None:
+            header = {"epoch": os.urandom(4).hex(), "floor": 0, "time": now}
+        else:
+            header = {"epoch": history.epoch, "floor": history.floor, "time": history.reset_time}
+        with self.lock:
+            kept = list(self._items) if history is not None else []
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.changes-', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                for item in [header] + kept + items:
+                    f.write(json.dumps(item, ensure_ascii=False) + '\n')
+            os.replace(tmp_path, self.path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+
+class ChangeLog:
+    def __init__(self, store, max_entries: int = MAX_LOG_ENTRIES):
+        self.store = store
+        self.journal: Optional[ChangeJournal] = getattr(store, "change_journal", None)
+        self._lock = self.journal.lock if self.journal is not None else threading.Lock()
+        self._history = _History(os.urandom(4).hex(), max_entries)
+        # Журнал появится с первой записью; до неё версия у всех воркеров "0-0"
+        self._empty = _History("0", 1)
+        if self.journal is None:
+            store.add_listener(self._on_change)
+
+    @property
+    def epoch(self) -> str:
+        return self._current().epoch
+
+    def _on_change(self, kind, old, new):
+        with self._lock:
+            item = _change_item(self._history.seq + 1, kind, old, new, time.time())
+            if kind == "reload":
+                self._history.reset(item["seq"], item["time"])
+            else:
+                self._history.add(item["seq"], kind, item["id"], new, item["dates"], item["time"])
+
+    def _current(self) -> _History:
+        if self.journal is None:
+            return self._history
+        history = self.journal.read()
+        return history if history is not None else self._empty
+
+    def version(self, date: Optional[str] = None) -> str:
+        """Версия хранилища или одной даты для ETag"""
+        # Сначала данные, потом журнал: версия не опережает отданные смены
+        self.store.refresh()
+        with self._lock:
+            history = self._current()
+            if date is None:
+                return f"{history.epoch}-{history.seq}"
+            return f"{history.epoch}-{max(history.date_seq.get(date, 0), history.floor)}"
+
+    def etag(self, date: Optional[str] = None) -> Optional[str]:
+        """ETag для условного GET; None, пока у хранилища есть изменения, ещё
+        не попавшие в журнал (MYSHIFT_FLUSH_DELAY > 0): номера у них пока нет"""
+        version = self.version(date)
+        unwritten = getattr(self.store, "has_unwritten_changes", None)
+        if unwritten is not None and unwritten():
+            return None
+        return version
+
+    def last_modified(self, date: Optional[str] = None) -> float:
+        with self._lock:
+            history = self._current()
+            if date is None:
+                return history.modified
+            return history.date_modified.get(date, history.reset_time)
+
+    def changes_since(self, since: str) -> Dict[str, Any]:
+        """Изменения после версии since: последнее состояние каждой затронутой смены"""
+        self.store.refresh()
+        epoch, _, seq = since.partition("-")
+        with self._lock:
+            history = self._current()
+            current = f"{history.epoch}-{history.seq}"
+            if epoch != history.epoch or not seq.isdigit() or int(seq) < history.floor or int(seq) > history.seq:
+                return {"version": current, "reset": True, "changes": []}
+
+            latest: Dict[Any, Dict[str, Any]] = {}
+            for number, kind, shift_id, shift in history.entries:
+                if number <= int(seq):
+                    continue
+                # create + update = create, ... + delete = delete
+                first = latest.pop(shift_id, None)
+                if kind == "delete" and first is not None and first["op"] == "create":
+                    continue
+                op = "create" if first is not None and first["op"] == "create" else kind
+                latest[shift_id] = {"op": op, "id": shift_id, "shift": shift}
+            changes: List[Dict[str, Any]] = list(latest.values())
+            return {"version": current, "reset": False, "changes": changes}
+
+
+_logs: Dict[int, ChangeLog] = {}
+_logs_lock = threading.Lock()
+
+
+def get_change_log(store) -> ChangeLog:
+    """Один журнал на экземпляр хранилища"""
+    with _logs_lock:
+        log = _logs.get(id(store))
+        if log is None or log.store is not store:
+            log = _logs[id(store)] = ChangeLog(store)
+        return log
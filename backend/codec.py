@@ -0,0 +1,75 @@
+"""Кодирование JSON для файлов данных и ответов API.
+
+Если установлен orjson, используется он (в разы быстрее стандартного
+json и сразу отдаёт bytes), иначе - модуль json. MYSHIFT_JSON_CODEC=json
+отключает orjson принудительно.
+
+На диск данные пишутся без отступов: файл меньше, запись и чтение
+быстрее. MYSHIFT_JSON_PRETTY=1 возвращает отступы для чтения глазами.
+Оба формата читаются одинаково.
+"""
+import json
+import os
+from typing import Any
+
+import metrics
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if os.environ.get("MYSHIFT_JSON_CODEC", "orjson") == "json":
+    orjson = None
+
+CODEC = "orjson" if orjson is not None else "json"
+PRETTY = os.environ.get("MYSHIFT_JSON_PRETTY", "0") == "1"
+
+# Ошибка разбора у обоих кодеков - подкласс ValueError
+DecodeError = ValueError
+
+
+def dumps(data: Any) -> bytes:
+    """Компактный JSON в UTF-8 (кириллица без \\u-экранирования)"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(data)
+        except TypeError:
+            # Нестроковые ключи, целые больше 64 бит - их понимает только json
+            pass
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def loads(data) -> Any:
+    """bytes или str -> объект"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps_file(data: Any, pretty: bool = PRETTY) -> bytes:
+    """Содержимое файла данных: компактно или с отступом в 2 пробела"""
+    if not pretty:
+        return dumps(data)
+    if orjson is not None:
+        try:
+            return orjson.dumps(data, option=orjson.OPT_INDENT_2)
+        except TypeError:
+            pass
+    return json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8')
+
+
+def read_file(path: str) -> Any:
+    with metrics.phase("storage_read"):
+        with open(path, 'rb') as f:
+            raw = f.read()
+        metrics.count_bytes("read", len(raw))
+        return loads(raw)
+
+
+def write_file(f, data: Any) -> None:
+    """Пишет данные в файл, открытый в двоичном режиме"""
+    with metrics.phase("storage_write"):
+        raw = dumps_file(data)
+        f.write(raw)
+        metrics.count_bytes("write", len(raw))
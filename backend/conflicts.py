@@ -0,0 +1,216 @@
+"""Пересечения смен одного сотрудника и недостаточный отдых между днями.
+
+ConflictIndex держит для каждого сотрудника отсортированный список
+интервалов смен (минуты от начала эпохи: номер дня * 1440 + время), так
+что проверка новой смены - бинарный поиск и просмотр соседей в окне
+длины одной смены плюс отдыха, а не перебор всех смен файла. Смена с
+концом раньше начала идёт через полночь и заканчивается на следующий день.
+
+Индекс подписан на хранилище и обновляется его событиями; после
+перезагрузки хранилища (чужой процесс) перестраивается при следующем
+обращении.
+
+Виды конфликтов:
+    overlap - смены сотрудника пересекаются по времени
+    rest    - между сменами разных дней меньше min_rest_hours
+"""
+import bisect
+import os
+import threading
+from typing import List, Dict, Any, Callable, Iterable, Optional, Tuple
+
+from coverage_engine import parse_minutes, MINUTES_PER_DAY
+from scheduler import DEFAULT_MIN_REST_HOURS
+from shift_records import day_number, day_text
+
+# reject - пересечения отклоняются (409), нехватка отдыха только отмечается;
+# strict - отклоняется и то, и другое; flag - всё сохраняется с пометкой
+CONFLICT_POLICY = os.environ.get("MYSHIFT_CONFLICT_POLICY", "reject")
+
+# Интервал сотрудника: (начало, конец, ID смены)
+Interval = Tuple[int, int, Any]
+
+
+def shift_interval(shift: Dict[str, Any]) -> Optional[Tuple[int, int]]:
+    """Начало и конец смены в абсолютных минутах, None для неполной смены"""
+    day = day_number(shift.get("date"))
+    start = parse_minutes(shift.get("start_time"))
+    end = parse_minutes(shift.get("end_time"))
+    if day is None or start is None or end is None:
+        return None
+    if end <= start:
+        end += MINUTES_PER_DAY
+    base = day * MINUTES_PER_DAY
+    return base + start, base + end
+
+
+def blocking(conflicts: List[Dict[str, Any]], policy: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Конфликты, из-за которых запись отклоняется при политике policy"""
+    policy = policy or CONFLICT_POLICY
+    if policy == "flag":
+        return []
+    if policy == "strict":
+        return conflicts
+    return [c for c in conflicts if c["type"] == "overlap"]
+
+
+class ConflictIndex:
+    def __init__(self, store, rest_hours: Optional[Callable[[str], float]] = None):
+        self.store = store
+        # Отдых сотрудника в часах (ограничения ростера), по умолчанию - общий
+        self.rest_hours = rest_hours or (lambda employee: DEFAULT_MIN_REST_HOURS)
+        self._lock = threading.Lock()
+        self._by_employee: Dict[Any, List[Interval]] = {}
+        self._by_id: Dict[Any, Tuple[Any, Interval]] = {}
+        self._stale = True
+        # Как в MonthSummary: сборка, во время которой пришло событие, не сохраняется
+        self._epoch = 0
+        store.add_listener(self._on_change)
+
+    # ПОДДЕРЖКА ИНДЕКСА
+
+    def _on_change(self, kind, old, new):
+        with self._lock:
+            self._epoch += 1
+            if kind == "reload":
+                self._stale = True
+                return
+            if self._stale:
+                return
+            if old is not None:
+                self._remove(old.get("id"))
+            if new is not None:
+                self._add(new)
+
+    def _add(self, shift: Dict[str, Any], by_employee=None, by_id=None):
+        interval = shift_interval(shift)
+        employee = shift.get("employee")
+        if interval is None or not employee:
+            return
+        entry = (interval[0], interval[1], shift.get("id"))
+        bisect.insort((self._by_employee if by_employee is None else by_employee).setdefault(employee, []), entry)
+        (self._by_id if by_id is None else by_id)[shift.get("id")] = (employee, entry)
+
+    def _remove(self, shift_id):
+        found = self._by_id.pop(shift_id, None)
+        if found is None:
+            return
+        employee, entry = found
+        intervals = self._by_employee[employee]
+        del intervals[bisect.bisect_left(intervals, entry)]
+        if not intervals:
+            del self._by_employee[employee]
+
+    def _ensure_built(self):
+        """Перестраивает индекс после перезагрузки хранилища (вызывать без блокировки).
+
+        store.all() может перечитать файл и уведомить _on_change, поэтому
+        смены читаются без блокировки индекса.
+        """
+        while True:
+            with self._lock:
+                if not self._stale:
+                    return
+                epoch = self._epoch
+            by_employee: Dict[Any, List[Interval]] = {}
+            by_id: Dict[Any, Tuple[Any, Interval]] = {}
+            for shift in self.store.all():
+                self._add(shift, by_employee, by_id)
+            with self._lock:
+                if epoch == self._epoch:
+                    self._by_employee, self._by_id = by_employee, by_id
+                    self._stale = False
+                    return
+
+    # ПРОВЕРКА
+
+    def _classify(self, employee, a: Interval, b: Interval) -> Optional[Dict[str, Any]]:
+        """Конфликт между интервалами a и b одного сотрудника (a начинается не позже b)"""
+        if b[0] < a[1]:
+            return {"type": "overlap", "minutes": min(a[1], b[1]) - b[0]}
+        rest = self.rest_hours(employee) * 60
+        # Отдых считается только между сменами разных дней
+        if b[0] - a[1] < rest and b[0] // MINUTES_PER_DAY != a[0] // MINUTES_PER_DAY:
+            return {"type": "rest", "minutes": b[0] - a[1], "required_minutes": int(rest)}
+        return None
+
+    def _window(self, employee) -> int:
+        # Соседи дальше суток плюс отдыха не могут ни пересечься, ни нарушить отдых
+        return 2 * MINUTES_PER_DAY + int(self.rest_hours(employee) * 60)
+
+    def check(self, shift: Dict[str, Any], ignore_ids: Iterable = (),
+              pending: Iterable[Dict[str, Any]] = ()) -> List[Dict[str, Any]]:
+        """Конфликты смены с сохранёнными сменами сотрудника.
+
+        ignore_ids - смены, которые не учитываются (сама изменяемая смена,
+        удаляемые в том же пакете); pending - ещё не сохранённые смены пакета.
+        """
+        interval = shift_interval(shift)
+        employee = shift.get("employee")
+        if interval is None or not employee:
+            return []
+        ignore = set(ignore_ids)
+        window = self._window(employee)
+
+        self._ensure_built()
+        with self._lock:
+            intervals = self._by_employee.get(employee, [])
+            lo = bisect.bisect_left(intervals, (interval[0] - window,))
+            hi = bisect.bisect_left(intervals, (interval[1] + window,))
+            others = [entry for entry in intervals[lo:hi] if entry[2] not in ignore]
+        for other in pending:
+            other_interval = shift_interval(other)
+            if other.get("employee") == employee and other_interval is not None:
+                others.append((other_interval[0], other_interval[1], other.get("id")))
+
+        conflicts = []
+        entry = (interval[0], interval[1], shift.get("id"))
+        for other in others:
+            a, b = (other, entry) if other[:2] <= entry[:2] else (entry, other)
+            conflict = self._classify(employee, a, b)
+            if conflict is not None:
+                conflicts.append({**conflict, "shift_id": other[2], "date": day_text(other[0] // MINUTES_PER_DAY)})
+        return conflicts
+
+    def audit(self, employee: str, date_from: Optional[str] = None,
+              date_to: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Все пары конфликтующих смен сотрудника, начинающихся в периоде"""
+        lo_day = day_number(date_from) if date_from else None
+        hi_day = day_number(date_to) if date_to else None
+        window = self._window(employee)
+
+        self._ensure_built()
+        with self._lock:
+            intervals = self._by_employee.get(employee, [])
+            lo = bisect.bisect_left(intervals, (lo_day * MINUTES_PER_DAY,)) if lo_day is not None else 0
+            hi = (bisect.bisect_left(intervals, ((hi_day + 1) * MINUTES_PER_DAY,))
+                  if hi_day is not None else len(intervals))
+            conflicts = []
+            for i in range(lo, hi):
+                current = intervals[i]
+                j = i - 1
+                # Смены до начала периода тоже проверяются как соседи
+                while j >= 0 and intervals[j][0] >= current[0] - window:
+                    conflict = self._classify(employee, intervals[j], current)
+                    if conflict is not None:
+                        conflicts.append({
+                            **conflict,
+                            "shift_ids": [intervals[j][2], current[2]],
+                            "date": day_text(current[0] // MINUTES_PER_DAY),
+                        })
+                    j -= 1
+        conflicts.sort(key=lambda c: (c["date"], c["shift_ids"]))
+        return conflicts
+
+
+_indexes: Dict[int, ConflictIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_conflict_index(store, rest_hours: Optional[Callable[[str], float]] = None) -> ConflictIndex:
+    """Один индекс на экземпляр хранилища"""
+    with _indexes_lock:
+        index = _indexes.get(id(store))
+        if index is None or index.store is not store:
+            index = _indexes[id(store)] = ConflictIndex(store, rest_hours)
+        return index
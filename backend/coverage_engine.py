@@ -0,0 +1,273 @@
+"""Проверка покрытия персоналом на сервере.
+
+Смены превращаются в поминутную занятость по ролям: разностный массив
+(+1 в минуту начала, -1 в минуту конца) и префиксная сумма. Все дни
+периода обрабатываются одной матрицей (дни x минуты), поэтому проверка
+месяца - это несколько векторных операций NumPy, а не перебор смен
+для каждого часа каждого правила.
+
+CoverageCache держит занятость по дням в памяти и обновляет её по
+событиям хранилища, так что правка одной смены не пересчитывает месяц.
+"""
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+import metrics
+
+MINUTES_PER_DAY = 24 * 60
+
+
+def parse_minutes(value) -> Optional[int]:
+    """"HH:MM" -> минуты от полуночи ("24:00" -> 1440), None для мусора"""
+    return _parse_minutes(value) if isinstance(value, str) else None
+
+
+@lru_cache(maxsize=4096)
+def _parse_minutes(value: str) -> Optional[int]:
+    # Различных значений времени мало, поэтому результат кэшируется
+    try:
+        hours, minutes = value.split(':')[:2]
+        total = int(hours) * 60 + int(minutes)
+    except ValueError:
+        return None
+    return total if 0 <= total <= MINUTES_PER_DAY else None
+
+
+def shift_span(shift: Dict[str, Any]) -> Optional[Tuple[int, int]]:
+    """Начало и конец смены в минутах. Смена через полночь обрезается концом дня"""
+    return _span(parse_minutes(shift.get("start_time")), parse_minutes(shift.get("end_time")))
+
+
+def _span(start: Optional[int], end: Optional[int]) -> Optional[Tuple[int, int]]:
+    if start is None or end is None:
+        return None
+    if end <= start:
+        end = MINUTES_PER_DAY
+    return start, end
+
+
+def build_occupancy(spans: List[Tuple[int, int, int]], days: int) -> np.ndarray:
+    """Матрица days x 1440: сколько смен идёт в каждую минуту.
+
+    spans - тройки (индекс дня, начало, конец) в минутах.
+    """
+    width = MINUTES_PER_DAY + 1
+    if not spans:
+        return np.zeros((days, MINUTES_PER_DAY), dtype=np.int32)
+    arr = np.asarray(spans, dtype=np.int64)
+    base = arr[:, 0] * width
+    diff = (np.bincount(base + arr[:, 1], minlength=days * width)
+            - np.bincount(base + arr[:, 2], minlength=days * width))
+    return np.cumsum(diff.reshape(days, width), axis=1, dtype=np.int32)[:, :MINUTES_PER_DAY]
+
+
+def evaluate_intervals(occupancy: np.ndarray, intervals: List[Dict[str, Any]]) -> List[Dict[str, np.ndarray]]:
+    """Сравнивает занятость с min/max каждого интервала сразу для всех дней"""
+    results = []
+    for interval in intervals:
+        start = parse_minutes(interval["start"])
+        end = parse_minutes(interval["end"])
+        window = occupancy[:, start:end]
+        results.append({
+            "actual_min": window.min(axis=1),
+            "actual_max": window.max(axis=1),
+            "understaffed_minutes": (window < interval["min"]).sum(axis=1),
+            "overstaffed_minutes": (window > interval["max"]).sum(axis=1),
+        })
+    return results
+
+
+def _collect_spans(shifts, rules, dates) -> Tuple[Dict[str, List[Tuple[int, int, int]]], List[int]]:
+    """Смены -> тройки (день, начало, конец) по ролям и число смен по дням"""
+    day_index = {date: i for i, date in enumerate(dates)}
+    spans_by_role: Dict[str, List[Tuple[int, int, int]]] = {role: [] for role in rules}
+    shift_counts = [0] * len(dates)
+
+    for shift in shifts:
+        # Словарь смены или кортеж (дата, роль, начало, конец) из ShiftStore.spans
+        if isinstance(shift, tuple):
+            date, role, start, end = shift
+            # Время там уже в минутах, строкой остаётся только нестандартная запись
+            start = parse_minutes(start) if isinstance(start, str) else start
+            end = parse_minutes(end) if isinstance(end, str) else end
+        else:
+            date, role = shift.get("date"), shift.get("role")
+            start, end = parse_minutes(shift.get("start_time")), parse_minutes(shift.get("end_time"))
+        day = day_index.get(date)
+        if day is None:
+            continue
+        shift_counts[day] += 1
+        span = _span(start, end)
+        if span is not None and role in spans_by_role:
+            spans_by_role[role].append((day, *span))
+    return spans_by_role, shift_counts
+
+
+def _role_checks(intervals, stats, day) -> List[Dict[str, Any]]:
+    """Результаты проверки интервалов одной роли за один день"""
+    checks = []
+    for interval, values in zip(intervals, stats):
+        under = int(values["understaffed_minutes"][day])
+        over = int(values["overstaffed_minutes"][day])
+        checks.append({
+            "start": interval["start"],
+            "end": interval["end"],
+            "min": interval["min"],
+            "max": interval["max"],
+            "actual_min": int(values["actual_min"][day]),
+            "actual_max": int(values["actual_max"][day]),
+            "understaffed_minutes": under,
+            "overstaffed_minutes": over,
+            "status": "under" if under else "over" if over else "ok",
+        })
+    return checks
+
+
+def _day_report(date, shift_count, roles) -> Dict[str, Any]:
+    issues = sum(check["status"] != "ok" for checks in roles.values() for check in checks)
+    return {
+        "date": date,
+        "status": "good" if issues == 0 and shift_count else "critical",
+        "shift_count": shift_count,
+        "issues": issues,
+        "roles": roles,
+    }
+
+
+def analyze_coverage(shifts: List[Dict[str, Any]], rules: Dict[str, List[Dict[str, Any]]],
+                     dates: List[str]) -> List[Dict[str, Any]]:
+    """Отчёт о покрытии по каждой дате из dates.
+
+    Занятость считается по сменам, а не по уникальным сотрудникам:
+    пересекающиеся смены одного сотрудника учитываются дважды.
+    """
+    spans_by_role, shift_counts = _collect_spans(shifts, rules, dates)
+    per_role = {
+        role: evaluate_intervals(build_occupancy(spans_by_role[role], len(dates)), intervals)
+        for role, intervals in rules.items()
+    }
+    return [
+        _day_report(date, shift_counts[day],
+                    {role: _role_checks(intervals, per_role[role], day) for role, intervals in rules.items()})
+        for day, date in enumerate(dates)
+    ]
+
+
+class _DayCoverage:
+    """Закэшированный день: занятость по ролям и готовые проверки"""
+    __slots__ = ("occupancy", "shift_count", "checks")
+
+    def __init__(self, occupancy: Dict[str, np.ndarray], shift_count: int):
+        self.occupancy = occupancy
+        self.shift_count = shift_count
+        # role -> список проверок; None - пересчитать при следующем запросе
+        self.checks: Dict[str, Optional[List[Dict[str, Any]]]] = {role: None for role in occupancy}
+
+
+class CoverageCache:
+    """Покрытие, которое поддерживается изменениями смен, а не пересчитывается.
+
+    Подписывается на хранилище: создание, правка и удаление смены меняют
+    строку занятости её дня на +1/-1 в минутах смены и сбрасывают
+    результат только для затронутых (дата, роль). Перезагрузка хранилища
+    (чужой процесс, replace_all) очищает кэш целиком. Хранится не больше
+    max_dates дней, самые давние по обращению вытесняются.
+    """
+
+    def __init__(self, store, rules: Dict[str, List[Dict[str, Any]]], max_dates: int = 1000):
+        self.store = store
+        self.rules = rules
+        self.max_dates = max_dates
+        self._days: "OrderedDict[str, _DayCoverage]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Меняется при каждом событии: заполнение кэша, начатое до события,
+        # не сохраняется, чтобы не записать устаревшую занятость
+        self._epoch = 0
+        store.add_listener(self._on_change)
+
+    def _on_change(self, kind, old, new):
+        with self._lock:
+            self._epoch += 1
+            if kind == "reload":
+                self._days.clear()
+                return
+            if old is not None:
+                self._apply(old, -1)
+            if new is not None:
+                self._apply(new, +1)
+
+    def _apply(self, shift, delta):
+        day = self._days.get(shift.get("date"))
+        if day is None:
+            return
+        day.shift_count += delta
+        role = shift.get("role")
+        span = shift_span(shift)
+        if role in day.occupancy and span is not None:
+            day.occupancy[role][span[0]:span[1]] += delta
+            day.checks[role] = None
+
+    def _fill(self, dates: List[str]):
+        """Строит занятость для дат, которых нет в кэше, одной матрицей"""
+        with self._lock:
+            epoch = self._epoch
+        # Компактное хранилище отдаёт время минутами, без сборки словарей
+        spans = getattr(self.store, "spans", None)
+        shifts = (spans or self.store.date_range)(min(dates), max(dates))
+        spans_by_role, shift_counts = _collect_spans(shifts, self.rules, dates)
+        matrices = {role: build_occupancy(spans_by_role[role], len(dates)) for role in self.rules}
+        filled = {
+            date: _DayCoverage({role: matrices[role][day].copy() for role in self.rules}, shift_counts[day])
+            for day, date in enumerate(dates)
+        }
+        with self._lock:
+            if epoch == self._epoch:
+                self._days.update(filled)
+                while len(self._days) > self.max_dates:
+                    self._days.popitem(last=False)
+        return filled
+
+    def report(self, dates: List[str]) -> List[Dict[str, Any]]:
+        """Отчёт в формате analyze_coverage; пересчитываются только сброшенные дни"""
+        self.store.refresh()
+        with self._lock:
+            days = {date: self._days[date] for date in dates if date in self._days}
+            for date in days:
+                self._days.move_to_end(date)
+        missing = [date for date in dates if date not in days]
+        metrics.cache_access("coverage", True, len(days))
+        metrics.cache_access("coverage", False, len(missing))
+        if missing:
+            days.update(self._fill(missing))
+
+        with self._lock:
+            for role, intervals in self.rules.items():
+                stale = [date for date in dates if days[date].checks[role] is None]
+                if not stale:
+                    continue
+                occupancy = np.stack([days[date].occupancy[role] for date in stale])
+                stats = evaluate_intervals(occupancy, intervals)
+                for i, date in enumerate(stale):
+                    days[date].checks[role] = _role_checks(intervals, stats, i)
+            return [
+                _day_report(date, days[date].shift_count,
+                            {role: days[date].checks[role] for role in self.rules})
+                for date in dates
+            ]
+
+
+_caches: Dict[int, CoverageCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_coverage_cache(store, rules: Dict[str, List[Dict[str, Any]]]) -> CoverageCache:
+    """Один кэш покрытия на экземпляр хранилища"""
+    with _caches_lock:
+        cache = _caches.get(id(store))
+        if cache is None or cache.store is not store:
+            cache = _caches[id(store)] = CoverageCache(store, rules)
+        return cache
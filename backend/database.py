@@ -1,40 +1,155 @@
-import json
+import hashlib
 import os
-from typing import List, Dict, Any
+import re
+import threading
+from typing import List, Dict, Any, Optional
+import codec
+import snapshot
+from shift_store import get_store
+from sqlite_store import get_sqlite_store
 
-# Пути к файлам данных
-SHIFTS_FILE = "shifts.json"
-USERS_FILE = "users.json"
+# Пути к файлам данных. Их берут и simple_app.py, и main.py, чтобы поток
+# изменений FastAPI видел записи Flask; по умолчанию - каталог backend
+DATA_DIR = os.environ.get("MYSHIFT_DATA_DIR", os.path.dirname(os.path.abspath(__file__)))
+SHIFTS_FILE = os.path.join(DATA_DIR, "shifts.json")
+USERS_FILE = os.path.join(DATA_DIR, "users.json")
+
+# Бэкенд хранения: "json" (файлы выше) или "sqlite" (одна база в режиме WAL)
+STORAGE_BACKEND = os.environ.get("MYSHIFT_STORAGE", "json")
+SQLITE_FILE = os.environ.get("MYSHIFT_SQLITE_FILE", "myshift.sqlite3")
+
+# Смены каждого магазина лежат в своём файле (или базе) со своими
+# индексами и блокировкой. Магазин "default" использует исходные пути,
+# остальные - <имя>.<магазин><расширение>: shifts.msk-1.json
+DEFAULT_STORE = "default"
+STORE_NAME_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
 
 def read_json(file_path: str) -> List[Dict[str, Any]]:
     """Чтение данных из JSON файла"""
     if not os.path.exists(file_path):
         return []
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except (json.JSONDecodeError, FileNotFoundError):
+        return codec.read_file(file_path)
+    except (codec.DecodeError, FileNotFoundError):
         return []
 
 def write_json(file_path: str, data: List[Dict[str, Any]]) -> bool:
-    """Запись данных в JSON файл"""
+    """Запись данных в JSON файл (компактно, см. codec.PRETTY)"""
     try:
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        with open(file_path, 'wb') as f:
+            codec.write_file(f, data)
         return True
     except Exception:
         return False
 
+def use_sqlite() -> bool:
+    return STORAGE_BACKEND == "sqlite"
+
+def validate_store_name(store: str) -> str:
+    """Имя магазина становится частью пути, поэтому допускаются только [A-Za-z0-9_-]"""
+    if not isinstance(store, str) or not STORE_NAME_RE.match(store):
+        raise ValueError(f"Invalid store name: {store!r}")
+    return store
+
+def store_file_name(store: str) -> str:
+    """Часть имени файла для магазина.
+
+    Имена [A-Za-z0-9_-] используются как есть. Остальные (пользователи,
+    зарегистрированные до проверки имени) кодируются %XX по байтам UTF-8,
+    а длинные - хэшем: % не бывает в обычном имени, поэтому совпасть
+    закодированное имя с обычным не может.
+    """
+    if STORE_NAME_RE.match(store):
+        return store
+    encoded = "".join(chr(b) if chr(b).isalnum() and b < 128 else f"%{b:02X}" for b in store.encode("utf-8"))
+    if len(encoded) > 64:
+        encoded = "%" + hashlib.sha256(store.encode("utf-8")).hexdigest()
+    return encoded or "%"
+
+def store_path(path: str, store: str = DEFAULT_STORE) -> str:
+    """Путь к данным магазина: shifts.json -> shifts.<store>.json"""
+    if store is None or store == DEFAULT_STORE:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}.{store_file_name(str(store))}{ext}"
+
 # Функции для работы со сменами
+def get_shift_store(shifts_file: Optional[str] = None, store: str = DEFAULT_STORE):
+    """Хранилище смен магазина для выбранного бэкенда (ShiftStore или SqliteShiftStore).
+
+    В воркере gunicorn.conf.py - SharedShiftStore поверх снимка мастера.
+    """
+    if use_sqlite():
+        return get_sqlite_store(store_path(SQLITE_FILE, store))
+    path = store_path(shifts_file or SHIFTS_FILE, store)
+    if snapshot.enabled():
+        return snapshot.get_shared_store(path)
+    return get_store(path)
+
 def get_shifts() -> List[Dict[str, Any]]:
-    return read_json(SHIFTS_FILE)
+    return get_shift_store().all()
 
 def save_shifts(shifts: List[Dict[str, Any]]) -> bool:
-    return write_json(SHIFTS_FILE, shifts)
+    get_shift_store().replace_all(shifts)
+    return True
 
 # Функции для работы с пользователями
-def get_users() -> List[Dict[str, Any]]:
-    return read_json(USERS_FILE)
+def get_users(users_file: Optional[str] = None) -> List[Dict[str, Any]]:
+    if use_sqlite():
+        return get_sqlite_store(SQLITE_FILE).get_users()
+    return read_json(users_file or USERS_FILE)
+
+def save_users(users: List[Dict[str, Any]], users_file: Optional[str] = None) -> bool:
+    if use_sqlite():
+        get_sqlite_store(SQLITE_FILE).save_users(users)
+        return True
+    return write_json(users_file or USERS_FILE, users)
+
+class UserIndex:
+    """Пользователи JSON файла, проиндексированные по username.
+
+    Файл перечитывается только при изменении inode/mtime/размера.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._signature = None
+        self._by_username: Dict[str, Dict[str, Any]] = {}
+
+    def get(self, username: str) -> Optional[Dict[str, Any]]:
+        try:
+            st = os.stat(self.path)
+            signature = (st.st_ino, st.st_mtime_ns, st.st_size)
+        except OSError:
+            signature = None
+        with self._lock:
+            if signature != self._signature:
+                self._by_username = {u.get("username"): u for u in read_json(self.path)}
+                self._signature = signature
+            return self._by_username.get(username)
+
+_user_indexes: Dict[str, UserIndex] = {}
+
+def get_user_by_username(username: str, users_file: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Поиск пользователя по индексу вместо просмотра всего списка"""
+    if use_sqlite():
+        return get_sqlite_store(SQLITE_FILE).get_user_by_username(username)
+
+    path = os.path.abspath(users_file or USERS_FILE)
+    index = _user_indexes.get(path)
+    if index is None:
+        index = _user_indexes.setdefault(path, UserIndex(path))
+    return index.get(username)
+
+def add_user(user: Dict[str, Any], users_file: Optional[str] = None) -> Dict[str, Any]:
+    """Добавляет пользователя с новым ID и возвращает его"""
+    if use_sqlite():
+        return get_sqlite_store(SQLITE_FILE).add_user(user)
 
-def save_users(users: List[Dict[str, Any]]) -> bool:
-    return write_json(USERS_FILE, users)
\ No newline at end of file
+    users = read_json(users_file or USERS_FILE)
+    new_id = max([u.get("id", 0) for u in users], default=0) + 1
+    user = {"id": new_id, **user}
+    users.append(user)
+    write_json(users_file or USERS_FILE, users)
+    return user
@@ -0,0 +1,215 @@
+"""Рассылка изменений смен подписчикам SSE (GET /shifts/stream в main.py).
+
+EventHub живёт в цикле asyncio: подписчик - это очередь и фильтр по
+магазину и периоду, поэтому тысяча простаивающих соединений стоит
+тысячу маленьких объектов, а не тысячу потоков.
+
+Источник событий - подписка на хранилище (add_listener). Записи этого
+процесса приходят как create/update/delete. Записи других процессов
+(Flask приложение, другие воркеры) хранилище замечает при refresh() и
+сообщает как reload; хаб опрашивает хранилища с подписчиками и в этом
+случае сам находит разницу со снимком {id: (version, date)}.
+Несколько смен, созданных на одну дату за один раз (автогенерация),
+уходят одним событием generate.
+"""
+import asyncio
+from typing import List, Dict, Any, Optional, Set, Tuple
+
+import codec
+
+# Как часто проверять изменения из других процессов, сек
+POLL_INTERVAL = 1.0
+# Пустая строка-комментарий раз в HEARTBEAT секунд держит соединение через прокси
+HEARTBEAT = 15.0
+# Отстающий подписчик получает reset и отключается, а не копит память
+QUEUE_SIZE = 256
+
+
+class Subscriber:
+    def __init__(self, date_from: Optional[str], date_to: Optional[str]):
+        self.date_from = date_from
+        self.date_to = date_to
+        self.queue: "asyncio.Queue[Optional[Tuple[str, Dict[str, Any]]]]" = asyncio.Queue(QUEUE_SIZE)
+
+    def wants(self, dates: List[str]) -> bool:
+        return any((self.date_from is None or date >= self.date_from) and
+                   (self.date_to is None or date <= self.date_to)
+                   for date in dates if date)
+
+    def send(self, event: str, data: Dict[str, Any]) -> bool:
+        try:
+            self.queue.put_nowait((event, data))
+            return True
+        except asyncio.QueueFull:
+            return False
+
+
+class _StoreChannel:
+    """Подписчики одного хранилища и снимок версий для поиска чужих изменений"""
+
+    def __init__(self, store):
+        self.store = store
+        self.subscribers: Set[Subscriber] = set()
+        self.snapshot: Dict[int, Tuple[int, str]] = {}
+        self.pending: List[Tuple[str, Any, Any]] = []
+        # Снимок версий читается в потоке; до этого события только копятся
+        self.loaded: Optional[asyncio.Future] = None
+        self.flushing = False
+
+
+class EventHub:
+    def __init__(self):
+        self._channels: Dict[int, _StoreChannel] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._poller: Optional[asyncio.Task] = None
+        self._seq = 0
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        if self._poller is None:
+            self._poller = self._loop.create_task(self._poll())
+
+    async def stop(self):
+        if self._poller is not None:
+            self._poller.cancel()
+            self._poller = None
+
+    async def subscribe(self, store, date_from=None, date_to=None) -> Subscriber:
+        if self._loop is None:
+            self.start()
+        channel = self._channels.get(id(store))
+        if channel is None or channel.store is not store:
+            channel = self._channels[id(store)] = _StoreChannel(store)
+            channel.loaded = self._loop.create_future()
+            # Сначала подписка, потом снимок: запись между ними не потеряется
+            store.add_listener(lambda kind, old, new: self._receive(channel, kind, old, new))
+            try:
+                # all() может перечитывать файл и ждать блокировку - не в потоке цикла
+                channel.snapshot = self._versions(await asyncio.to_thread(store.all))
+            except BaseException as e:
+                channel.loaded.set_exception(e)
+                self._channels.pop(id(store), None)
+                raise
+            channel.loaded.set_result(None)
+            self._schedule(channel)
+        await asyncio.shield(channel.loaded)
+        subscriber = Subscriber(date_from, date_to)
+        channel.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, store, subscriber: Subscriber):
+        channel = self._channels.get(id(store))
+        if channel is not None:
+            channel.subscribers.discard(subscriber)
+
+    @staticmethod
+    def _versions(shifts) -> Dict[int, Tuple[int, str]]:
+        return {shift["id"]: (shift.get("version", 1), shift.get("date")) for shift in shifts}
+
+    # ПРИЁМ СОБЫТИЙ (в цикле asyncio)
+
+    def _receive(self, channel: _StoreChannel, kind, old, new):
+        # Вызывается из потока, который пишет в хранилище
+        if not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._queue_event, channel, kind, old, new)
+
+    def _queue_event(self, channel: _StoreChannel, kind, old, new):
+        channel.pending.append((kind, old, new))
+        self._schedule(channel)
+
+    def _schedule(self, channel: _StoreChannel):
+        # События одной операции (create_many) приходят подряд и
+        # разбираются вместе, когда задача разбора запустится
+        if channel.pending and not channel.flushing and channel.loaded.done():
+            channel.flushing = True
+            self._loop.create_task(self._flush(channel))
+
+    async def _flush(self, channel: _StoreChannel):
+        """Разбор накопившихся событий; одна задача на канал, по порядку"""
+        try:
+            while channel.pending:
+                events, channel.pending = channel.pending, []
+                if any(kind == "reload" for kind, _, _ in events):
+                    current = await asyncio.to_thread(channel.store.all)
+                    events = self._diff(channel, current)
+                self._dispatch(channel, events)
+        finally:
+            channel.flushing = False
+
+    def _dispatch(self, channel: _StoreChannel, events: List[Tuple[str, Any, Any]]):
+        created: Dict[str, List[Dict[str, Any]]] = {}
+        for kind, old, new in events:
+            # Разница после reload могла уже учесть событие, пришедшее позже
+            if kind == "delete" and old["id"] not in channel.snapshot:
+                continue
+            if kind != "delete" and channel.snapshot.get(new["id"], (0,))[0] >= new.get("version", 1):
+                continue
+            if kind == "create":
+                channel.snapshot[new["id"]] = (new.get("version", 1), new.get("date"))
+                created.setdefault(new.get("date"), []).append(new)
+            elif kind == "update":
+                channel.snapshot[new["id"]] = (new.get("version", 1), new.get("date"))
+                self._publish(channel, "update", {"shift": new, "old_date": old.get("date")},
+                              [old.get("date"), new.get("date")])
+            elif kind == "delete":
+                channel.snapshot.pop(old["id"], None)
+                self._publish(channel, "delete", {"id": old["id"], "date": old.get("date")},
+                              [old.get("date")])
+
+        for date, shifts in created.items():
+            if len(shifts) == 1:
+                self._publish(channel, "create", {"shift": shifts[0]}, [date])
+            else:
+                self._publish(channel, "generate", {"date": date, "shifts": shifts}, [date])
+
+    def _diff(self, channel: _StoreChannel, shifts: List[Dict[str, Any]]) -> List[Tuple[str, Any, Any]]:
+        """Разница между снимком и текущим содержимым хранилища"""
+        current = {shift["id"]: shift for shift in shifts}
+        events = []
+        for shift_id, (version, date) in list(channel.snapshot.items()):
+            shift = current.get(shift_id)
+            if shift is None:
+                events.append(("delete", {"id": shift_id, "date": date}, None))
+            elif shift.get("version", 1) != version:
+                events.append(("update", {"id": shift_id, "date": date}, shift))
+        for shift_id, shift in current.items():
+            if shift_id not in channel.snapshot:
+                events.append(("create", None, shift))
+        return events
+
+    def _publish(self, channel: _StoreChannel, event: str, data: Dict[str, Any], dates: List[str]):
+        self._seq += 1
+        data = {**data, "seq": self._seq}
+        for subscriber in list(channel.subscribers):
+            if subscriber.wants(dates) and not subscriber.send(event, data):
+                # Очередь переполнена: клиент перечитает данные после переподключения
+                channel.subscribers.discard(subscriber)
+                subscriber.queue.get_nowait()
+                subscriber.send("reset", {"seq": self._seq})
+
+    async def _poll(self):
+        while True:
+            await asyncio.sleep(POLL_INTERVAL)
+            for channel in list(self._channels.values()):
+                if channel.subscribers:
+                    # refresh() читает файл или базу, поэтому не в потоке цикла
+                    await asyncio.to_thread(channel.store.refresh)
+
+    # ОТДАЧА КЛИЕНТУ
+
+    async def stream(self, store, subscriber: Subscriber):
+        """Поток строк SSE для StreamingResponse"""
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    item = await asyncio.wait_for(subscriber.queue.get(), HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                event, data = item
+                yield f"id: {data['seq']}\nevent: {event}\ndata: {codec.dumps(data).decode('utf-8')}\n\n"
+                if event == "reset":
+                    return
+        finally:
+            self.unsubscribe(store, subscriber)
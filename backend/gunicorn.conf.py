@@ -0,0 +1,48 @@
+"""Запуск в несколько воркеров: gunicorn -c gunicorn.conf.py (из каталога backend).
+
+До старта воркеров запускается мастер снимков (snapshot.py); воркеры
+находят его по переменным окружения и читают смены из общей памяти.
+MYSHIFT_APP=fastapi запускает main.py через uvicorn воркеры.
+
+Мастер после каждой записи кодирует всё рабочее окно смен, поэтому здесь
+архив прошедших месяцев включён по умолчанию: MYSHIFT_ARCHIVE_DAYS=90
+(задайте своё значение в окружении; 0 отключает архив и делает каждую
+запись пропорциональной всей истории).
+"""
+import multiprocessing
+import os
+
+# Мастер наследует окружение арбитра
+os.environ.setdefault("MYSHIFT_ARCHIVE_DAYS", "90")
+
+APP = os.environ.get("MYSHIFT_APP", "flask")
+
+if APP == "fastapi":
+    wsgi_app = "main:app"
+    worker_class = "uvicorn.workers.UvicornWorker"
+    bind = os.environ.get("MYSHIFT_BIND", "0.0.0.0:8000")
+else:
+    wsgi_app = "simple_app:app"
+    worker_class = "gthread"
+    threads = int(os.environ.get("MYSHIFT_THREADS", "4"))
+    bind = os.environ.get("MYSHIFT_BIND", "0.0.0.0:5000")
+
+workers = int(os.environ.get("MYSHIFT_WORKERS", multiprocessing.cpu_count()))
+# Приложение импортируется в воркере: хранилища создаются после fork
+preload_app = False
+
+_master = None
+
+
+def on_starting(server):
+    global _master
+    import snapshot
+    _master = snapshot.start_master()
+    # Воркеры наследуют окружение арбитра
+    os.environ.update(_master.environ())
+    server.log.info("Snapshot master started (pid %s)", _master.process.pid)
+
+
+def on_exit(server):
+    if _master is not None:
+        _master.stop()
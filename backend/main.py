@@ -1,16 +1,49 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional
 from datetime import datetime
 import database as db
+from auth import verify_token
+from event_hub import EventHub
+from async_repository import get_repository
+import codec
+import metrics
 
-app = FastAPI(title="My Shift API", version="1.0.0")
+
+class CodecResponse(JSONResponse):
+    """JSON ответ через codec (orjson, если установлен)"""
+
+    def render(self, content) -> bytes:
+        with metrics.phase("encode"):
+            return codec.dumps(content)
+
+
+app = FastAPI(title="My Shift API", version="1.0.0", default_response_class=CodecResponse)
+
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    # Задачи и to_thread обработчика наследуют контекст, а с ним и таймер запроса
+    timer = metrics.start_request()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    metrics.finish_request(route.path if route is not None else "unmatched",
+                           request.method, response.status_code, timer)
+    return response
 
 # CORS для фронтенда
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["http://localhost:3000", "http://127.0.0.1:3000", "https://kalikrit.pythonanywhere.com"],
+    # Те же адреса фронтенда, что и в simple_app.py: EventSource к /shifts/stream кросс-доменный
+    allow_origins=[
+        "http://localhost:5173",
+        "https://kalikrit.github.io",
+        "http://localhost:3000",
+        "http://127.0.0.1:3000",
+        "https://kalikrit.pythonanywhere.com",
+    ],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
@@ -29,6 +62,7 @@ class ShiftCreate(ShiftBase):
 
 class Shift(ShiftBase):
     id: int
+    version: int = 1
 
 class ShiftUpdate(BaseModel):
     start_time: Optional[str] = None
@@ -36,39 +70,76 @@ class ShiftUpdate(BaseModel):
     employee: Optional[str] = None
     role: Optional[str] = None
 
+# Рассылка изменений для GET /shifts/stream
+hub = EventHub()
+
+@app.on_event("startup")
+async def start_hub():
+    hub.start()
+
+@app.on_event("shutdown")
+async def stop_hub():
+    await hub.stop()
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Метрики для Prometheus: задержки по маршрутам и фазам, кэши"""
+    return Response(metrics.registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 # Базовые endpoints для тестирования
 @app.get("/")
 async def root():
     return {"message": "My Shift API is running!"}
 
 @app.get("/shifts", response_model=List[Shift])
-async def get_all_shifts():
-    """Получить все смены"""
-    return db.get_shifts()
+async def get_all_shifts(
+    date_from: Optional[str] = Query(None, alias="from"),
+    date_to: Optional[str] = Query(None, alias="to"),
+):
+    """Получить все смены или смены за период from..to"""
+    repository = await get_repository(db.get_shift_store())
+    if date_from or date_to:
+        return await repository.date_range(date_from, date_to)
+    return await repository.all()
+
+@app.get("/shifts/stream")
+async def stream_shift_events(
+    request: Request,
+    date_from: Optional[str] = Query(None, alias="from"),
+    date_to: Optional[str] = Query(None, alias="to"),
+    token: Optional[str] = None,
+):
+    """События create/update/delete/generate магазина пользователя (SSE).
+
+    EventSource не умеет заголовки, поэтому токен можно передать в ?token=.
+    """
+    auth_header = request.headers.get("Authorization", "")
+    payload = verify_token(token or auth_header.removeprefix("Bearer "))
+    if not payload:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    try:
+        store = db.get_shift_store(store=payload.get("store", db.DEFAULT_STORE))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    subscriber = await hub.subscribe(store, date_from, date_to)
+    return StreamingResponse(
+        hub.stream(store, subscriber),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @app.get("/shifts/{date}", response_model=List[Shift])
 async def get_shifts_by_date(date: str):
     """Получить смены за конкретную дату"""
-    shifts = db.get_shifts()
-    return [shift for shift in shifts if shift["date"] == date]
+    repository = await get_repository(db.get_shift_store())
+    return await repository.by_date(date)
 
 @app.post("/shifts", response_model=Shift)
 async def create_shift(shift: ShiftCreate):
     """Создать новую смену"""
-    shifts = db.get_shifts()
-
-    # Генерируем ID
-    new_id = max([s["id"] for s in shifts], default=0) + 1
-
-    new_shift = {
-        "id": new_id,
-        **shift.dict()
-    }
-
-    shifts.append(new_shift)
-    db.save_shifts(shifts)
-
-    return new_shift
+    repository = await get_repository(db.get_shift_store())
+    return await repository.create(shift.dict())
 
 if __name__ == "__main__":
     import uvicorn
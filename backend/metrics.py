@@ -0,0 +1,240 @@
+"""Метрики запросов и хранилища в формате Prometheus (GET /metrics).
+
+Время каждого запроса делится на фазы: auth (токен, пароль), storage_read
+и storage_write (файл или база), encode (JSON ответа) и compute - всё
+остальное. Фазы вложены без двойного счёта: время внутренней фазы
+вычитается из внешней. Кроме гистограмм задержек по маршрутам считаются
+байты, прочитанные и записанные хранилищем, и попадания в кэши.
+
+Текущий запрос хранится в contextvars, поэтому фазы правильно
+относятся к запросу и в потоках Flask, и в asyncio (включая to_thread).
+Запись метрики - несколько сложений под одной блокировкой; метрики
+рассчитаны на то, чтобы быть включёнными всегда.
+"""
+import bisect
+import threading
+import time
+from contextvars import ContextVar
+from typing import List, Dict, Optional, Tuple
+
+# Границы корзин гистограмм, сек
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PHASES = ("auth", "storage_read", "storage_write", "encode", "compute")
+
+DESCRIPTIONS = {
+    "myshift_request_duration_seconds": ("histogram", "Время обработки запроса"),
+    "myshift_request_phase_seconds": ("histogram", "Время запроса по фазам"),
+    "myshift_storage_bytes_total": ("counter", "Байты, прочитанные и записанные хранилищем"),
+    "myshift_cache_requests_total": ("counter", "Обращения к кэшам: hit или miss"),
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+
+    def observe(self, name: str, labels: Labels, value: float):
+        key = (name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def observe_many(self, items: List[Tuple[str, Labels, float]]):
+        """Несколько наблюдений одного запроса под одной блокировкой"""
+        with self._lock:
+            for name, labels, value in items:
+                histogram = self._histograms.get((name, labels))
+                if histogram is None:
+                    histogram = self._histograms[(name, labels)] = Histogram()
+                histogram.observe(value)
+
+    def inc(self, name: str, labels: Labels, amount: float = 1):
+        key = (name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def value(self, name: str, **labels) -> float:
+        with self._lock:
+            return self._counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def histogram(self, name: str, **labels) -> Optional[Histogram]:
+        with self._lock:
+            return self._histograms.get((name, tuple(sorted(labels.items()))))
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def render(self) -> str:
+        """Текстовый формат Prometheus 0.0.4"""
+        with self._lock:
+            histograms = {key: (list(h.counts), h.sum, h.count) for key, h in self._histograms.items()}
+            counters = dict(self._counters)
+
+        lines: List[str] = []
+        for name, (kind, help_text) in DESCRIPTIONS.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind == "histogram":
+                for (metric, labels), (counts, total, count) in sorted(histograms.items()):
+                    if metric != name:
+                        continue
+                    cumulative = 0
+                    for bound, bucket in zip(LATENCY_BUCKETS, counts):
+                        cumulative += bucket
+                        lines.append(f"{name}_bucket{_format(labels, ('le', repr(bound)))} {cumulative}")
+                    lines.append(f"{name}_bucket{_format(labels, ('le', '+Inf'))} {count}")
+                    lines.append(f"{name}_sum{_format(labels)} {total:.6f}")
+                    lines.append(f"{name}_count{_format(labels)} {count}")
+            else:
+                for (metric, labels), value in sorted(counters.items()):
+                    if metric == name:
+                        lines.append(f"{name}{_format(labels)} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+def _format(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n") for _, v in items)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(items, escaped)) + "}"
+
+
+registry = Registry()
+
+
+# ФАЗЫ ЗАПРОСА
+
+class RequestTimer:
+    __slots__ = ("started", "phases", "active")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        # Стек открытых фаз: время вложенной фазы вычитается из внешней
+        self.active: List[str] = []
+
+
+_timer: ContextVar[Optional[RequestTimer]] = ContextVar("myshift_request_timer", default=None)
+
+
+class phase:
+    """with phase("storage_read"): ... - время блока относится к фазе запроса"""
+    __slots__ = ("name", "timer", "started")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        timer = self.timer = _timer.get()
+        if timer is not None:
+            # Повторный вход в ту же фазу (запись из транзакции записи) не считается отдельно
+            if timer.active and timer.active[-1] == self.name:
+                self.timer = None
+                return self
+            timer.active.append(self.name)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        timer = self.timer
+        if timer is not None:
+            timer.active.pop()
+            _account(timer, self.name, time.perf_counter() - self.started)
+        return False
+
+
+def _account(timer: RequestTimer, name: str, seconds: float):
+    timer.phases[name] = timer.phases.get(name, 0.0) + seconds
+    if timer.active and timer.active[-1] != name:
+        outer = timer.active[-1]
+        timer.phases[outer] = timer.phases.get(outer, 0.0) - seconds
+
+
+def add_phase(name: str, seconds: float):
+    """Добавляет время к фазе текущего запроса (там, где with неудобен)"""
+    timer = _timer.get()
+    if timer is not None:
+        _account(timer, name, seconds)
+
+
+def current() -> Optional[RequestTimer]:
+    return _timer.get()
+
+
+def detach():
+    """Для фоновых задач: их работа не относится к запросу, который их запустил"""
+    _timer.set(None)
+
+
+def start_request() -> RequestTimer:
+    timer = RequestTimer()
+    _timer.set(timer)
+    return timer
+
+
+# (route, method, status) -> метки запроса и метки фаз: не собирать кортежи на каждый запрос
+_label_sets: Dict[Tuple[str, str, int], Tuple[Labels, Dict[str, Labels]]] = {}
+
+
+def _labels(route: str, method: str, status: int) -> Tuple[Labels, Dict[str, Labels]]:
+    key = (route, method, status)
+    found = _label_sets.get(key)
+    if found is None:
+        found = _label_sets.setdefault(key, (
+            (("method", method), ("route", route), ("status", str(status))),
+            {name: (("method", method), ("phase", name), ("route", route)) for name in PHASES},
+        ))
+    return found
+
+
+def finish_request(route: str, method: str, status: int, timer: Optional[RequestTimer] = None):
+    """Записывает длительность запроса и его фаз; compute - остаток"""
+    timer = timer or _timer.get()
+    if timer is None:
+        return
+    total = time.perf_counter() - timer.started
+    request_labels, phase_labels = _labels(route, method, status)
+    items = [("myshift_request_duration_seconds", request_labels, total)]
+    measured = 0.0
+    for name, value in timer.phases.items():
+        if value > 0 and name in phase_labels:
+            measured += value
+            items.append(("myshift_request_phase_seconds", phase_labels[name], value))
+    items.append(("myshift_request_phase_seconds", phase_labels["compute"], max(total - measured, 0.0)))
+    registry.observe_many(items)
+    _timer.set(None)
+
+
+# СЧЁТЧИКИ
+
+def count_bytes(direction: str, amount: int):
+    """direction - "read" или "write" """
+    registry.inc("myshift_storage_bytes_total", (("direction", direction),), amount)
+
+
+def cache_access(cache: str, hit: bool, count: int = 1):
+    if count:
+        registry.inc("myshift_cache_requests_total", (("cache", cache), ("result", "hit" if hit else "miss")), count)
@@ -0,0 +1,340 @@
+"""Составление расписания по правилам покрытия.
+
+Вместо фиксированной ротации смены подбираются под COVERAGE_RULES:
+день роли делится на слоты по SLOT_MINUTES, и жадный алгоритм берёт
+смену (шаблон начала и длины), которая закрывает больше всего недобора
+на час работы, отдавая её наименее загруженному сотруднику, которому
+это позволяют ограничения. Затем, пока не кончится бюджет времени,
+локальный поиск убирает лишние смены, укорачивает длинные и
+выравнивает часы между сотрудниками.
+
+Сотрудник ростера - словарь:
+    name, role
+    max_hours       - часов в неделю (ISO-неделя)
+    min_rest_hours  - отдых между сменами соседних дней
+    availability    - {день недели 0..6: ["HH:MM", "HH:MM"] или None - выходной}
+    unavailable     - список дат "YYYY-MM-DD", когда сотрудник не работает
+"""
+import time
+from datetime import date as date_type
+from typing import List, Dict, Any, Optional, Tuple
+
+from coverage_engine import parse_minutes, shift_span, MINUTES_PER_DAY
+
+SLOT_MINUTES = 30
+DEFAULT_SHIFT_HOURS = (4, 6, 8)
+DEFAULT_MAX_HOURS = 40
+DEFAULT_MIN_REST_HOURS = 11
+# Сколько секунд тратить на улучшение жадного решения
+DEFAULT_TIME_BUDGET = 0.5
+
+UNLIMITED = 1 << 30
+
+
+def make_roster(employees: Dict[str, List[str]],
+                constraints: Optional[Dict[str, Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+    """Ростер из {роль: [имена]} с ограничениями по умолчанию.
+
+    constraints - {имя: {поле: значение}} для отдельных сотрудников.
+    """
+    constraints = constraints or {}
+    roster = []
+    for role, names in employees.items():
+        for name in names:
+            roster.append({
+                "name": name,
+                "role": role,
+                "max_hours": DEFAULT_MAX_HOURS,
+                "min_rest_hours": DEFAULT_MIN_REST_HOURS,
+                "availability": {},
+                "unavailable": [],
+                **constraints.get(name, {}),
+            })
+    return roster
+
+
+def format_minutes(minutes: int) -> str:
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+class _Grid:
+    """Слоты одной роли: потребность (min) и предел (max) из правил"""
+
+    def __init__(self, intervals: List[Dict[str, Any]], shift_hours):
+        spans = [(parse_minutes(i["start"]), parse_minutes(i["end"])) for i in intervals]
+        self.open = min(start for start, _ in spans) // SLOT_MINUTES * SLOT_MINUTES
+        close = -(-max(end for _, end in spans) // SLOT_MINUTES) * SLOT_MINUTES
+        size = (close - self.open) // SLOT_MINUTES
+        self.need = [0] * size
+        self.cap = [UNLIMITED] * size
+        for interval, (start, end) in zip(intervals, spans):
+            for i in range(*self.slots(start, end)):
+                self.need[i] = max(self.need[i], interval["min"])
+                self.cap[i] = min(self.cap[i], interval["max"])
+
+        lengths = {round(hours * 60 / SLOT_MINUTES) for hours in shift_hours}
+        lengths = [length for length in lengths if 0 < length <= size] or [size]
+        self.templates = sorted((start, start + length)
+                                for length in lengths for start in range(size - length + 1))
+
+    def slots(self, start: int, end: int) -> Tuple[int, int]:
+        """Минуты -> диапазон слотов, которые смена задевает"""
+        first = max(0, (start - self.open) // SLOT_MINUTES)
+        last = min(len(self.need), -(-(end - self.open) // SLOT_MINUTES))
+        return first, max(first, last)
+
+    def minutes(self, slot: int) -> int:
+        return self.open + slot * SLOT_MINUTES
+
+
+class _Planner:
+    def __init__(self, rules, roster, dates, shift_hours):
+        self.grids = {role: _Grid(intervals, shift_hours) for role, intervals in rules.items() if intervals}
+        self.days = {}
+        for date in dates:
+            day = date_type.fromisoformat(date)
+            self.days[date] = (day.toordinal(), day.weekday(), day.isocalendar()[:2])
+        self.employees = {role: [e for e in roster if e["role"] == role] for role in self.grids}
+        self.cover = {(date, role): [0] * len(grid.need) for date in dates for role, grid in self.grids.items()}
+        self.assignments: List[Dict[str, Any]] = []
+        # Занятость сотрудников: минуты за неделю и смена в каждый день
+        self.week_minutes: Dict[Tuple[str, Any], int] = {}
+        self.day_spans: Dict[Tuple[str, int], Tuple[int, int]] = {}
+
+    def add_existing(self, shift):
+        """Уже сохранённая смена: учитывается в покрытии и в нагрузке сотрудника"""
+        span = shift_span(shift)
+        try:
+            day = date_type.fromisoformat(shift.get("date"))
+        except (TypeError, ValueError):
+            return
+        if span is None:
+            return
+        name = shift.get("employee")
+        week = day.isocalendar()[:2]
+        self.week_minutes[(name, week)] = self.week_minutes.get((name, week), 0) + span[1] - span[0]
+        self.day_spans[(name, day.toordinal())] = span
+
+        grid = self.grids.get(shift.get("role"))
+        cover = self.cover.get((shift.get("date"), shift.get("role")))
+        if grid is not None and cover is not None:
+            for i in range(*grid.slots(*span)):
+                cover[i] += 1
+
+    def eligible(self, employee, date, start, end) -> bool:
+        ordinal, weekday, week = self.days[date]
+        name = employee["name"]
+        if (name, ordinal) in self.day_spans:
+            return False
+        if date in employee["unavailable"]:
+            return False
+        window = employee["availability"].get(weekday, employee["availability"].get(str(weekday), ""))
+        if window is None:
+            return False
+        if window and not (parse_minutes(window[0]) <= start and end <= parse_minutes(window[1])):
+            return False
+        if self.week_minutes.get((name, week), 0) + end - start > employee["max_hours"] * 60:
+            return False
+        rest = employee["min_rest_hours"] * 60
+        before = self.day_spans.get((name, ordinal - 1))
+        after = self.day_spans.get((name, ordinal + 1))
+        if before is not None and start + MINUTES_PER_DAY - before[1] < rest:
+            return False
+        if after is not None and after[0] + MINUTES_PER_DAY - end < rest:
+            return False
+        return True
+
+    def pick(self, role, date, start, end, exclude=None) -> Optional[Dict[str, Any]]:
+        """Наименее загруженный за неделю сотрудник, которому подходит смена"""
+        week = self.days[date][2]
+        best = None
+        for employee in self.employees[role]:
+            if employee is exclude or not self.eligible(employee, date, start, end):
+                continue
+            load = self.week_minutes.get((employee["name"], week), 0)
+            if best is None or load < best[0]:
+                best = (load, employee)
+        return best[1] if best else None
+
+    def _book(self, assignment, sign):
+        grid = self.grids[assignment["role"]]
+        cover = self.cover[(assignment["date"], assignment["role"])]
+        for i in range(assignment["slots"][0], assignment["slots"][1]):
+            cover[i] += sign
+        ordinal, _, week = self.days[assignment["date"]]
+        name = assignment["employee"]["name"]
+        start, end = grid.minutes(assignment["slots"][0]), grid.minutes(assignment["slots"][1])
+        self.week_minutes[(name, week)] = self.week_minutes.get((name, week), 0) + sign * (end - start)
+        if sign > 0:
+            self.day_spans[(name, ordinal)] = (start, end)
+        else:
+            del self.day_spans[(name, ordinal)]
+
+    def assign(self, date, role, slots, employee):
+        assignment = {"date": date, "role": role, "slots": slots, "employee": employee}
+        self._book(assignment, +1)
+        self.assignments.append(assignment)
+        return assignment
+
+    def unassign(self, assignment):
+        self._book(assignment, -1)
+        self.assignments.remove(assignment)
+
+    def greedy(self, date, role) -> bool:
+        """Добирает смены, пока есть недобор и кому их отдать"""
+        grid = self.grids[role]
+        cover = self.cover[(date, role)]
+        blocked = set()
+        added = False
+        while True:
+            # Префиксные суммы недобора и переполнения: оценка шаблона за O(1)
+            short = [0]
+            full = [0]
+            for have, need, cap in zip(cover, grid.need, grid.cap):
+                short.append(short[-1] + (have < need))
+                full.append(full[-1] + (have >= cap))
+
+            best = None
+            for template in grid.templates:
+                start, end = template
+                gain = short[end] - short[start]
+                if not gain or template in blocked:
+                    continue
+                score = ((gain - (full[end] - full[start])) / (end - start), gain)
+                if best is None or score > best[0]:
+                    best = (score, template)
+            if best is None:
+                return added
+
+            template = best[1]
+            employee = self.pick(role, date, grid.minutes(template[0]), grid.minutes(template[1]))
+            if employee is None:
+                blocked.add(template)
+                continue
+            self.assign(date, role, template, employee)
+            added = True
+
+    def _removable(self, assignment, keep=(0, 0)) -> bool:
+        """Покрытие останется не ниже min без слотов смены вне keep"""
+        grid = self.grids[assignment["role"]]
+        cover = self.cover[(assignment["date"], assignment["role"])]
+        start, end = assignment["slots"]
+        return all(cover[i] - 1 >= grid.need[i]
+                   for i in range(start, end) if not keep[0] <= i < keep[1])
+
+    def drop_redundant(self) -> bool:
+        changed = False
+        for assignment in sorted(self.assignments, key=lambda a: a["slots"][0] - a["slots"][1]):
+            if self._removable(assignment):
+                self.unassign(assignment)
+                changed = True
+        return changed
+
+    def shrink(self) -> bool:
+        """Заменяет смену более короткой внутри неё, если покрытие не падает"""
+        changed = False
+        for assignment in list(self.assignments):
+            start, end = assignment["slots"]
+            shorter = sorted((t for t in self.grids[assignment["role"]].templates
+                              if start <= t[0] and t[1] <= end and t[1] - t[0] < end - start),
+                             key=lambda t: t[1] - t[0])
+            for template in shorter:
+                if self._removable(assignment, keep=template):
+                    employee = assignment["employee"]
+                    self.unassign(assignment)
+                    self.assign(assignment["date"], assignment["role"], template, employee)
+                    changed = True
+                    break
+        return changed
+
+    def rebalance(self) -> bool:
+        """Переносит смены с самых загруженных сотрудников на свободных"""
+        changed = False
+        for assignment in sorted(self.assignments, key=lambda a: (a["date"], a["role"], a["slots"])):
+            date, role = assignment["date"], assignment["role"]
+            grid = self.grids[role]
+            week = self.days[date][2]
+            start, end = grid.minutes(assignment["slots"][0]), grid.minutes(assignment["slots"][1])
+            owner = assignment["employee"]
+            load = self.week_minutes.get((owner["name"], week), 0)
+            self.unassign(assignment)
+            other = self.pick(role, date, start, end, exclude=owner)
+            if other is not None and load - self.week_minutes.get((other["name"], week), 0) > end - start:
+                self.assign(date, role, assignment["slots"], other)
+                changed = True
+            else:
+                self.assign(date, role, assignment["slots"], owner)
+        return changed
+
+    def improve(self, deadline):
+        steps = (self.drop_redundant, self.shrink, self.rebalance, self.fill_gaps)
+        changed = True
+        while changed:
+            changed = False
+            for step in steps:
+                if time.perf_counter() >= deadline:
+                    return
+                changed = step() or changed
+
+    def fill_gaps(self) -> bool:
+        added = False
+        for (date, role) in self.cover:
+            added = self.greedy(date, role) or added
+        return added
+
+    def result(self) -> Dict[str, Any]:
+        role_order = list(self.grids)
+        shifts = []
+        for assignment in sorted(self.assignments, key=lambda a: (a["date"], role_order.index(a["role"]),
+                                                                 a["slots"], a["employee"]["name"])):
+            grid = self.grids[assignment["role"]]
+            shifts.append({
+                "date": assignment["date"],
+                "start_time": format_minutes(grid.minutes(assignment["slots"][0])),
+                "end_time": format_minutes(grid.minutes(assignment["slots"][1])),
+                "employee": assignment["employee"]["name"],
+                "role": assignment["role"],
+                "required": True,
+            })
+
+        unmet = []
+        for (date, role), cover in self.cover.items():
+            grid = self.grids[role]
+            i = 0
+            while i < len(cover):
+                if cover[i] >= grid.need[i]:
+                    i += 1
+                    continue
+                first, missing = i, 0
+                while i < len(cover) and cover[i] < grid.need[i]:
+                    missing = max(missing, grid.need[i] - cover[i])
+                    i += 1
+                unmet.append({"date": date, "role": role, "start": format_minutes(grid.minutes(first)),
+                              "end": format_minutes(grid.minutes(i)), "missing": missing})
+
+        hours: Dict[str, float] = {}
+        for shift in shifts:
+            start, end = shift_span(shift)
+            hours[shift["employee"]] = hours.get(shift["employee"], 0) + (end - start) / 60
+        return {"shifts": shifts, "unmet": unmet, "hours": hours}
+
+
+def build_schedule(rules: Dict[str, List[Dict[str, Any]]], roster: List[Dict[str, Any]],
+                   dates: List[str], existing: Optional[List[Dict[str, Any]]] = None,
+                   time_budget: float = DEFAULT_TIME_BUDGET,
+                   shift_hours=DEFAULT_SHIFT_HOURS) -> Dict[str, Any]:
+    """Расписание на dates: {"shifts": [...], "unmet": [...], "hours": {имя: часы}}.
+
+    existing - уже сохранённые смены (лучше за полные недели вокруг dates):
+    они входят в покрытие, недельные часы и отдых сотрудников.
+    unmet - участки, где минимум не закрыть имеющимися сотрудниками.
+    """
+    deadline = time.perf_counter() + time_budget
+    planner = _Planner(rules, roster, dates, shift_hours)
+    for shift in existing or ():
+        planner.add_existing(shift)
+    for date in dates:
+        for role in planner.grids:
+            planner.greedy(date, role)
+    planner.improve(deadline)
+    return planner.result()
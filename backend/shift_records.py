@@ -0,0 +1,230 @@
+"""Компактное представление смены в памяти.
+
+Словарь смены из shifts.json занимает сотни байт: сам dict, отдельные
+строки даты, времени, имени сотрудника в каждой смене. ShiftRecord
+хранит то же самое в __slots__: дату - номером дня (ordinal), время -
+минутами от полуночи, сотрудника и роль - номерами в общей таблице
+строк. Одинаковые числа, строки и наборы дополнительных полей
+разделяются между записями, так что на смену остаётся объект в
+несколько указателей и её ID.
+
+Словарь API собирается только на выходе (to_dict). Значения, которые
+не переводятся в компактный вид без потерь (другой формат даты или
+времени, не строка вместо имени), лежат в extra как есть.
+"""
+import threading
+from array import array
+from datetime import date as date_type
+from typing import List, Dict, Any, Iterable, Optional, Tuple
+
+from coverage_engine import parse_minutes
+
+MINUTES_PER_DAY = 24 * 60
+
+# Готовые строки и числа для всех минут суток: записи ссылаются на общие объекты
+_TIME_STRINGS = tuple(f"{m // 60:02d}:{m % 60:02d}" for m in range(MINUTES_PER_DAY + 1))
+_TIME_MINUTES = {text: minutes for minutes, text in enumerate(_TIME_STRINGS)}
+
+_day_by_text: Dict[str, int] = {}
+_text_by_day: Dict[int, str] = {}
+
+
+def day_number(value) -> Optional[int]:
+    """"YYYY-MM-DD" -> ordinal дня (общий объект int), None если формат другой"""
+    day = _day_by_text.get(value)
+    if day is not None or not isinstance(value, str):
+        return day
+    try:
+        parsed = date_type.fromisoformat(value)
+    except ValueError:
+        return None
+    if parsed.isoformat() != value:
+        return None
+    day = parsed.toordinal()
+    _text_by_day.setdefault(day, value)
+    _day_by_text[value] = day
+    return day
+
+
+def day_text(day: int) -> str:
+    text = _text_by_day.get(day)
+    if text is None:
+        text = _text_by_day.setdefault(day, date_type.fromordinal(day).isoformat())
+    return text
+
+
+def time_minutes(value) -> Optional[int]:
+    """"HH:MM" -> минуты от полуночи, None если формат другой"""
+    return _TIME_MINUTES.get(value) if isinstance(value, str) else None
+
+
+def time_text(minutes: int) -> str:
+    return _TIME_STRINGS[minutes]
+
+
+class StringTable:
+    """Строка <-> номер; номер хранится в записи вместо отдельной строки"""
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self._values: List[str] = []
+        self._lock = threading.Lock()
+
+    def id(self, value: str) -> int:
+        found = self._ids.get(value)
+        if found is None:
+            with self._lock:
+                found = self._ids.get(value)
+                if found is None:
+                    self._values.append(value)
+                    found = self._ids[value] = len(self._values) - 1
+        return found
+
+    def find(self, value: str) -> Optional[int]:
+        return self._ids.get(value)
+
+    def value(self, value_id: int) -> str:
+        return self._values[value_id]
+
+
+# Таблицы общие для процесса: одинаковые имена во всех магазинах - одни строки
+employees = StringTable()
+roles = StringTable()
+
+# Одинаковые наборы дополнительных полей ({"required": true}) - один объект.
+# Уникальные наборы (заметки к сменам) после MAX_SHARED_EXTRAS не кэшируются
+MAX_SHARED_EXTRAS = 10000
+_extras: Dict[Tuple, Dict[str, Any]] = {}
+
+COMPACT_FIELDS = ("id", "date", "start_time", "end_time", "employee", "role", "version")
+
+
+def _shared_extra(extra: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    if not extra:
+        return None
+    try:
+        key = tuple(extra.items())
+        shared = _extras.get(key)
+    except TypeError:  # списки и словари внутри - без разделения
+        return extra
+    if shared is None and len(_extras) < MAX_SHARED_EXTRAS:
+        shared = _extras.setdefault(key, extra)
+    return shared or extra
+
+
+class ShiftRecord:
+    __slots__ = ("id", "day", "start", "end", "employee", "role", "version", "extra")
+
+    def __init__(self, shift_id, day, start, end, employee, role, version, extra):
+        self.id = shift_id
+        self.day = day
+        self.start = start
+        self.end = end
+        self.employee = employee
+        self.role = role
+        self.version = version
+        # Не меняется после создания: может быть общим для многих записей
+        self.extra = extra
+
+    @classmethod
+    def from_dict(cls, shift: Dict[str, Any]) -> "ShiftRecord":
+        extra = {k: v for k, v in shift.items() if k not in COMPACT_FIELDS}
+
+        def compact(key, convert):
+            if key not in shift:
+                return None
+            value = convert(shift[key])
+            if value is None:
+                extra[key] = shift[key]
+            return value
+
+        return cls(
+            shift.get("id"),
+            compact("date", day_number),
+            compact("start_time", time_minutes),
+            compact("end_time", time_minutes),
+            compact("employee", lambda v: employees.id(v) if isinstance(v, str) else None),
+            compact("role", lambda v: roles.id(v) if isinstance(v, str) else None),
+            shift.get("version"),
+            _shared_extra(extra),
+        )
+
+    @property
+    def date_key(self):
+        """Ключ индекса по дате: номер дня или исходное значение нестандартной даты"""
+        if self.day is not None:
+            return self.day
+        return self.extra.get("date") if self.extra else None
+
+    def to_dict(self) -> Dict[str, Any]:
+        shift: Dict[str, Any] = {"id": self.id}
+        if self.day is not None:
+            shift["date"] = day_text(self.day)
+        if self.start is not None:
+            shift["start_time"] = _TIME_STRINGS[self.start]
+        if self.end is not None:
+            shift["end_time"] = _TIME_STRINGS[self.end]
+        if self.employee is not None:
+            shift["employee"] = employees.value(self.employee)
+        if self.role is not None:
+            shift["role"] = roles.value(self.role)
+        if self.extra:
+            shift.update(self.extra)
+        if self.version is not None:
+            shift["version"] = self.version
+        return shift
+
+
+# Нет значения в колонке (дата, время, сотрудник или роль не заданы или не разобраны)
+MISSING = -1
+
+
+class ShiftColumns:
+    """Смены по колонкам: массивы int32 одинаковой длины.
+
+    day - ordinal даты, start/end - минуты от полуночи, employee/role -
+    номера в таблицах employees/roles; MISSING, если значения нет. Для
+    отчётов: массивы читаются NumPy без копирования (np.frombuffer).
+    """
+    __slots__ = ("day", "start", "end", "employee", "role")
+
+    def __init__(self, day=None, start=None, end=None, employee=None, role=None):
+        self.day = day if day is not None else array('i')
+        self.start = start if start is not None else array('i')
+        self.end = end if end is not None else array('i')
+        self.employee = employee if employee is not None else array('i')
+        self.role = role if role is not None else array('i')
+
+    def __len__(self):
+        return len(self.day)
+
+    def extend(self, other: "ShiftColumns") -> None:
+        for name in self.__slots__:
+            getattr(self, name).extend(getattr(other, name))
+
+    @classmethod
+    def from_records(cls, records: List[ShiftRecord]) -> "ShiftColumns":
+        def column(values):
+            return array('i', [MISSING if value is None else value for value in values])
+
+        columns = cls(
+            column([r.day for r in records]),
+            column([r.start for r in records]),
+            column([r.end for r in records]),
+            column([r.employee for r in records]),
+            column([r.role for r in records]),
+        )
+        # Время не в формате HH:MM (лежит в extra) разбирается отдельно, таких записей мало
+        for i, record in enumerate(records):
+            if record.extra and (record.start is None or record.end is None):
+                for key, target in (("start_time", columns.start), ("end_time", columns.end)):
+                    minutes = parse_minutes(record.extra.get(key))
+                    if minutes is not None:
+                        target[i] = minutes
+        return columns
+
+    @classmethod
+    def from_dicts(cls, shifts: Iterable[Dict[str, Any]]) -> "ShiftColumns":
+        """Для хранилищ без компактных записей (SQLite)"""
+        return cls.from_records([ShiftRecord.from_dict(shift) for shift in shifts])
+
@@ -0,0 +1,629 @@
+import atexit
+import bisect
+import logging
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import date as date_type, timedelta
+from typing import List, Dict, Any, Callable, Iterator, Optional, Tuple
+
+import codec
+import metrics
+from archive import Archive, ArchivedShift, archivable
+from changelog import ChangeJournal
+from shift_records import ShiftRecord, ShiftColumns, day_number, day_text, employees, roles
+
+logger = logging.getLogger(__name__)
+
+try:
+    import fcntl
+except ImportError:  # Windows: остаётся только блокировка внутри процесса
+    fcntl = None
+
+# Задержка отложенной записи новых смен (сек). По умолчанию 0: запись
+# (с fsync) до снятия блокировки, и отложенной записи нет. Больше 0 - только
+# для одного процесса: отложенные смены не видят другие воркеры (проверка
+# пересечений, занятые даты генерации), при падении процесса они теряются
+# уже после ответа 201, а GET отвечает без ETag, пока они не записаны
+FLUSH_DELAY = float(os.environ.get("MYSHIFT_FLUSH_DELAY", "0"))
+
+# Месяцы, закончившиеся раньше чем столько дней назад, уходят в архив (archive.py).
+# 0 - не архивировать; уже архивные месяцы читаются в любом случае
+ARCHIVE_DAYS = int(os.environ.get("MYSHIFT_ARCHIVE_DAYS", "0"))
+
+
+class VersionConflict(Exception):
+    """Смену изменили после того, как клиент её прочитал"""
+
+    def __init__(self, current: Dict[str, Any]):
+        super().__init__(f"Shift {current.get('id')} has version {current.get('version', 1)}")
+        self.current = current
+
+
+class ShiftStore:
+    """Смены одного JSON файла, загруженные в память процесса.
+
+    Файл читается один раз и перечитывается только если изменились его
+    inode, mtime или размер. Каждое изменение записывается на диск одной
+    атомарной записью (временный файл + rename) до конца транзакции; при
+    flush_delay > 0 новые смены копятся в памяти и пишутся пачкой.
+
+    Смены проиндексированы по ID, по дате и по паре (сотрудник, дата),
+    поэтому выборка за день и правка одной смены не просматривают весь файл.
+    В памяти смены лежат компактными ShiftRecord (дата - номер дня, время -
+    минуты); словари API собираются только при выдаче.
+
+    Все изменения выполняются внутри transaction(): она берёт межпроцессную
+    блокировку (flock на <файл>.lock) и подтягивает чужие записи с диска.
+    Несохранённые изменения хранятся журналом и накатываются поверх
+    перечитанного файла, поэтому воркеры не затирают смены друг друга.
+    ID выдаются из файла-счётчика <файл>.seq и не повторяются между процессами.
+    Записанные изменения дописываются в общий журнал <файл>.changes
+    (changelog.ChangeJournal), по нему все процессы отдают одни версии.
+
+    Прошедшие месяцы старше archive_days переносятся в неизменяемые
+    сегменты <файл>.archive/ (Archive); чтения за период, по дате и по ID
+    объединяют архив с файлом, а изменить архивную смену нельзя
+    (ArchivedShift).
+    """
+
+    def __init__(self, path: str, flush_delay: float = FLUSH_DELAY, archive_days: Optional[int] = None):
+        self.path = path
+        self.flush_delay = flush_delay
+        self.archive_days = ARCHIVE_DAYS if archive_days is None else archive_days
+        self.archive = Archive(path + '.archive')
+        self.change_journal = ChangeJournal(path + '.changes')
+        self._lock = threading.RLock()
+        self._by_id: Dict[Any, ShiftRecord] = {}
+        self._by_date: Dict[Any, Dict[Any, ShiftRecord]] = {}
+        self._by_employee_date: Dict[Tuple[Any, Any], Dict[Any, ShiftRecord]] = {}
+        # Номера дней, по которым есть смены, по возрастанию
+        self._dates: List[int] = []
+        self._ids: List[int] = []
+        self._max_id = 0
+        self._signature = None
+        self._loaded = False
+        self._pending: List[Tuple[str, Any]] = []
+        # В журнале есть изменение после проверки версии: писать до снятия блокировки
+        self._pending_checked = False
+        # События (kind, old, new) ещё не записанных изменений для журнала
+        self._changes: List[Tuple[str, Any, Any]] = []
+        self._timer: Optional[threading.Timer] = None
+        self._lock_file = None
+        self._lock_depth = 0
+        self._listeners: List[Callable[[str, Any, Any], None]] = []
+        # Растёт при каждом изменении записей в памяти (snapshot.py публикует по нему)
+        self.revision = 0
+
+    # ЗАГРУЗКА
+
+    def _file_signature(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def _ensure_fresh(self):
+        """Перечитывает файл, если его изменили извне (вызывать под блокировкой)"""
+        signature = self._file_signature()
+        if self._loaded and signature == self._signature:
+            metrics.cache_access("shift_store", True)
+            return
+        metrics.cache_access("shift_store", False)
+        self._load(signature)
+        for op in self._pending:
+            self._replay(op)
+        self._notify("reload", None, None)
+        if self._lock_depth == 0 and self._has_old_months():
+            # Старые месяцы в файле (первый запуск, архивация включена позже)
+            with self.transaction():
+                pass
+
+    def _load(self, signature):
+        shifts: List[Dict[str, Any]] = []
+        if signature is not None:
+            try:
+                shifts = codec.read_file(self.path)
+            except (codec.DecodeError, OSError):
+                shifts = []
+        self._rebuild(shifts)
+        self.archive.refresh()
+        self._signature = signature
+        self._loaded = True
+
+    def _rebuild(self, shifts: List[Dict[str, Any]]):
+        self._by_id = {}
+        self._by_date = {}
+        self._by_employee_date = {}
+        self._dates = []
+        for shift in shifts:
+            self._index(ShiftRecord.from_dict(shift))
+        self._ids = sorted(k for k in self._by_id if isinstance(k, int))
+        self._max_id = max(self._ids, default=0)
+        self.revision += 1
+
+    def _replay(self, op: Tuple[str, Any]):
+        """Накатывает несохранённое изменение поверх перечитанного файла"""
+        kind, value = op
+        if kind == "put":
+            self._put(value)
+        elif kind == "delete":
+            self._remove(value)
+        elif kind == "replace":
+            self._rebuild(value)
+        elif kind == "archive":
+            for shift_id in value:
+                self._remove(shift_id)
+
+    # ПОДПИСЧИКИ
+
+    def add_listener(self, listener: Callable[[str, Any, Any], None]) -> None:
+        """Подписка на изменения: listener(kind, old, new).
+
+        kind - "create", "update", "delete" или "reload" (данные перечитаны
+        целиком, old и new равны None). Вызывается под блокировкой хранилища.
+        """
+        self._listeners.append(listener)
+
+    def _notify(self, kind: str, old, new):
+        for listener in self._listeners:
+            listener(kind, old, new)
+
+    # ИНДЕКСЫ
+
+    @staticmethod
+    def _date_key(date):
+        """Ключ индекса для даты из запроса: номер дня или строка как есть"""
+        day = day_number(date)
+        return date if day is None else day
+
+    @staticmethod
+    def _employee_key(record: ShiftRecord):
+        if record.employee is not None:
+            return record.employee
+        return ("raw", record.extra.get("employee") if record.extra else None)
+
+    def _index(self, record: ShiftRecord):
+        date = record.date_key
+        self._by_id[record.id] = record
+        day = self._by_date.get(date)
+        if day is None:
+            day = self._by_date[date] = {}
+            if isinstance(date, int):
+                bisect.insort(self._dates, date)
+        day[record.id] = record
+        self._by_employee_date.setdefault((self._employee_key(record), date), {})[record.id] = record
+
+    def _unindex(self, record: ShiftRecord):
+        date = record.date_key
+
+        day = self._by_date.get(date)
+        if day is not None:
+            day.pop(record.id, None)
+            if not day:
+                del self._by_date[date]
+                if isinstance(date, int):
+                    del self._dates[bisect.bisect_left(self._dates, date)]
+
+        key = (self._employee_key(record), date)
+        bucket = self._by_employee_date.get(key)
+        if bucket is not None:
+            bucket.pop(record.id, None)
+            if not bucket:
+                del self._by_employee_date[key]
+
+    def _put(self, shift: Dict[str, Any]):
+        """Добавляет смену или заменяет смену с тем же ID"""
+        record = ShiftRecord.from_dict(shift)
+        old = self._by_id.get(record.id)
+        if old is not None:
+            self._unindex(old)
+        elif isinstance(record.id, int):
+            bisect.insort(self._ids, record.id)
+        self._index(record)
+        if isinstance(record.id, int):
+            self._max_id = max(self._max_id, record.id)
+        self.revision += 1
+
+    def _remove(self, shift_id) -> Optional[Dict[str, Any]]:
+        record = self._by_id.pop(shift_id, None)
+        if record is None:
+            return None
+        self._unindex(record)
+        if isinstance(shift_id, int):
+            del self._ids[bisect.bisect_left(self._ids, shift_id)]
+        self.revision += 1
+        return record.to_dict()
+
+    # ЧТЕНИЕ
+
+    def refresh(self) -> None:
+        """Подтягивает изменения других процессов (и уведомляет подписчиков)"""
+        with self._lock:
+            self._ensure_fresh()
+
+    def all(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            self._ensure_fresh()
+            records = self.archive.records() + list(self._by_id.values())
+        return [record.to_dict() for record in records]
+
+    def count(self) -> int:
+        with self._lock:
+            self._ensure_fresh()
+            return len(self._by_id) + self.archive.count()
+
+    def get(self, shift_id: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._ensure_fresh()
+            record = self._by_id.get(shift_id)
+            if record is None:
+                record = self.archive.get(shift_id)
+            return record.to_dict() if record is not None else None
+
+    def is_archived(self, shift_id: int) -> bool:
+        """Смена есть только в архиве - её нельзя изменить или удалить"""
+        with self._lock:
+            self._ensure_fresh()
+            return shift_id not in self._by_id and self.archive.get(shift_id) is not None
+
+    def current_records(self) -> Tuple[int, List[ShiftRecord]]:
+        """Записи рабочего окна (без архива) и ревизия, которой они соответствуют"""
+        with self._lock:
+            self._ensure_fresh()
+            return self.revision, list(self._by_id.values())
+
+    def _archived_day(self, date) -> List[ShiftRecord]:
+        day = day_number(date)
+        return self.archive.records(day, day) if day is not None else []
+
+    def by_date(self, date: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            self._ensure_fresh()
+            records = self._archived_day(date) + list(self._by_date.get(self._date_key(date), {}).values())
+        return [record.to_dict() for record in records]
+
+    def by_employee(self, employee: str, date: str) -> List[Dict[str, Any]]:
+        employee_key = employees.find(employee) if isinstance(employee, str) else ("raw", employee)
+        with self._lock:
+            self._ensure_fresh()
+            records = [record for record in self._archived_day(date) if record.employee == employee_key]
+            records.extend(self._by_employee_date.get((employee_key, self._date_key(date)), {}).values())
+        return [record.to_dict() for record in records]
+
+    def _range_records(self, date_from: Optional[str], date_to: Optional[str]) -> Iterator[ShiftRecord]:
+        """Записи за период (вызывать под блокировкой).
+
+        Граница, которая не является датой YYYY-MM-DD, период не ограничивает.
+        """
+        lo_day = day_number(date_from)
+        hi_day = day_number(date_to)
+        lo = bisect.bisect_left(self._dates, lo_day) if lo_day is not None else 0
+        hi = bisect.bisect_right(self._dates, hi_day) if hi_day is not None else len(self._dates)
+        for day in self._dates[lo:hi]:
+            yield from self._by_date[day].values()
+
+    def _period_records(self, date_from: Optional[str], date_to: Optional[str]) -> List[ShiftRecord]:
+        """Архивные и текущие записи за период по датам (вызывать под блокировкой)"""
+        archived = self.archive.records(day_number(date_from), day_number(date_to))
+        current = list(self._range_records(date_from, date_to))
+        if archived and current and current[0].day <= archived[-1].day:
+            # Смены, добавленные в архивный месяц и ещё не перенесённые
+            return sorted(archived + current, key=lambda record: record.day)
+        return archived + current
+
+    def date_range(self, date_from: Optional[str] = None, date_to: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Смены с date_from по date_to включительно (границы необязательны)"""
+        with self._lock:
+            self._ensure_fresh()
+            records = self._period_records(date_from, date_to)
+        return [record.to_dict() for record in records]
+
+    def spans(self, date_from: Optional[str] = None,
+              date_to: Optional[str] = None) -> List[Tuple[str, Optional[str], Any, Any]]:
+        """(дата, роль, начало, конец) за период без сборки словарей смен.
+
+        Для расчёта покрытия. Время - минуты от полуночи, а если в смене
+        оно записано в другом формате, то исходное значение.
+        """
+        with self._lock:
+            self._ensure_fresh()
+            result = []
+            for record in self._period_records(date_from, date_to):
+                result.append((
+                    day_text(record.day),
+                    roles.value(record.role) if record.role is not None else None,
+                    record.start if record.start is not None else self._raw_time(record, "start_time"),
+                    record.end if record.end is not None else self._raw_time(record, "end_time"),
+                ))
+            return result
+
+    def columns(self, date_from: Optional[str] = None, date_to: Optional[str] = None) -> ShiftColumns:
+        """Смены за период колонками чисел - для отчётов, без словарей смен"""
+        with self._lock:
+            self._ensure_fresh()
+            records = list(self._range_records(date_from, date_to))
+            # Архив отдаёт колонки прямо из сегментов, без объектов смен
+            columns = self.archive.columns(day_number(date_from), day_number(date_to))
+        columns.extend(ShiftColumns.from_records(records))
+        return columns
+
+    @staticmethod
+    def _raw_time(record: ShiftRecord, key: str) -> Optional[str]:
+        # Время не в формате HH:MM лежит в extra; не строка - не время вовсе
+        value = record.extra.get(key) if record.extra else None
+        return value if isinstance(value, str) else None
+
+    def iter_shifts(self, after_id: Optional[int] = None, limit: Optional[int] = None,
+                    chunk_size: int = 500) -> Iterator[Dict[str, Any]]:
+        """Смены по возрастанию ID, начиная после after_id.
+
+        Блокировка берётся только на время выборки очередной порции, поэтому
+        длинный ответ не задерживает запись и не копирует всю историю.
+        """
+        cursor = after_id
+        remaining = limit
+        while remaining is None or remaining > 0:
+            size = chunk_size if remaining is None else min(chunk_size, remaining)
+            with self._lock:
+                self._ensure_fresh()
+                lo = bisect.bisect_right(self._ids, cursor) if cursor is not None else 0
+                records = [self._by_id[shift_id] for shift_id in self._ids[lo:lo + size]]
+                archived = self.archive.records_after(cursor, size)
+            if archived:
+                records = sorted(records + archived, key=lambda record: record.id)[:size]
+            chunk = [record.to_dict() for record in records]
+            if not chunk:
+                return
+            yield from chunk
+            cursor = chunk[-1]["id"]
+            if remaining is not None:
+                remaining -= len(chunk)
+
+    def has_unwritten_changes(self) -> bool:
+        """Есть изменения, которые видны в памяти, но ещё не записаны в файл и журнал"""
+        with self._lock:
+            return bool(self._changes)
+
+    # ИЗМЕНЕНИЕ
+
+    @contextmanager
+    def transaction(self):
+        """Блокировка read-modify-write для потоков и процессов.
+
+        Вложенные вызовы разделяют одну блокировку. При FLUSH_DELAY = 0
+        изменения записываются на диск до снятия блокировки; update и delete
+        (проверка версии и существования смены) - при любой задержке,
+        иначе накат журнала затёр бы запись другого воркера.
+        """
+        with self._lock:
+            if self._lock_depth == 0:
+                self._acquire_file_lock()
+            self._lock_depth += 1
+            try:
+                self._ensure_fresh()
+                if self._lock_depth == 1:
+                    self._archive_old()
+                yield self
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0:
+                    try:
+                        if self._pending and (self.flush_delay <= 0 or self._pending_checked):
+                            self._write()
+                    finally:
+                        self._release_file_lock()
+
+    def _acquire_file_lock(self):
+        if fcntl is None:
+            return
+        self._lock_file = open(self.path + '.lock', 'a')
+        fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX)
+
+    def _release_file_lock(self):
+        if self._lock_file is not None:
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+            self._lock_file.close()
+            self._lock_file = None
+
+    def _allocate_ids(self, count: int) -> range:
+        """Выдаёт count новых ID из общего для процессов счётчика <файл>.seq"""
+        seq_path = self.path + '.seq'
+        try:
+            with open(seq_path, 'r') as f:
+                last = int(f.read().strip() or 0)
+        except (OSError, ValueError):
+            last = 0
+        first = max(last, self._max_id) + 1
+        with open(seq_path, 'w') as f:
+            f.write(str(first + count - 1))
+        self._max_id = first + count - 1
+        return range(first, first + count)
+
+    def create(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Добавляет смену с новым ID и возвращает её"""
+        return self.create_many([data])[0]
+
+    def create_many(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Добавляет смены одной операцией, назначая им новые ID"""
+        with self.transaction():
+            created = []
+            for shift_id, data in zip(self._allocate_ids(len(items)), items):
+                shift = {"id": shift_id, **{k: v for k, v in data.items() if k not in ("id", "version")}}
+                shift["version"] = 1
+                self._put(shift)
+                self._journal(("put", shift), ("create", None, shift))
+                created.append(shift)
+            return created
+
+    def update(self, shift_id: int, changes: Dict[str, Any],
+               expected_version: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """Обновляет поля смены (None-значения пропускаются).
+
+        Если передан expected_version и он не совпадает с текущей версией
+        смены, бросает VersionConflict.
+        """
+        with self.transaction():
+            record = self._by_id.get(shift_id)
+            if record is None:
+                if self.archive.get(shift_id) is not None:
+                    raise ArchivedShift(shift_id)
+                return None
+            shift = record.to_dict()
+
+            version = shift.get("version", 1)
+            if expected_version is not None and expected_version != version:
+                raise VersionConflict(shift)
+
+            updated = dict(shift)
+            for key, value in changes.items():
+                if value is not None and key not in ("id", "version"):
+                    updated[key] = value
+            updated["version"] = version + 1
+            self._put(updated)
+            self._journal(("put", updated), ("update", shift, updated), checked=True)
+            return updated
+
+    def replace_all(self, shifts: List[Dict[str, Any]]) -> None:
+        """Заменяет все смены переданным списком (архив удаляется)"""
+        with self.transaction():
+            self.archive.clear()
+            self._rebuild(shifts)
+            self._journal(("replace", shifts), ("reload", None, None), checked=True)
+
+    def delete(self, shift_id: int) -> bool:
+        with self.transaction():
+            shift = self._remove(shift_id)
+            if shift is None:
+                if self.archive.get(shift_id) is not None:
+                    raise ArchivedShift(shift_id)
+                return False
+            self._journal(("delete", shift_id), ("delete", shift, None), checked=True)
+            return True
+
+    # АРХИВ
+
+    def _archive_cutoff(self) -> Optional[int]:
+        """Первый день месяца, смены с которого остаются в файле; None - архив выключен"""
+        if self.archive_days <= 0:
+            return None
+        edge = date_type.today() - timedelta(days=self.archive_days)
+        return edge.replace(day=1).toordinal()
+
+    def _has_old_months(self) -> bool:
+        cutoff = self._archive_cutoff()
+        return cutoff is not None and bool(self._dates) and self._dates[0] < cutoff
+
+    def _archive_old(self):
+        """Переносит месяцы старше отсечки в архив (вызывать в транзакции).
+
+        Подписчики не уведомляются: смены не меняются, меняется только место
+        хранения. Другие процессы перечитают уменьшившийся файл и архив.
+        """
+        if not self._has_old_months():
+            return
+        cutoff = self._archive_cutoff()
+        old_days = self._dates[:bisect.bisect_left(self._dates, cutoff)]
+        records = [record for day in old_days for record in self._by_date[day].values() if archivable(record)]
+        if not records:
+            return
+        with metrics.phase("storage_write"):
+            # Сначала сегменты, потом файл: смена не пропадает ни на миг
+            self.archive.add(records)
+            ids = [record.id for record in records]
+            for shift_id in ids:
+                self._remove(shift_id)
+            self._pending.append(("archive", ids))
+            self._write_file()
+
+    # ЗАПИСЬ НА ДИСК
+
+    def _journal(self, op: Tuple[str, Any], event: Tuple[str, Any, Any], checked: bool = False):
+        self._pending.append(op)
+        self._changes.append(event)
+        self._notify(*event)
+        self._pending_checked = self._pending_checked or checked
+        if self.flush_delay > 0 and self._timer is None:
+            self._timer = threading.Timer(self.flush_delay, self._flush_later)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self) -> bool:
+        """Атомарно записывает накопленные изменения в файл"""
+        with self._lock:
+            if not self._pending:
+                return True
+        with self.transaction():
+            return self._write()
+
+    def _flush_later(self):
+        """Запись по таймеру: ошибку вернуть некому, она пишется в лог"""
+        try:
+            self.flush()
+        except OSError:
+            logger.exception("Deferred write of %s failed", self.path)
+
+    def _write(self) -> bool:
+        with metrics.phase("storage_write"):
+            return self._write_file()
+
+    def _write_file(self) -> bool:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return True
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.shifts-', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                codec.write_file(f, [record.to_dict() for record in self._by_id.values()])
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            # Изменений нет на диске: память откатывается к файлу при следующем
+            # обращении, а запрос получает ошибку вместо 200
+            self._pending = []
+            self._pending_checked = False
+            self._changes = []
+            self._loaded = False
+            raise
+
+        self._signature = self._file_signature()
+        self._pending = []
+        self._pending_checked = False
+        if self._changes:
+            # После файла смен: версия в журнале не опережает данные
+            changes, self._changes = self._changes, []
+            self.change_journal.append(changes)
+        return True
+
+
+_stores: Dict[str, ShiftStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(path: str) -> ShiftStore:
+    """Возвращает общий для процесса экземпляр хранилища для файла"""
+    key = os.path.abspath(path)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = ShiftStore(path)
+        return store
+
+
+def flush_all() -> None:
+    with _stores_lock:
+        stores = list(_stores.values())
+    for store in stores:
+        store.flush()
+
+
+atexit.register(flush_all)
@@ -1,9 +1,60 @@
-from flask import Flask, jsonify, request
-import json
-import os
-from auth import login_required, role_required, generate_token, verify_password, hash_password
+from flask import Flask, Response, jsonify, request
+from flask.json.provider import DefaultJSONProvider
+import codec
+import metrics
+from auth import (login_required, role_required, generate_token,
+                  verify_password_in_pool, hash_password_in_pool, PasswordQueueFull)
+from shift_store import VersionConflict
+from archive import ArchivedShift
+import database as db
+from coverage_engine import get_coverage_cache
+from changelog import get_change_log
+from scheduler import build_schedule, make_roster
+from conflicts import get_conflict_index, blocking
+from summary import get_month_summary, parse_month
+from reports import hours_report, csv_lines, store_columns, GROUP_BY
+
+class CodecJSONProvider(DefaultJSONProvider):
+    """jsonify и request.get_json через codec (orjson, если установлен).
+
+    Ответ кодируется сразу в bytes, без промежуточной строки.
+    """
+
+    def dumps(self, obj, **kwargs):
+        # default=, sort_keys=, indent= и т.п. codec не понимает - отдаём их json
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return codec.dumps(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return codec.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        with metrics.phase("encode"):
+            body = codec.dumps(obj)
+        return self._app.response_class(body, mimetype=self.mimetype)
 
 app = Flask(__name__)
+app.json = CodecJSONProvider(app)
+
+@app.before_request
+def start_request_metrics():
+    metrics.start_request()
+
+@app.after_request
+def record_request_metrics(response):
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    if not response.is_streamed:
+        metrics.finish_request(route, request.method, response.status_code)
+        return response
+    # Потоковый ответ кодируется после after_request: запрос считается до закрытия ответа
+    timer = metrics.current()
+    method, status = request.method, response.status_code
+    response.call_on_close(lambda: metrics.finish_request(route, method, status, timer))
+    return response
 
 @app.after_request
 def after_request(response):
@@ -16,9 +67,10 @@ def after_request(response):
     if origin in allowed_origins:
         response.headers.add('Access-Control-Allow-Origin', origin)
 
-    response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
+    response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization,If-Match,If-None-Match')
     response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
     response.headers.add('Access-Control-Allow-Credentials', 'true')
+    response.headers.add('Access-Control-Expose-Headers', 'X-Next-After-Id,ETag,Last-Modified,X-Shift-Conflicts')
     return response
 
 # Правила покрытия
@@ -70,105 +122,83 @@ def get_coverage_rules():
     return jsonify(rules_array)
 
 
-def generate_shifts_for_date(date):
-    """Генерирует оптимальные смены с уникальными ID"""
-    shifts = []
+# Максимальная длина периода для запросов по диапазону дат
+MAX_RANGE_DAYS = 366
 
-    employees = {
-        'cashier': ['кассир1', 'кассир2', 'кассир3', 'кассир4', 'кассир5'],
-        'manager': ['менеджер зала 1', 'менеджер зала 2', 'менеджер зала 3'],
-        'technician': ['техник1', 'техник2']
-    }
+def dates_between(date_from, date_to):
+    """Все даты периода включительно; ValueError при неверном формате или периоде"""
+    from datetime import datetime, timedelta
+    start = datetime.strptime(date_from, '%Y-%m-%d').date()
+    end = datetime.strptime(date_to, '%Y-%m-%d').date()
+    days = (end - start).days + 1
+    if not 0 < days <= MAX_RANGE_DAYS:
+        raise ValueError(f"Period must be 1..{MAX_RANGE_DAYS} days")
+    return [(start + timedelta(days=i)).isoformat() for i in range(days)]
 
-    # Создаем базовый ID из даты (например: 202511230001)
-    base_id = int(date.replace("-", "")) * 10000
-    shift_id_counter = base_id
 
-    # Определяем "сдвиг" на основе даты для ротации
-    from datetime import datetime
-    day_of_year = datetime.strptime(date, "%Y-%m-%d").timetuple().tm_yday
-    rotation_offset = day_of_year % len(employees['cashier'])
-
-    # Кассиры - ротация по кругу (по 1 на смену)
-    cashier_morning = employees['cashier'][rotation_offset % len(employees['cashier'])]
-    cashier_evening = employees['cashier'][(rotation_offset + 1) % len(employees['cashier'])]
-
-    # Менеджеры - ротация
-    manager_offset = day_of_year % len(employees['manager'])
-    managers = [
-        employees['manager'][manager_offset % len(employees['manager'])],
-        employees['manager'][(manager_offset + 1) % len(employees['manager'])]
-    ]
+@app.route('/coverage/<date>', methods=['GET'])
+@login_required
+def get_coverage_for_date(date):
+    """Проверка покрытия за день по COVERAGE_RULES"""
+    try:
+        dates = dates_between(date, date)
+    except ValueError:
+        return jsonify({"error": "Неверный формат даты"}), 400
 
-    # Техники - ротация
-    tech_offset = day_of_year % len(employees['technician'])
-    technician = employees['technician'][tech_offset % len(employees['technician'])]
+    cache = get_coverage_cache(shift_store(), COVERAGE_RULES)
+    return jsonify(cache.report(dates)[0])
 
-    # Кассир: утренняя смена 7:00-15:00
-    shift = {
-        'id': shift_id_counter,
-        'date': date,
-        'start_time': "07:00",
-        'end_time': "15:00",
-        'employee': cashier_morning,
-        'role': 'cashier',
-        'required': True
-    }
-    shifts.append(shift)
-    shift_id_counter += 1
 
-    # Кассир: вечерняя смена 12:00-20:00
-    shift = {
-        'id': shift_id_counter,
-        'date': date,
-        'start_time': "12:00",
-        'end_time': "20:00",
-        'employee': cashier_evening,
-        'role': 'cashier',
-        'required': True
-    }
-    shifts.append(shift)
-    shift_id_counter += 1
+@app.route('/coverage', methods=['GET'])
+@login_required
+def get_coverage_for_range():
+    """Проверка покрытия за период: /coverage?from=2025-11-01&to=2025-11-30"""
+    date_from = request.args.get('from')
+    date_to = request.args.get('to')
+    if not date_from or not date_to:
+        return jsonify({"error": "from and to are required"}), 400
 
-    # Менеджер 1: 8:00-16:00
-    shift = {
-        'id': shift_id_counter,
-        'date': date,
-        'start_time': "08:00",
-        'end_time': "16:00",
-        'employee': managers[0],
-        'role': 'manager',
-        'required': True
-    }
-    shifts.append(shift)
-    shift_id_counter += 1
+    try:
+        dates = dates_between(date_from, date_to)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-    # Менеджер 2: 12:00-20:00
-    shift = {
-        'id': shift_id_counter,
-        'date': date,
-        'start_time': "12:00",
-        'end_time': "20:00",
-        'employee': managers[1],
-        'role': 'manager',
-        'required': True
-    }
-    shifts.append(shift)
-    shift_id_counter += 1
+    cache = get_coverage_cache(shift_store(), COVERAGE_RULES)
+    return jsonify(cache.report(dates))
 
-    # Техник: 9:00-17:00
-    shift = {
-        'id': shift_id_counter,
-        'date': date,
-        'start_time': "09:00",
-        'end_time': "17:00",
-        'employee': technician,
-        'role': 'technician',
-        'required': True
-    }
-    shifts.append(shift)
 
-    return shifts
+# Сотрудники по ролям для автогенерации
+EMPLOYEES = {
+    'cashier': ['кассир1', 'кассир2', 'кассир3', 'кассир4', 'кассир5'],
+    'manager': ['менеджер зала 1', 'менеджер зала 2', 'менеджер зала 3'],
+    'technician': ['техник1', 'техник2']
+}
+
+# Личные ограничения сотрудников поверх значений по умолчанию из scheduler,
+# например {'кассир5': {'max_hours': 20, 'availability': {5: None, 6: None}}}
+EMPLOYEE_CONSTRAINTS = {}
+
+ROSTER = make_roster(EMPLOYEES, EMPLOYEE_CONSTRAINTS)
+REST_HOURS = {employee['name']: employee['min_rest_hours'] for employee in ROSTER}
+MAX_HOURS = {employee['name']: employee['max_hours'] for employee in ROSTER}
+
+def conflict_index(store):
+    """Индекс смен по сотрудникам; отдых - из ограничений ростера"""
+    return get_conflict_index(store, lambda name: REST_HOURS.get(name, ROSTER[0]['min_rest_hours']))
+
+def planning_window(dates):
+    """Полные недели вокруг dates и по дню с краёв - для часов и отдыха"""
+    from datetime import datetime, timedelta
+    first = datetime.strptime(min(dates), '%Y-%m-%d').date()
+    last = datetime.strptime(max(dates), '%Y-%m-%d').date()
+    first -= timedelta(days=first.weekday() + 1)
+    last += timedelta(days=7 - last.weekday())
+    return first.isoformat(), last.isoformat()
+
+def generate_schedule(store, dates):
+    """Расписание на dates с учётом уже сохранённых смен тех же недель"""
+    existing = store.date_range(*planning_window(dates))
+    return build_schedule(COVERAGE_RULES, ROSTER, dates, existing=existing)
 
 
 @app.route('/shifts/generate/<date>', methods=['POST'])
@@ -186,26 +216,28 @@ def generate_optimal_shifts(date):
                 "error": "Нельзя генерировать смены для прошедших дат"
             }), 400
 
-        # ✅ ПРОВЕРЯЕМ существующие смены на эту дату
-        existing_shifts = read_json(SHIFTS_FILE)
-        shifts_for_date = [s for s in existing_shifts if s['date'] == date]
+        store = shift_store()
 
-        if shifts_for_date:
-            return jsonify({
-                "success": False,
-                "error": f"На {date} уже есть {len(shifts_for_date)} смен. Удалите существующие смены перед генерацией новых."
-            }), 400
+        # Проверка и сохранение под одной блокировкой, чтобы два запроса
+        # не сгенерировали смены на одну дату одновременно
+        with store.transaction():
+            # ✅ ПРОВЕРЯЕМ существующие смены на эту дату
+            shifts_for_date = store.by_date(date)
 
-        # Генерируем оптимальные смены
-        optimal_shifts = generate_shifts_for_date(date)
+            if shifts_for_date:
+                return jsonify({
+                    "success": False,
+                    "error": f"На {date} уже есть {len(shifts_for_date)} смен. Удалите существующие смены перед генерацией новых."
+                }), 400
 
-        # ✅ СОХРАНЯЕМ смены в базу (shifts.json)
-        existing_shifts.extend(optimal_shifts)
-        write_json(SHIFTS_FILE, existing_shifts)
+            # Генерируем оптимальные смены и ✅ СОХРАНЯЕМ их в базу
+            schedule = generate_schedule(store, [date])
+            optimal_shifts = store.create_many(schedule["shifts"])
 
         return jsonify({
             "success": True,
             "shifts": optimal_shifts,
+            "unmet": schedule["unmet"],
             "message": f"Сгенерировано и сохранено {len(optimal_shifts)} смен для {date}"
         })
 
@@ -215,55 +247,120 @@ def generate_optimal_shifts(date):
         return jsonify({"success": False, "error": f"Ошибка генерации: {str(e)}"}), 500
 
 
+@app.route('/shifts/generate', methods=['POST'])
+@login_required
+@role_required('manager')
+def generate_shifts_for_range():
+    """Генерация за период: /shifts/generate?from=2025-11-01&to=2026-01-31
+
+    Даты, на которые уже есть смены, и прошедшие даты пропускаются.
+    Все новые смены сохраняются одной записью; в ответе итог по каждой дате.
+    """
+    date_from = request.args.get('from')
+    date_to = request.args.get('to')
+    if not date_from or not date_to:
+        return jsonify({"success": False, "error": "from and to are required"}), 400
+
+    try:
+        dates = dates_between(date_from, date_to)
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+
+    from datetime import date as date_type
+    today = date_type.today().isoformat()
+    store = shift_store()
+    summary = {}
+    planned = []
+
+    with store.transaction():
+        for date in dates:
+            if date < today:
+                summary[date] = {"date": date, "status": "skipped", "reason": "past", "created": 0}
+                continue
+            existing = len(store.by_date(date))
+            if existing:
+                summary[date] = {"date": date, "status": "skipped", "reason": "exists",
+                                 "existing": existing, "created": 0}
+                continue
+            summary[date] = {"date": date, "status": "generated", "created": 0, "unmet": []}
+            planned.append(date)
+
+        schedule = generate_schedule(store, planned) if planned else {"shifts": [], "unmet": []}
+        created = store.create_many(schedule["shifts"])
+
+    for shift in created:
+        summary[shift["date"]]["created"] += 1
+    for gap in schedule["unmet"]:
+        summary[gap["date"]]["unmet"].append(gap)
+
+    return jsonify({
+        "success": True,
+        "created": len(created),
+        "dates": list(summary.values()),
+        "message": f"Сгенерировано и сохранено {len(created)} смен за {date_from} - {date_to}"
+    })
+
+
 @app.route('/shifts', methods=['OPTIONS'])
+@app.route('/coverage', methods=['OPTIONS'])
+@app.route('/summary/<path:path>', methods=['OPTIONS'])
+@app.route('/reports/<path:path>', methods=['OPTIONS'])
+@app.route('/coverage/<path:path>', methods=['OPTIONS'])
 @app.route('/shifts/<path:path>', methods=['OPTIONS'])
+@app.route('/employees/<path:path>', methods=['OPTIONS'])
 @app.route('/auth/<path:path>', methods=['OPTIONS'])
 def options_response(path=None):
     return '', 200
 
-# ПУТИ К ФАЙЛАМ
-SHIFTS_FILE = "/home/kalikrit/myshift/shifts.json"
-USERS_FILE = "/home/kalikrit/myshift/users.json"
-
-def read_json(file_path):
-    if not os.path.exists(file_path):
-        return []
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except:
-        return []
+# ПУТИ К ФАЙЛАМ (общие с main.py, см. database.DATA_DIR)
+SHIFTS_FILE = db.SHIFTS_FILE
+USERS_FILE = db.USERS_FILE
 
-def write_json(file_path, data):
-    try:
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
-        return True
-    except:
-        return False
+def shift_store():
+    """Хранилище смен магазина из токена (до входа и в старых токенах - default)"""
+    claims = getattr(request, 'user', None) or {}
+    store = db.get_shift_store(SHIFTS_FILE, claims.get('store', db.DEFAULT_STORE))
+    # Журнал подписывается на хранилище при первом обращении к нему
+    get_change_log(store)
+    return store
 
 # АУТЕНТИФИКАЦИЯ
+def too_many_requests():
+    response = jsonify({"error": "Too many login attempts, please retry"})
+    response.headers['Retry-After'] = '1'
+    return response, 429
+
 @app.route('/auth/login', methods=['POST'])
 def login():
-    data = request.get_json()
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "Body must be a JSON object"}), 400
 
-    if not data or not data.get('username') or not data.get('password'):
+    if not data.get('username') or not data.get('password'):
         return jsonify({"error": "Username and password required"}), 400
 
-    users = read_json(USERS_FILE)
-    user = next((u for u in users if u.get('username') == data['username']), None)
+    user = db.get_user_by_username(data['username'], USERS_FILE)
 
-    if not user or not verify_password(data['password'], user.get('password', '')):
+    # bcrypt считается в пуле процессов; при переполненной очереди - 429
+    try:
+        with metrics.phase("auth"):
+            valid = user and verify_password_in_pool(data['password'], user.get('password', ''))
+    except PasswordQueueFull:
+        return too_many_requests()
+
+    if not valid:
         return jsonify({"error": "Invalid credentials"}), 401
 
-    token = generate_token(user['id'], user['username'], user['role'])
+    token = generate_token(user['id'], user['username'], user['role'],
+                           user.get('store', db.DEFAULT_STORE))
 
     return jsonify({
         "token": token,
         "user": {
             "id": user['id'],
             "username": user['username'],
-            "role": user['role']
+            "role": user['role'],
+            "store": user.get('store', db.DEFAULT_STORE)
         }
     })
 
@@ -272,36 +369,41 @@ def login():
 @login_required
 @role_required('admin')
 def register():
-    data = request.get_json()
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "Body must be a JSON object"}), 400
 
-    if not data or not data.get('username') or not data.get('password'):
+    if not data.get('username') or not data.get('password'):
         return jsonify({"error": "Username and password required"}), 400
 
-    users = read_json(USERS_FILE)
+    try:
+        store = db.validate_store_name(data.get('store', db.DEFAULT_STORE))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
     # Проверка существующего пользователя
-    if any(u.get('username') == data['username'] for u in users):
+    if db.get_user_by_username(data['username'], USERS_FILE):
         return jsonify({"error": "User already exists"}), 400
 
-    new_id = max([u.get("id", 0) for u in users], default=0) + 1
+    try:
+        password_hash = hash_password_in_pool(data['password'])
+    except PasswordQueueFull:
+        return too_many_requests()
 
-    new_user = {
-        "id": new_id,
+    new_user = db.add_user({
         "username": data['username'],
-        "password": hash_password(data['password']),
+        "password": password_hash,
         "role": data.get('role', 'viewer'),
-        "store": data.get('store', 'default')
-    }
-
-    users.append(new_user)
-    write_json(USERS_FILE, users)
+        "store": store
+    }, USERS_FILE)
 
     return jsonify({
         "message": "User created successfully",
         "user": {
-            "id": new_id,
+            "id": new_user['id'],
             "username": new_user['username'],
-            "role": new_user['role']
+            "role": new_user['role'],
+            "store": new_user['store']
         }
     })
 
@@ -311,12 +413,18 @@ def health_check():
     """Простой эндпоинт для проверки здоровья сервиса"""
     try:
         # Проверяем что можем читать файл смен
-        read_json(SHIFTS_FILE)
+        shift_store().count()
         return jsonify({"status": "healthy"}), 200
     except Exception as e:
         return jsonify({"status": "unhealthy", "error": str(e)}), 500
 
 
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Метрики для Prometheus: задержки по маршрутам и фазам, байты хранилища, кэши"""
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+
 @app.route('/auth/me', methods=['GET'])
 @login_required
 def get_current_user():
@@ -324,84 +432,428 @@ def get_current_user():
         "user": {
             "id": request.user['user_id'],
             "username": request.user['username'],
-            "role": request.user['role']
+            "role": request.user['role'],
+            "store": request.user.get('store', db.DEFAULT_STORE)
         }
     })
 
 # ЗАЩИЩЕННЫЕ ЭНДПОИНТЫ СМЕН
+def parse_version(value):
+    """Версия смены из If-Match ("3" или W/"3") или из тела запроса"""
+    if value is None or value == '*':
+        return None
+    if isinstance(value, str):
+        value = value.strip()
+        if value.startswith('W/'):
+            value = value[2:]
+        value = value.strip('"')
+    return int(value)
+
+def archived_error():
+    return jsonify({"error": "Shift is archived and read-only"}), 409
+
+def conflict_error(conflicts):
+    return jsonify({"error": "Shift conflicts with other shifts of the employee", "conflicts": conflicts}), 409
+
+def with_conflicts(response, conflicts):
+    """Неблокирующие конфликты (например, отдых) - в заголовке, тело остаётся сменой"""
+    if conflicts:
+        response.headers['X-Shift-Conflicts'] = codec.dumps(conflicts).decode('utf-8')
+    return response
+
 @app.route('/')
 def root():
     return jsonify({"message": "My Shift API is running!"})
 
+# Размер страницы при курсорной пагинации и порция при потоковой отдаче
+MAX_PAGE_SIZE = 5000
+STREAM_BATCH = 256
+
+def stream_shifts(shifts, headers=None):
+    """Отдаёт смены потоком: JSON массив или NDJSON (Accept: application/x-ndjson).
+
+    Документ кодируется порциями по мере чтения из хранилища и не
+    собирается в памяти целиком.
+    """
+    ndjson = request.accept_mimetypes.best_match(
+        ['application/json', 'application/x-ndjson']) == 'application/x-ndjson'
+
+    def encoded_batches():
+        batch = []
+        for shift in shifts:
+            batch.append(shift)
+            if len(batch) == STREAM_BATCH:
+                yield encode(batch)
+                batch = []
+        if batch:
+            yield encode(batch)
+
+    def encode(batch):
+        with metrics.phase("encode"):
+            return [codec.dumps(shift) for shift in batch]
+
+    def generate_array():
+        yield b'['
+        separator = b''
+        for batch in encoded_batches():
+            yield separator + b','.join(batch)
+            separator = b','
+        yield b']'
+
+    def generate_ndjson():
+        for batch in encoded_batches():
+            yield b'\n'.join(batch) + b'\n'
+
+    if ndjson:
+        return Response(generate_ndjson(), mimetype='application/x-ndjson', headers=headers)
+    return Response(generate_array(), mimetype='application/json', headers=headers)
+
+def conditional_response(store, build, date=None):
+    """ETag/Last-Modified по счётчику изменений; 304, если у клиента та же версия.
+
+    Версия берётся до чтения данных, поэтому ETag никогда не новее ответа.
+    Пока отложенные изменения не записаны, ответ идёт без ETag.
+    """
+    log = get_change_log(store)
+    etag = log.etag(date)
+    if etag is None:
+        response = build()
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+    if request.if_none_match.contains(etag):
+        metrics.cache_access("etag", True)
+        response = Response(status=304)
+    else:
+        metrics.cache_access("etag", False)
+        response = build()
+    response.set_etag(etag)
+    response.last_modified = log.last_modified(date)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
 @app.route('/shifts', methods=['GET'])
 @login_required
 def get_all_shifts():
-    shifts = read_json(SHIFTS_FILE)
-    return jsonify(shifts)
+    """Смены потоком. Параметры: from/to - период, limit/after_id - курсор по ID"""
+    store = shift_store()
+    date_from = request.args.get('from')
+    date_to = request.args.get('to')
+
+    if date_from or date_to:
+        # Смены за период: /shifts?from=2025-11-01&to=2025-11-30
+        from datetime import datetime
+        try:
+            for value in (date_from, date_to):
+                if value:
+                    datetime.strptime(value, '%Y-%m-%d')
+        except ValueError:
+            return jsonify({"error": "Неверный формат даты"}), 400
+
+        return conditional_response(store, lambda: stream_shifts(store.date_range(date_from, date_to)))
+
+    try:
+        limit = int(request.args['limit']) if 'limit' in request.args else None
+        after_id = int(request.args['after_id']) if 'after_id' in request.args else None
+    except ValueError:
+        return jsonify({"error": "limit and after_id must be integers"}), 400
+
+    if limit is None:
+        return conditional_response(store, lambda: stream_shifts(store.iter_shifts(after_id)))
+
+    if not 0 < limit <= MAX_PAGE_SIZE:
+        return jsonify({"error": f"limit must be between 1 and {MAX_PAGE_SIZE}"}), 400
+
+    def build_page():
+        # Страница ограничена limit, поэтому её можно собрать, чтобы знать следующий курсор
+        page = list(store.iter_shifts(after_id, limit))
+        headers = {'X-Next-After-Id': str(page[-1]['id'])} if len(page) == limit else None
+        return stream_shifts(page, headers)
+
+    return conditional_response(store, build_page)
+
+@app.route('/shifts/changes', methods=['GET'])
+@login_required
+def get_shift_changes():
+    """Изменения после версии клиента: /shifts/changes?since=<ETag или version>
+
+    Без since возвращает только текущую версию. reset: true - журнал не
+    покрывает запрошенный период, нужно перечитать /shifts целиком.
+    """
+    log = get_change_log(shift_store())
+    since = request.args.get('since', '').strip('"')
+    if not since:
+        return jsonify({"version": log.version(), "reset": True, "changes": []})
+    return jsonify(log.changes_since(since))
 
 @app.route('/shifts/<date>', methods=['GET'])
 @login_required
 def get_shifts_by_date(date):
-    shifts = read_json(SHIFTS_FILE)
-    date_shifts = [shift for shift in shifts if shift.get("date") == date]
-    return jsonify(date_shifts)
+    store = shift_store()
+    return conditional_response(store, lambda: jsonify(store.by_date(date)), date)
 
 @app.route('/shifts', methods=['POST'])
 @login_required
 @role_required('manager')  # Только менеджеры и админы могут создавать смены
 def create_shift():
-    data = request.get_json()
-
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "Body must be a JSON object"}), 400
     if not data:
         return jsonify({"error": "No JSON data provided"}), 400
 
-    shifts = read_json(SHIFTS_FILE)
-
-    new_id = max([s.get("id", 0) for s in shifts], default=0) + 1
-
-    new_shift = {
-        "id": new_id,
+    shift = {
         "date": data.get("date"),
         "start_time": data.get("start_time"),
         "end_time": data.get("end_time"),
         "employee": data.get("employee"),
         "role": data.get("role")
     }
+    store = shift_store()
+    # Проверка и запись под одной блокировкой: два запроса не займут одно время
+    with store.transaction():
+        conflicts = conflict_index(store).check(shift)
+        if blocking(conflicts):
+            return conflict_error(conflicts)
+        new_shift = store.create(shift)
 
-    shifts.append(new_shift)
-    write_json(SHIFTS_FILE, shifts)
-
-    return jsonify(new_shift), 201
+    return with_conflicts(jsonify(new_shift), conflicts), 201
 
 @app.route('/shifts/<int:shift_id>', methods=['PUT'])
 @login_required
 @role_required('manager')  # Только менеджеры и админы могут редактировать смены
 def update_shift(shift_id):
-    data = request.get_json()
-    shifts = read_json(SHIFTS_FILE)
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "Body must be a JSON object"}), 400
+
+    # Оптимистичная блокировка: версия из If-Match или из поля version
+    try:
+        expected_version = parse_version(request.headers.get('If-Match', data.get('version')))
+    except ValueError:
+        return jsonify({"error": "Invalid version"}), 400
+
+    store = shift_store()
+    with store.transaction():
+        current = store.get(shift_id)
+        conflicts = []
+        if current is not None:
+            merged = {**current, **{k: v for k, v in data.items() if v is not None}}
+            conflicts = conflict_index(store).check(merged, ignore_ids=[shift_id])
+            # Сначала версия: клиенту с устаревшей сменой важнее узнать о ней
+            if blocking(conflicts) and (expected_version is None
+                                        or expected_version == current.get('version', 1)):
+                return conflict_error(conflicts)
+        try:
+            shift = store.update(shift_id, data, expected_version)
+        except VersionConflict as e:
+            return jsonify({"error": "Shift was modified by another user", "current": e.current}), 409
+        except ArchivedShift:
+            return archived_error()
+
+    if shift is None:
+        return jsonify({"error": "Shift not found"}), 404
 
-    for i, shift in enumerate(shifts):
-        if shift.get('id') == shift_id:
-            for key, value in data.items():
-                if value is not None:
-                    shifts[i][key] = value
-            write_json(SHIFTS_FILE, shifts)
-            return jsonify(shifts[i])
+    return with_conflicts(jsonify(shift), conflicts)
+
+# Максимум операций в одном POST /shifts/batch
+MAX_BATCH_OPS = 1000
+SHIFT_FIELDS = ("date", "start_time", "end_time", "employee", "role")
+
+class BatchError(Exception):
+    """Операция пакета не прошла проверку; пакет не применяется"""
+
+    def __init__(self, index, status, message, current=None, conflicts=None):
+        super().__init__(message)
+        self.index = index
+        self.status = status
+        self.current = current
+        self.conflicts = conflicts
+
+def validate_batch(store, operations):
+    """Проверяет все операции до применения; возвращает их в нормализованном виде"""
+    if not isinstance(operations, list) or not operations:
+        raise BatchError(None, 400, "operations must be a non-empty list")
+    if len(operations) > MAX_BATCH_OPS:
+        raise BatchError(None, 400, f"At most {MAX_BATCH_OPS} operations per batch")
+
+    checked = []
+    touched = set()
+    for index, item in enumerate(operations):
+        if not isinstance(item, dict) or item.get('op') not in ('create', 'update', 'delete'):
+            raise BatchError(index, 400, "op must be create, update or delete")
+        op = item['op']
+
+        if op == 'create':
+            shift = item.get('shift')
+            if not isinstance(shift, dict) or not all(shift.get(field) for field in SHIFT_FIELDS):
+                raise BatchError(index, 400, "create requires shift with " + ", ".join(SHIFT_FIELDS))
+            checked.append((op, {field: shift[field] for field in SHIFT_FIELDS}, None))
+            continue
+
+        shift_id = item.get('id')
+        if not isinstance(shift_id, int) or isinstance(shift_id, bool):
+            raise BatchError(index, 400, "id must be an integer")
+        if shift_id in touched:
+            raise BatchError(index, 400, f"Shift {shift_id} appears twice in the batch")
+        touched.add(shift_id)
+        try:
+            expected_version = parse_version(item.get('version'))
+        except (TypeError, ValueError):
+            raise BatchError(index, 400, "Invalid version")
+
+        current = store.get(shift_id)
+        if current is None:
+            raise BatchError(index, 404, f"Shift {shift_id} not found")
+        if getattr(store, 'is_archived', None) and store.is_archived(shift_id):
+            raise BatchError(index, 409, f"Shift {shift_id} is archived and read-only")
+        if expected_version is not None and expected_version != current.get('version', 1):
+            raise BatchError(index, 409, "Shift was modified by another user", current)
+
+        if op == 'update':
+            changes = item.get('changes')
+            if not isinstance(changes, dict):
+                raise BatchError(index, 400, "update requires changes object")
+            checked.append((op, shift_id, changes))
+        else:
+            checked.append((op, shift_id, None))
+
+    check_batch_conflicts(store, checked)
+    return checked
+
+def check_batch_conflicts(store, checked):
+    """Конфликты пакета с сохранёнными сменами и между сменами самого пакета"""
+    index = conflict_index(store)
+    # Изменяемые и удаляемые смены сравниваются в новом виде или не сравниваются вовсе
+    replaced = {payload for op, payload, _ in checked if op != 'create'}
+    pending = []
+    for position, (op, payload, changes) in enumerate(checked):
+        if op == 'delete':
+            continue
+        if op == 'create':
+            shift = payload
+        else:
+            current = store.get(payload)
+            shift = {**current, **{k: v for k, v in changes.items() if v is not None}}
+        conflicts = blocking(index.check(shift, ignore_ids=replaced, pending=pending))
+        if conflicts:
+            raise BatchError(position, 409, "Shift conflicts with other shifts of the employee",
+                             conflicts=conflicts)
+        pending.append(shift)
+
+@app.route('/shifts/batch', methods=['POST'])
+@login_required
+@role_required('manager')
+def batch_shifts():
+    """Пакет изменений: {"operations": [{"op": "create", "shift": {...}},
+    {"op": "update", "id": 1, "changes": {...}, "version": 2}, {"op": "delete", "id": 3}]}
+
+    Все операции проверяются заранее и применяются под одной блокировкой
+    одной записью; при любой ошибке не применяется ничего.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "Body must be a JSON object with operations", "index": None}), 400
+    store = shift_store()
+
+    with store.transaction():
+        try:
+            checked = validate_batch(store, data.get('operations'))
+        except BatchError as e:
+            error = {"error": str(e), "index": e.index}
+            if e.current is not None:
+                error["current"] = e.current
+            if e.conflicts is not None:
+                error["conflicts"] = e.conflicts
+            return jsonify(error), e.status
+
+        created = iter(store.create_many([payload for op, payload, _ in checked if op == 'create']))
+        results = []
+        for op, payload, changes in checked:
+            if op == 'create':
+                results.append({"op": op, "status": 201, "shift": next(created)})
+            elif op == 'update':
+                results.append({"op": op, "status": 200, "shift": store.update(payload, changes)})
+            else:
+                store.delete(payload)
+                results.append({"op": op, "status": 200, "id": payload})
+
+    return jsonify({"results": results})
+
+@app.route('/summary/month/<month>', methods=['GET'])
+@login_required
+def get_month_summary_view(month):
+    """Итоги дней месяца для календаря: /summary/month/2025-11"""
+    try:
+        parse_month(month)
+    except ValueError:
+        return jsonify({"error": "Month must be YYYY-MM"}), 400
 
-    return jsonify({"error": "Shift not found"}), 404
+    store = shift_store()
+    summary = get_month_summary(store, COVERAGE_RULES)
+    return conditional_response(store, lambda: jsonify(summary.report(month)))
+
+@app.route('/reports/hours', methods=['GET'])
+@login_required
+@role_required('manager')
+def get_hours_report():
+    """Часы за период: /reports/hours?from=2025-01-01&to=2025-12-31&group_by=employee
+
+    group_by - employee, role или week; format=csv - выгрузка CSV потоком.
+    """
+    date_from = request.args.get('from')
+    date_to = request.args.get('to')
+    group_by = request.args.get('group_by', 'employee')
+    if not date_from or not date_to:
+        return jsonify({"error": "from and to are required"}), 400
+    if group_by not in GROUP_BY:
+        return jsonify({"error": f"group_by must be one of {', '.join(GROUP_BY)}"}), 400
+    from datetime import datetime
+    try:
+        if datetime.strptime(date_from, '%Y-%m-%d') > datetime.strptime(date_to, '%Y-%m-%d'):
+            return jsonify({"error": "from must not be after to"}), 400
+    except ValueError:
+        return jsonify({"error": "Неверный формат даты"}), 400
+
+    as_csv = request.args.get('format') == 'csv'
+    store = shift_store()
+
+    def build():
+        report = hours_report(store_columns(store, date_from, date_to), group_by,
+                              lambda name: MAX_HOURS.get(name, ROSTER[0]['max_hours']))
+        if not as_csv:
+            return jsonify({"from": date_from, "to": date_to, **report})
+        filename = f"hours-{group_by}-{date_from}-{date_to}.csv"
+        return Response(csv_lines(report), mimetype='text/csv',
+                        headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
+    return conditional_response(store, build)
+
+@app.route('/employees/<name>/conflicts', methods=['GET'])
+@login_required
+def get_employee_conflicts(name):
+    """Пересечения и нехватка отдыха у сотрудника: /employees/кассир1/conflicts?from=&to="""
+    date_from = request.args.get('from')
+    date_to = request.args.get('to')
+    from datetime import datetime
+    try:
+        for value in (date_from, date_to):
+            if value:
+                datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        return jsonify({"error": "Неверный формат даты"}), 400
+
+    return jsonify(conflict_index(shift_store()).audit(name, date_from, date_to))
 
 @app.route('/shifts/<int:shift_id>', methods=['DELETE'])
 @login_required
 @role_required('manager')  # Только менеджеры и админы могут удалять смены
 def delete_shift(shift_id):
-    shifts = read_json(SHIFTS_FILE)
-    initial_length = len(shifts)
-    shifts = [s for s in shifts if s.get('id') != shift_id]
-
-    if len(shifts) == initial_length:
-        return jsonify({"error": "Shift not found"}), 404
+    try:
+        if not shift_store().delete(shift_id):
+            return jsonify({"error": "Shift not found"}), 404
+    except ArchivedShift:
+        return archived_error()
 
-    write_json(SHIFTS_FILE, shifts)
     return jsonify({"message": "Shift deleted"})
 
 if __name__ == '__main__':
@@ -0,0 +1,658 @@
+"""Несколько воркеров на одних сменах: снимок в общей памяти (gunicorn.conf.py).
+
+Каждый воркер с обычным ShiftStore держит в памяти свою копию всех смен
+и перечитывает файл после записи любого другого воркера. В этом режиме
+смены в памяти держит один процесс - мастер снимков (python snapshot.py,
+его запускает gunicorn.conf.py до старта воркеров):
+
+    мастер   ShiftStore каждого магазина. После каждой записи рабочее
+             окно смен кодируется сегментом того же формата, что и архив
+             (archive.py), в новый блок multiprocessing.shared_memory;
+             номер поколения и имя блока лежат в маленьком управляющем
+             блоке под seqlock. Старый блок удаляется сразу: воркеры,
+             которые его ещё читают, держат отображение до перехода.
+    воркер   SharedShiftStore с тем же интерфейсом, что у ShiftStore.
+             Чтения идут из отображённого блока и из mmap архива, без
+             копии смен в процессе: данные в RAM одни на все воркеры
+             (страницы архива - общий page cache). Перед чтением воркер
+             сверяет номер поколения; если он сменился, переходит на
+             новый блок и получает от мастера события create/update/delete
+             для своих подписчиков (или reload, если отстал).
+             Записи и transaction() пересылаются мастеру по Unix сокету
+             (multiprocessing.connection с ключом), поэтому запись одна
+             на все воркеры и flock между воркерами не нужен.
+
+Кодирование снимка - проход по рабочему окну, поэтому режим рассчитан
+на включённый архив (MYSHIFT_ARCHIVE_DAYS): в снимке остаются недели,
+а не годы смен.
+"""
+import os
+import secrets
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from multiprocessing import resource_tracker, shared_memory
+from multiprocessing.connection import Client, Listener
+from typing import List, Dict, Any, Callable, Iterator, Optional, Tuple
+
+import codec
+import metrics
+from archive import Archive, ArchivedShift, Segment, SegmentSet, archivable, encode_segment
+from changelog import ChangeJournal
+from shift_records import ShiftRecord, ShiftColumns, day_number, day_text, employees, roles
+from shift_store import ShiftStore, VersionConflict, get_store, flush_all
+
+# Переменные окружения воркеров: адрес сокета мастера и ключ (hex)
+SOCKET_ENV = "MYSHIFT_SNAPSHOT_SOCKET"
+KEY_ENV = "MYSHIFT_SNAPSHOT_KEY"
+# Как часто мастер проверяет файлы на изменения в обход него, сек
+POLL_INTERVAL = float(os.environ.get("MYSHIFT_SNAPSHOT_POLL", "1.0"))
+# Сколько поколений событий хранит мастер для отставших воркеров
+EVENT_LOG = 256
+# Сколько ждать запуска мастера, сек
+START_TIMEOUT = 10.0
+
+# Управляющий блок: seq (нечётный - идёт запись), поколение, имя блока данных
+CONTROL = struct.Struct("<QQ64s")
+SEQ = struct.Struct("<Q")
+# Блок данных: длина сегмента, длина JSON смен, не попавших в сегмент
+# (не целый ID, дата не YYYY-MM-DD или вне окна сегмента)
+DATA = struct.Struct("<QQ")
+MAX_SEGMENT_DAYS = 0xFFFF
+
+WRITE_METHODS = ("create", "create_many", "update", "delete", "replace_all", "flush")
+
+
+# СНИМОК
+
+def _densest_days(days: List[int]) -> Tuple[int, int]:
+    """Первый и последний день окна из MAX_SEGMENT_DAYS с наибольшим числом смен"""
+    best, best_lo, lo = 0, 0, 0
+    for hi in range(len(days)):
+        while days[hi] - days[lo] >= MAX_SEGMENT_DAYS:
+            lo += 1
+        if hi - lo + 1 > best:
+            best, best_lo = hi - lo + 1, lo
+    return days[best_lo], days[best_lo] + MAX_SEGMENT_DAYS - 1
+
+
+def encode_snapshot(records: List[ShiftRecord]) -> bytes:
+    """Рабочее окно: сегмент смен с целым ID и датой, остальные - JSON.
+
+    Сегмент покрывает не больше MAX_SEGMENT_DAYS дней: смены с датой
+    далеко от остальных (опечатка в годе) тоже уходят в JSON.
+    """
+    regular = [record for record in records if archivable(record)]
+    days = sorted(record.day for record in regular)
+    first, last = (days[0], days[-1]) if days else (0, -1)
+    if last - first + 1 > MAX_SEGMENT_DAYS:
+        first, last = _densest_days(days)
+    irregular = [record.to_dict() for record in records
+                 if not archivable(record) or not first <= record.day <= last]
+    regular = [record for record in regular if first <= record.day <= last]
+    last = min(last, days[-1]) if days else last
+    segment = encode_segment(regular, first, last - first + 1)
+    tail = codec.dumps(irregular)
+    return DATA.pack(len(segment), len(tail)) + segment + tail
+
+
+class Snapshot(SegmentSet):
+    """Опубликованное рабочее окно поверх блока общей памяти.
+
+    Блок закрывается вместе с последней ссылкой на снимок, поэтому поток,
+    который ещё читает старое поколение, дочитает его после перехода.
+    """
+
+    def __init__(self, block: shared_memory.SharedMemory):
+        buffer = block.buf
+        segment_size, tail_size = DATA.unpack_from(buffer, 0)
+        self.segment = Segment(buffer, DATA.size)
+        start = DATA.size + segment_size
+        tail = codec.loads(bytes(buffer[start:start + tail_size]))
+        self.irregular = [ShiftRecord.from_dict(shift) for shift in tail]
+        self._irregular_by_id = {record.id: record for record in self.irregular}
+        # Последним: при удалении снимка массивы сегмента освобождаются раньше блока
+        self._block = block
+
+    def _overlapping(self, lo_day, hi_day) -> List[Segment]:
+        return [self.segment]
+
+    def get(self, shift_id) -> Optional[ShiftRecord]:
+        record = self._irregular_by_id.get(shift_id)
+        return record if record is not None else super().get(shift_id)
+
+    def count(self) -> int:
+        return super().count() + len(self.irregular)
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """Подключение к блоку мастера, которое не удалит блок при выходе воркера"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # Python < 3.13: resource_tracker считает блок своим
+        block = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(block._name, "shared_memory")
+        return block
+
+
+def _read_control(buffer) -> Tuple[int, str]:
+    while True:
+        seq, generation, name = CONTROL.unpack_from(buffer, 0)
+        if seq % 2 == 0 and SEQ.unpack_from(buffer, 0)[0] == seq:
+            return generation, name.rstrip(b"\0").decode("ascii")
+
+
+def _write_control(buffer, generation: int, name: str) -> None:
+    seq = SEQ.unpack_from(buffer, 0)[0]
+    SEQ.pack_into(buffer, 0, seq + 1)
+    CONTROL.pack_into(buffer, 0, seq + 1, generation, name.encode("ascii"))
+    SEQ.pack_into(buffer, 0, seq + 2)
+
+
+# МАСТЕР
+
+class _Publisher:
+    """ShiftStore одного магазина в мастере и его опубликованные поколения"""
+
+    def __init__(self, path: str):
+        self.store = get_store(path)
+        self.control = shared_memory.SharedMemory(create=True, size=CONTROL.size)
+        self.generation = 0
+        self.revision: Optional[int] = None
+        self.block: Optional[shared_memory.SharedMemory] = None
+        self._lock = threading.Lock()
+        # (поколение, события или None - только reload)
+        self._log: deque = deque(maxlen=EVENT_LOG)
+        self._pending: Optional[List[Tuple[str, Any, Any]]] = None
+        self.store.add_listener(self._on_change)
+        with self.store.transaction():
+            self.publish()
+
+    def _on_change(self, kind, old, new):
+        # Вызывается под блокировкой хранилища
+        if kind == "reload":
+            self._pending = None
+        elif self._pending is not None:
+            self._pending.append((kind, old, new))
+
+    def publish(self) -> None:
+        """Новое поколение, если записи изменились (вызывать в transaction())"""
+        revision, records = self.store.current_records()
+        if revision == self.revision:
+            return
+        with metrics.phase("encode"):
+            data = encode_snapshot(records)
+        block = shared_memory.SharedMemory(create=True, size=len(data))
+        block.buf[:len(data)] = data
+        with self._lock:
+            self.generation += 1
+            _write_control(self.control.buf, self.generation, block.name)
+            self._log.append((self.generation, self._pending))
+            self._pending = []
+        old, self.block, self.revision = self.block, block, revision
+        if old is not None:
+            old.close()
+            old.unlink()
+
+    def events(self, since: Optional[int], upto: int) -> Optional[List[Tuple[str, Any, Any]]]:
+        """События поколений (since, upto]; None - нужен reload"""
+        with self._lock:
+            if since is None or not self._log or self._log[0][0] > since + 1:
+                return None
+            result: List[Tuple[str, Any, Any]] = []
+            for generation, events in self._log:
+                if since < generation <= upto:
+                    if events is None:
+                        return None
+                    result.extend(events)
+            return result
+
+    def close(self) -> None:
+        for block in (self.block, self.control):
+            if block is not None:
+                block.close()
+                block.unlink()
+        self.block = None
+
+
+class SnapshotServer:
+    """Мастер: принимает воркеров на Unix сокете, по потоку на соединение"""
+
+    def __init__(self, address: str, key: bytes):
+        self.address = address
+        self.key = key
+        self._publishers: Dict[str, _Publisher] = {}
+        self._lock = threading.Lock()
+        self._listener: Optional[Listener] = None
+
+    def publisher(self, path: str) -> _Publisher:
+        with self._lock:
+            publisher = self._publishers.get(path)
+            if publisher is None:
+                publisher = self._publishers[path] = _Publisher(path)
+            return publisher
+
+    def serve_forever(self) -> None:
+        self._listener = Listener(self.address, family="AF_UNIX", authkey=self.key)
+        threading.Thread(target=self._poll, daemon=True).start()
+        try:
+            while True:
+                try:
+                    conn = self._listener.accept()
+                except (OSError, EOFError):
+                    if self._listener is None:
+                        return
+                    continue  # Клиент без ключа или оборвался при рукопожатии
+                threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        listener, self._listener = self._listener, None
+        if listener is not None:
+            listener.close()
+        flush_all()
+        with self._lock:
+            for publisher in self._publishers.values():
+                publisher.close()
+            self._publishers.clear()
+
+    def _poll(self) -> None:
+        """Изменения файлов в обход мастера (правка вручную, старый воркер)"""
+        while self._listener is not None:
+            time.sleep(POLL_INTERVAL)
+            with self._lock:
+                publishers = list(self._publishers.values())
+            for publisher in publishers:
+                publisher.store.refresh()
+                if publisher.store.revision != publisher.revision:
+                    with publisher.store.transaction():
+                        publisher.publish()
+
+    def _serve(self, conn) -> None:
+        # Транзакции этого соединения: path -> (глубина, контекст transaction())
+        transactions: Dict[str, Tuple[int, Any]] = {}
+        try:
+            while True:
+                try:
+                    message = conn.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    reply = ("ok", self._handle(transactions, *message))
+                except VersionConflict as e:
+                    reply = ("version", e.current)
+                except ArchivedShift as e:
+                    reply = ("archived", e.shift_id)
+                except Exception as e:
+                    reply = ("error", type(e).__name__, str(e))
+                conn.send(reply)
+        finally:
+            # Воркер умер посреди транзакции: блокировку нужно отпустить
+            for depth, context in transactions.values():
+                context.__exit__(None, None, None)
+            conn.close()
+
+    def _handle(self, transactions, op: str, path: str, *args):
+        publisher = self.publisher(path)
+        store = publisher.store
+        if op == "open":
+            return publisher.control.name
+        if op == "events":
+            return publisher.events(*args)
+        if op == "publish":
+            with store.transaction():
+                publisher.publish()
+            return None
+        if op == "begin":
+            depth, context = transactions.get(path, (0, None))
+            if context is None:
+                context = store.transaction()
+                context.__enter__()
+            transactions[path] = (depth + 1, context)
+            return None
+        if op == "end":
+            depth, context = transactions.pop(path)
+            if depth > 1:
+                transactions[path] = (depth - 1, context)
+                return None
+            try:
+                publisher.publish()
+            finally:
+                context.__exit__(None, None, None)
+            return None
+        if op == "call":
+            method, call_args = args
+            if method not in WRITE_METHODS:
+                raise ValueError(f"Unknown store method: {method}")
+            with store.transaction():
+                result = getattr(store, method)(*call_args)
+                if path not in transactions:
+                    publisher.publish()
+            return result
+        raise ValueError(f"Unknown request: {op}")
+
+
+class Master:
+    """Процесс мастера, запущенный start_master()"""
+
+    def __init__(self, process: subprocess.Popen, address: str, key: str):
+        self.process = process
+        self.address = address
+        self.key = key
+
+    def environ(self) -> Dict[str, str]:
+        """Переменные, по которым воркеры находят мастера"""
+        return {SOCKET_ENV: self.address, KEY_ENV: self.key}
+
+    def stop(self, timeout: float = 10.0) -> None:
+        if self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        try:
+            os.unlink(self.address)
+            os.rmdir(os.path.dirname(self.address))
+        except OSError:
+            pass
+
+
+def start_master() -> Master:
+    """Запускает мастер снимков и ждёт, пока он начнёт принимать воркеров"""
+    address = os.path.join(tempfile.mkdtemp(prefix="myshift-"), "snapshot.sock")
+    key = secrets.token_hex(16)
+    env = dict(os.environ, **{SOCKET_ENV: address, KEY_ENV: key})
+    process = subprocess.Popen([sys.executable, os.path.abspath(__file__)], env=env)
+    master = Master(process, address, key)
+    deadline = time.monotonic() + START_TIMEOUT
+    while not os.path.exists(address):
+        if process.poll() is not None or time.monotonic() > deadline:
+            master.stop()
+            raise RuntimeError("Snapshot master did not start")
+        time.sleep(0.02)
+    return master
+
+
+# ВОРКЕР
+
+_ERRORS = {"ValueError": ValueError, "KeyError": KeyError, "TypeError": TypeError}
+
+
+class SnapshotClient:
+    """Соединения воркера с мастером: по одному на поток"""
+
+    def __init__(self, address: str, key: str):
+        self.address = address
+        self.key = bytes.fromhex(key)
+        self._local = threading.local()
+
+    def request(self, *message):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = Client(self.address, family="AF_UNIX", authkey=self.key)
+        try:
+            conn.send(message)
+            status, *payload = conn.recv()
+        except (OSError, EOFError):
+            self._local.conn = None
+            conn.close()
+            raise
+        if status == "ok":
+            return payload[0]
+        if status == "version":
+            raise VersionConflict(payload[0])
+        if status == "archived":
+            raise ArchivedShift(payload[0])
+        name, text = payload
+        raise _ERRORS.get(name, RuntimeError)(text)
+
+
+class SharedShiftStore:
+    """Смены магазина в воркере: чтения из общей памяти, записи через мастера.
+
+    Интерфейс ShiftStore; AsyncShiftRepository по атрибуту shared не
+    строит поверх него свой снимок.
+    """
+
+    shared = True
+
+    def __init__(self, path: str, client: SnapshotClient):
+        self.path = path
+        self.archive = Archive(path + '.archive')
+        # Журнал изменений дописывает ShiftStore мастера
+        self.change_journal = ChangeJournal(path + '.changes')
+        self._client = client
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        self._listeners: List[Callable[[str, Any, Any], None]] = []
+        self._control = _attach(client.request("open", path))
+        self._generation: Optional[int] = None
+        self._snapshot: Optional[Snapshot] = None
+        self._sync()
+
+    @property
+    def generation(self) -> Optional[int]:
+        return self._generation
+
+    def add_listener(self, listener: Callable[[str, Any, Any], None]) -> None:
+        self._listeners.append(listener)
+
+    def _notify(self, kind: str, old, new):
+        for listener in self._listeners:
+            listener(kind, old, new)
+
+    # СНИМОК
+
+    def _sync(self) -> None:
+        """Переход на последнее поколение мастера и события подписчикам"""
+        with self._lock:
+            while True:
+                generation, name = _read_control(self._control.buf)
+                if generation == self._generation:
+                    return
+                try:
+                    block = _attach(name)
+                    break
+                except FileNotFoundError:
+                    continue  # Блок уже заменён следующим поколением
+            events = self._client.request("events", self.path, self._generation, generation)
+            # Месяцы, ушедшие из рабочего окна, к этому моменту уже лежат в архиве
+            self.archive.refresh()
+            self._snapshot, self._generation = Snapshot(block), generation
+            if events is None:
+                self._notify("reload", None, None)
+            else:
+                for event in events:
+                    self._notify(*event)
+
+    def _view(self) -> Snapshot:
+        if getattr(self._local, "dirty", False):
+            # Свои записи в открытой транзакции ещё не опубликованы
+            self._local.dirty = False
+            self._client.request("publish", self.path)
+        generation, _ = _read_control(self._control.buf)
+        metrics.cache_access("shared_snapshot", generation == self._generation)
+        if generation != self._generation:
+            self._sync()
+        return self._snapshot
+
+    # ЧТЕНИЕ
+
+    def refresh(self) -> None:
+        self._view()
+
+    def all(self) -> List[Dict[str, Any]]:
+        view = self._view()
+        records = self.archive.records() + view.records() + view.irregular
+        return [record.to_dict() for record in records]
+
+    def count(self) -> int:
+        return self._view().count() + self.archive.count()
+
+    def get(self, shift_id: int) -> Optional[Dict[str, Any]]:
+        record = self._view().get(shift_id)
+        if record is None:
+            record = self.archive.get(shift_id)
+        return record.to_dict() if record is not None else None
+
+    def is_archived(self, shift_id: int) -> bool:
+        return self._view().get(shift_id) is None and self.archive.get(shift_id) is not None
+
+    def _day_records(self, date) -> List[ShiftRecord]:
+        view = self._view()
+        key = ShiftStore._date_key(date)
+        records = [record for record in view.irregular if record.date_key == key]
+        if isinstance(key, int):
+            records = self.archive.records(key, key) + view.records(key, key) + records
+        return records
+
+    def by_date(self, date: str) -> List[Dict[str, Any]]:
+        return [record.to_dict() for record in self._day_records(date)]
+
+    def by_employee(self, employee: str, date: str) -> List[Dict[str, Any]]:
+        employee_key = employees.find(employee) if isinstance(employee, str) else ("raw", employee)
+        return [record.to_dict() for record in self._day_records(date)
+                if ShiftStore._employee_key(record) == employee_key]
+
+    def _period_records(self, date_from: Optional[str], date_to: Optional[str]) -> List[ShiftRecord]:
+        lo_day, hi_day = day_number(date_from), day_number(date_to)
+        view = self._view()
+        archived = self.archive.records(lo_day, hi_day)
+        current = view.records(lo_day, hi_day)
+        current.extend(record for record in view.irregular if record.day is not None and
+                       (lo_day is None or record.day >= lo_day) and (hi_day is None or record.day <= hi_day))
+        records = archived + current
+        if any(a.day > b.day for a, b in zip(records, records[1:])):
+            records.sort(key=lambda record: record.day)
+        return records
+
+    def date_range(self, date_from: Optional[str] = None, date_to: Optional[str] = None) -> List[Dict[str, Any]]:
+        return [record.to_dict() for record in self._period_records(date_from, date_to)]
+
+    def spans(self, date_from: Optional[str] = None,
+              date_to: Optional[str] = None) -> List[Tuple[str, Optional[str], Any, Any]]:
+        return [(
+            day_text(record.day),
+            roles.value(record.role) if record.role is not None else None,
+            record.start if record.start is not None else ShiftStore._raw_time(record, "start_time"),
+            record.end if record.end is not None else ShiftStore._raw_time(record, "end_time"),
+        ) for record in self._period_records(date_from, date_to)]
+
+    def columns(self, date_from: Optional[str] = None, date_to: Optional[str] = None) -> ShiftColumns:
+        lo_day, hi_day = day_number(date_from), day_number(date_to)
+        view = self._view()
+        columns = self.archive.columns(lo_day, hi_day)
+        columns.extend(view.columns(lo_day, hi_day))
+        columns.extend(ShiftColumns.from_records([
+            record for record in view.irregular if record.day is not None and
+            (lo_day is None or record.day >= lo_day) and (hi_day is None or record.day <= hi_day)]))
+        return columns
+
+    def iter_shifts(self, after_id: Optional[int] = None, limit: Optional[int] = None,
+                    chunk_size: int = 500) -> Iterator[Dict[str, Any]]:
+        cursor = after_id
+        remaining = limit
+        while remaining is None or remaining > 0:
+            size = chunk_size if remaining is None else min(chunk_size, remaining)
+            view = self._view()
+            records = view.records_after(cursor, size) + self.archive.records_after(cursor, size)
+            records.extend(record for record in view.irregular
+                           if isinstance(record.id, int) and not isinstance(record.id, bool)
+                           and (cursor is None or record.id > cursor))
+            records.sort(key=lambda record: record.id)
+            chunk = [record.to_dict() for record in records[:size]]
+            if not chunk:
+                return
+            yield from chunk
+            cursor = chunk[-1]["id"]
+            if remaining is not None:
+                remaining -= len(chunk)
+
+    # ИЗМЕНЕНИЕ (выполняет мастер)
+
+    @contextmanager
+    def transaction(self):
+        depth = getattr(self._local, "depth", 0)
+        self._client.request("begin", self.path)
+        self._local.depth = depth + 1
+        try:
+            if depth == 0:
+                # Мастер держит блокировку: снимок больше не поменяется чужими записями
+                self._sync()
+            yield self
+        finally:
+            self._local.depth = depth
+            self._client.request("end", self.path)
+            if depth == 0:
+                self._local.dirty = False
+                self._sync()
+
+    def _call(self, method: str, *args):
+        try:
+            return self._client.request("call", self.path, method, args)
+        finally:
+            if getattr(self._local, "depth", 0):
+                self._local.dirty = True
+            else:
+                self._sync()
+
+    def create(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        return self._call("create", data)
+
+    def create_many(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return self._call("create_many", items)
+
+    def update(self, shift_id: int, changes: Dict[str, Any],
+               expected_version: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        return self._call("update", shift_id, changes, expected_version)
+
+    def replace_all(self, shifts: List[Dict[str, Any]]) -> None:
+        return self._call("replace_all", shifts)
+
+    def delete(self, shift_id: int) -> bool:
+        return self._call("delete", shift_id)
+
+    def flush(self) -> bool:
+        return self._client.request("call", self.path, "flush", ())
+
+
+_client: Optional[SnapshotClient] = None
+_shared_stores: Dict[str, SharedShiftStore] = {}
+_shared_lock = threading.Lock()
+
+
+def enabled() -> bool:
+    """Процесс - воркер с мастером снимков (переменные из gunicorn.conf.py)"""
+    return SOCKET_ENV in os.environ
+
+
+def get_shared_store(path: str) -> SharedShiftStore:
+    global _client
+    path = os.path.abspath(path)
+    store = _shared_stores.get(path)
+    if store is None:
+        with _shared_lock:
+            if _client is None:
+                _client = SnapshotClient(os.environ[SOCKET_ENV], os.environ[KEY_ENV])
+            store = _shared_stores.get(path)
+            if store is None:
+                store = _shared_stores[path] = SharedShiftStore(path, _client)
+    return store
+
+
+def main() -> None:
+    import signal
+    # SIGTERM от gunicorn: выйти через finally, сохранив смены и удалив блоки
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    SnapshotServer(os.environ[SOCKET_ENV], bytes.fromhex(os.environ[KEY_ENV])).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
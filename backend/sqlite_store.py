@@ -0,0 +1,367 @@
+import argparse
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import List, Dict, Any, Callable, Iterator, Optional
+from shift_store import VersionConflict
+import codec
+import metrics
+
+# Поля смены, которые хранятся в отдельных колонках. Остальные - в extra (JSON)
+SHIFT_COLUMNS = ("date", "start_time", "end_time", "employee", "role")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS shifts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    date TEXT,
+    start_time TEXT,
+    end_time TEXT,
+    employee TEXT,
+    role TEXT,
+    version INTEGER NOT NULL DEFAULT 1,
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_shifts_date ON shifts(date);
+CREATE INDEX IF NOT EXISTS idx_shifts_employee_date ON shifts(employee, date);
+CREATE INDEX IF NOT EXISTS idx_shifts_role_date ON shifts(role, date);
+
+-- Счётчик зафиксированных изменений: по нему процессы замечают чужие записи
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('generation', 0);
+
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT UNIQUE,
+    role TEXT,
+    data TEXT NOT NULL
+);
+"""
+
+
+def _row_to_shift(row) -> Dict[str, Any]:
+    shift = {"id": row[0]}
+    for key, value in zip(SHIFT_COLUMNS, row[1:6]):
+        shift[key] = value
+    if row[7]:
+        shift.update(codec.loads(row[7]))
+    shift["version"] = row[6]
+    return shift
+
+
+def _shift_params(shift: Dict[str, Any]) -> tuple:
+    """Параметры строки: значения колонок и JSON с остальными полями"""
+    extra = {k: v for k, v in shift.items() if k not in ("id", "version") and k not in SHIFT_COLUMNS}
+    return (*[shift.get(key) for key in SHIFT_COLUMNS],
+            codec.dumps(extra).decode('utf-8') if extra else None)
+
+
+class SqliteShiftStore:
+    """Хранилище смен и пользователей в SQLite (режим WAL).
+
+    Повторяет интерфейс ShiftStore, но каждое изменение - это отдельный
+    INSERT/UPDATE/DELETE, поэтому несколько процессов могут писать в одну базу.
+    ID выдаёт AUTOINCREMENT, конфликты версий проверяются внутри BEGIN IMMEDIATE.
+
+    Каждая пишущая транзакция увеличивает meta.generation. Если счётчик
+    ушёл дальше, чем насчитал этот процесс, значит писал кто-то ещё, и
+    подписчики получают "reload".
+    """
+
+    SELECT = "SELECT id, date, start_time, end_time, employee, role, version, extra FROM shifts"
+    UPSERT = ("INSERT OR REPLACE INTO shifts (id, date, start_time, end_time, employee, role, extra, version) "
+              "VALUES (?, ?, ?, ?, ?, ?, ?, ?)")
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._listeners: List[Callable[[str, Any, Any], None]] = []
+        self._generation_lock = threading.Lock()
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(shifts)")]
+        if "version" not in columns:
+            # База, созданная до появления версий смен
+            conn.execute("ALTER TABLE shifts ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+        self._generation = self._read_generation()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.depth = 0
+            self._local.events = []
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        """Транзакция BEGIN IMMEDIATE; вложенные вызовы входят во внешнюю"""
+        conn = self._connect()
+        if self._local.depth == 0:
+            conn.execute("BEGIN IMMEDIATE")
+            self._local.events = []
+        self._local.depth += 1
+        try:
+            yield self
+        except BaseException:
+            self._local.depth -= 1
+            if self._local.depth == 0:
+                conn.execute("ROLLBACK")
+                self._local.events = []
+            raise
+        self._local.depth -= 1
+        if self._local.depth == 0:
+            events = self._local.events
+            self._local.events = []
+            with metrics.phase("storage_write"):
+                if not events:
+                    conn.execute("COMMIT")
+                    return
+                conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'generation'")
+                generation = self._read_generation()
+                conn.execute("COMMIT")
+            with self._generation_lock:
+                if generation - 1 != self._generation:
+                    events = [("reload", None, None)]
+                self._generation = generation
+                for event in events:
+                    self._notify(*event)
+
+    def _read_generation(self) -> int:
+        row = self._connect().execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()
+        return row[0]
+
+    # ПОДПИСЧИКИ
+
+    def add_listener(self, listener: Callable[[str, Any, Any], None]) -> None:
+        """Подписка на изменения: listener(kind, old, new), как у ShiftStore.
+
+        События отправляются после COMMIT.
+        """
+        self._listeners.append(listener)
+
+    def _notify(self, kind: str, old, new):
+        for listener in self._listeners:
+            listener(kind, old, new)
+
+    def _emit(self, kind: str, old, new):
+        """Откладывает событие до фиксации текущей транзакции"""
+        self._local.events.append((kind, old, new))
+
+    def _query(self, sql: str, params=()) -> List[Dict[str, Any]]:
+        with metrics.phase("storage_read"):
+            return [_row_to_shift(row) for row in self._connect().execute(sql, params)]
+
+    # ЧТЕНИЕ
+
+    def refresh(self) -> None:
+        """Замечает записи других процессов по meta.generation"""
+        generation = self._read_generation()
+        with self._generation_lock:
+            if generation != self._generation:
+                self._generation = generation
+                self._notify("reload", None, None)
+
+    def all(self) -> List[Dict[str, Any]]:
+        return self._query(self.SELECT + " ORDER BY id")
+
+    def count(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM shifts").fetchone()[0]
+
+    def get(self, shift_id: int) -> Optional[Dict[str, Any]]:
+        rows = self._query(self.SELECT + " WHERE id = ?", (shift_id,))
+        return rows[0] if rows else None
+
+    def by_date(self, date: str) -> List[Dict[str, Any]]:
+        return self._query(self.SELECT + " WHERE date = ? ORDER BY id", (date,))
+
+    def by_employee(self, employee: str, date: str) -> List[Dict[str, Any]]:
+        return self._query(self.SELECT + " WHERE employee = ? AND date = ? ORDER BY id", (employee, date))
+
+    def date_range(self, date_from: Optional[str] = None, date_to: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Смены с date_from по date_to включительно (границы необязательны)"""
+        return self._query(
+            self.SELECT + " WHERE date >= ? AND date <= ? ORDER BY date, id",
+            (date_from or "0000-00-00", date_to or "9999-99-99"),
+        )
+
+    def iter_shifts(self, after_id: Optional[int] = None, limit: Optional[int] = None,
+                    chunk_size: int = 500) -> Iterator[Dict[str, Any]]:
+        """Смены по возрастанию ID, начиная после after_id (порциями по chunk_size)"""
+        cursor = after_id if after_id is not None else -1
+        remaining = limit
+        while remaining is None or remaining > 0:
+            size = chunk_size if remaining is None else min(chunk_size, remaining)
+            chunk = self._query(self.SELECT + " WHERE id > ? ORDER BY id LIMIT ?", (cursor, size))
+            if not chunk:
+                return
+            yield from chunk
+            cursor = chunk[-1]["id"]
+            if remaining is not None:
+                remaining -= len(chunk)
+
+    # ИЗМЕНЕНИЕ
+
+    def create(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Добавляет смену с новым ID и возвращает её"""
+        return self.create_many([data])[0]
+
+    def create_many(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Добавляет смены одной транзакцией, назначая им новые ID"""
+        created = []
+        with self.transaction():
+            conn = self._connect()
+            for data in items:
+                cursor = conn.execute(
+                    "INSERT INTO shifts (date, start_time, end_time, employee, role, extra) VALUES (?, ?, ?, ?, ?, ?)",
+                    _shift_params(data),
+                )
+                shift = {"id": cursor.lastrowid, **{k: v for k, v in data.items() if k not in ("id", "version")}}
+                shift["version"] = 1
+                self._emit("create", None, shift)
+                created.append(shift)
+        return created
+
+    def update(self, shift_id: int, changes: Dict[str, Any],
+               expected_version: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """Обновляет поля смены (None-значения пропускаются).
+
+        Если передан expected_version и он не совпадает с текущей версией
+        смены, бросает VersionConflict.
+        """
+        with self.transaction():
+            old = self.get(shift_id)
+            if old is None:
+                return None
+            if expected_version is not None and expected_version != old["version"]:
+                raise VersionConflict(old)
+
+            shift = dict(old)
+            for key, value in changes.items():
+                if value is not None and key not in ("id", "version"):
+                    shift[key] = value
+            shift["version"] += 1
+            self._connect().execute(
+                "UPDATE shifts SET date = ?, start_time = ?, end_time = ?, employee = ?, role = ?, extra = ?, "
+                "version = ? WHERE id = ?",
+                (*_shift_params(shift), shift["version"], shift_id),
+            )
+            self._emit("update", old, shift)
+        return shift
+
+    def delete(self, shift_id: int) -> bool:
+        with self.transaction():
+            shift = self.get(shift_id)
+            if shift is None:
+                return False
+            self._connect().execute("DELETE FROM shifts WHERE id = ?", (shift_id,))
+            self._emit("delete", shift, None)
+        return True
+
+    def replace_all(self, shifts: List[Dict[str, Any]]) -> None:
+        """Приводит таблицу к переданному списку, меняя только отличающиеся строки"""
+        wanted = {s.get("id"): s for s in shifts}
+        with self.transaction():
+            conn = self._connect()
+            current = {s["id"]: s for s in self.all()}
+            conn.executemany(
+                "DELETE FROM shifts WHERE id = ?",
+                [(shift_id,) for shift_id in current if shift_id not in wanted],
+            )
+            conn.executemany(
+                self.UPSERT,
+                [(shift_id, *_shift_params(s), s.get("version", 1))
+                 for shift_id, s in wanted.items() if current.get(shift_id) != s],
+            )
+            self._emit("reload", None, None)
+
+    def flush(self) -> bool:
+        # Каждое изменение уже зафиксировано своей транзакцией
+        return True
+
+    # ПОЛЬЗОВАТЕЛИ
+
+    def get_users(self) -> List[Dict[str, Any]]:
+        rows = self._connect().execute("SELECT data FROM users ORDER BY id")
+        return [codec.loads(row[0]) for row in rows]
+
+    def get_user_by_username(self, username: str) -> Optional[Dict[str, Any]]:
+        row = self._connect().execute("SELECT data FROM users WHERE username = ?", (username,)).fetchone()
+        return codec.loads(row[0]) if row else None
+
+    def add_user(self, user: Dict[str, Any]) -> Dict[str, Any]:
+        """Добавляет пользователя, назначая ему новый ID"""
+        with self.transaction():
+            conn = self._connect()
+            cursor = conn.execute(
+                "INSERT INTO users (username, role, data) VALUES (?, ?, '{}')",
+                (user.get("username"), user.get("role")),
+            )
+            user = {"id": cursor.lastrowid, **{k: v for k, v in user.items() if k != "id"}}
+            conn.execute("UPDATE users SET data = ? WHERE id = ?",
+                         (codec.dumps(user).decode('utf-8'), user["id"]))
+        return user
+
+    def save_users(self, users: List[Dict[str, Any]]) -> None:
+        ids = {u.get("id") for u in users}
+        with self.transaction():
+            conn = self._connect()
+            conn.executemany(
+                "DELETE FROM users WHERE id = ?",
+                [row for row in conn.execute("SELECT id FROM users") if row[0] not in ids],
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO users (id, username, role, data) VALUES (?, ?, ?, ?)",
+                [(u.get("id"), u.get("username"), u.get("role"), codec.dumps(u).decode('utf-8'))
+                 for u in users],
+            )
+
+
+_stores: Dict[str, SqliteShiftStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_sqlite_store(path: str) -> SqliteShiftStore:
+    """Возвращает общий для процесса экземпляр хранилища для базы"""
+    key = os.path.abspath(path)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = SqliteShiftStore(path)
+        return store
+
+
+def migrate(shifts_file: str, users_file: str, db_file: str, force: bool = False) -> Dict[str, int]:
+    """Одноразовый перенос shifts.json/users.json в SQLite"""
+    store = SqliteShiftStore(db_file)
+    if not force and (store.count() or store.get_users()):
+        raise RuntimeError(f"База {db_file} уже содержит данные, используйте --force")
+
+    def load(path):
+        if not os.path.exists(path):
+            return []
+        return codec.read_file(path)
+
+    shifts = load(shifts_file)
+    users = load(users_file)
+    store.replace_all(shifts)
+    store.save_users(users)
+    return {"shifts": len(shifts), "users": len(users)}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Перенос JSON файлов в SQLite")
+    parser.add_argument('--shifts', default='shifts.json')
+    parser.add_argument('--users', default='users.json')
+    parser.add_argument('--db', default='myshift.sqlite3')
+    parser.add_argument('--force', action='store_true', help="перезаписать непустую базу")
+    args = parser.parse_args()
+
+    result = migrate(args.shifts, args.users, args.db, force=args.force)
+    print(f"Перенесено смен: {result['shifts']}, пользователей: {result['users']}")
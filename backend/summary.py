@@ -0,0 +1,180 @@
+"""Сводка месяца для календаря: смены, часы по ролям и покрытие по дням.
+
+MonthSummary хранит для каждого загруженного месяца готовые итоги дней
+(число смен, число смен и минуты по ролям) и обновляет их событиями
+хранилища: создание, правка и удаление смены меняют только строку её
+дня. Ответ на запрос месяца собирается за O(дней) и весит несколько КБ
+вместо всех смен месяца.
+
+Часы считаются по полной длительности смены, смена через полночь
+относится к дню начала. Вердикт покрытия берётся из CoverageCache,
+который так же поддерживается событиями.
+"""
+import calendar
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
+
+import metrics
+from coverage_engine import parse_minutes, get_coverage_cache, MINUTES_PER_DAY
+
+
+def parse_month(value: str) -> Tuple[int, int]:
+    """"2025-11" -> (2025, 11); ValueError при неверном формате"""
+    year, month = value.split('-')
+    if len(year) != 4 or len(month) != 2:
+        raise ValueError(f"Month must be YYYY-MM: {value}")
+    year, month = int(year), int(month)
+    if not 1 <= month <= 12:
+        raise ValueError(f"Month must be YYYY-MM: {value}")
+    return year, month
+
+
+def month_dates(month: str) -> List[str]:
+    year, number = parse_month(month)
+    days = calendar.monthrange(year, number)[1]
+    return [f"{year:04d}-{number:02d}-{day:02d}" for day in range(1, days + 1)]
+
+
+def shift_minutes(start, end) -> int:
+    """Длительность смены в минутах; 0, если время не разобрать"""
+    start = parse_minutes(start) if isinstance(start, str) else start
+    end = parse_minutes(end) if isinstance(end, str) else end
+    if start is None or end is None:
+        return 0
+    return end - start if end > start else end + MINUTES_PER_DAY - start
+
+
+class _DaySummary:
+    __slots__ = ("shift_count", "roles")
+
+    def __init__(self):
+        self.shift_count = 0
+        # role -> [число смен, минуты]
+        self.roles: Dict[Optional[str], List[int]] = {}
+
+    def add(self, role, minutes: int, delta: int):
+        self.shift_count += delta
+        totals = self.roles.setdefault(role, [0, 0])
+        totals[0] += delta
+        totals[1] += delta * minutes
+        if totals[0] == 0:
+            del self.roles[role]
+
+
+def _role_totals(roles: Dict[Optional[str], List[int]]) -> Dict[str, Dict[str, Any]]:
+    return {
+        role: {"shifts": count, "hours": round(minutes / 60, 2)}
+        for role, (count, minutes) in sorted(roles.items(), key=lambda item: str(item[0]))
+        if role is not None
+    }
+
+
+class MonthSummary:
+    """Материализованные итоги дней по месяцам.
+
+    Месяц считается целиком при первом запросе, дальше поддерживается
+    событиями хранилища. Перезагрузка хранилища очищает всё. Хранится не
+    больше max_months месяцев, самые давние по обращению вытесняются.
+    """
+
+    def __init__(self, store, rules: Dict[str, List[Dict[str, Any]]], max_months: int = 36):
+        self.store = store
+        self.rules = rules
+        self.max_months = max_months
+        self._months: "OrderedDict[str, Dict[str, _DaySummary]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Как в CoverageCache: расчёт месяца, начатый до события, не сохраняется
+        self._epoch = 0
+        store.add_listener(self._on_change)
+
+    def _on_change(self, kind, old, new):
+        with self._lock:
+            self._epoch += 1
+            if kind == "reload":
+                self._months.clear()
+                return
+            if old is not None:
+                self._apply(old, -1)
+            if new is not None:
+                self._apply(new, +1)
+
+    def _apply(self, shift, delta):
+        date = shift.get("date")
+        days = self._months.get(date[:7]) if isinstance(date, str) else None
+        if days is None:
+            return
+        day = days.get(date)
+        if day is None:
+            return
+        day.add(shift.get("role"), shift_minutes(shift.get("start_time"), shift.get("end_time")), delta)
+
+    def _fill(self, month: str, dates: List[str]) -> Dict[str, _DaySummary]:
+        with self._lock:
+            epoch = self._epoch
+        days = {date: _DaySummary() for date in dates}
+        spans = getattr(self.store, "spans", None)
+        if spans is not None:
+            rows = spans(dates[0], dates[-1])
+        else:
+            rows = [(s.get("date"), s.get("role"), s.get("start_time"), s.get("end_time"))
+                    for s in self.store.date_range(dates[0], dates[-1])]
+        for date, role, start, end in rows:
+            day = days.get(date)
+            if day is not None:
+                day.add(role, shift_minutes(start, end), +1)
+        with self._lock:
+            if epoch == self._epoch:
+                self._months[month] = days
+                while len(self._months) > self.max_months:
+                    self._months.popitem(last=False)
+        return days
+
+    def report(self, month: str) -> Dict[str, Any]:
+        """Итоги месяца "YYYY-MM" по дням и в целом"""
+        dates = month_dates(month)
+        self.store.refresh()
+        with self._lock:
+            days = self._months.get(month)
+            if days is not None:
+                self._months.move_to_end(month)
+        metrics.cache_access("summary", days is not None)
+        if days is None:
+            days = self._fill(month, dates)
+
+        coverage = get_coverage_cache(self.store, self.rules).report(dates)
+        result = []
+        totals = _DaySummary()
+        with self._lock:
+            for date, verdict in zip(dates, coverage):
+                day = days[date]
+                for role, (count, minutes) in day.roles.items():
+                    totals.shift_count += count
+                    role_totals = totals.roles.setdefault(role, [0, 0])
+                    role_totals[0] += count
+                    role_totals[1] += minutes
+                result.append({
+                    "date": date,
+                    "shift_count": day.shift_count,
+                    "roles": _role_totals(day.roles),
+                    "coverage": verdict["status"],
+                    "issues": verdict["issues"],
+                })
+        return {
+            "month": month,
+            "days": result,
+            "totals": {"shift_count": totals.shift_count, "roles": _role_totals(totals.roles)},
+        }
+
+
+_summaries: Dict[int, MonthSummary] = {}
+_summaries_lock = threading.Lock()
+
+
+def get_month_summary(store, rules: Dict[str, List[Dict[str, Any]]]) -> MonthSummary:
+    """Одна сводка на экземпляр хранилища"""
+    with _summaries_lock:
+        summary = _summaries.get(id(store))
+        if summary is None or summary.store is not store:
+            summary = _summaries[id(store)] = MonthSummary(store, rules)
+        return summary
@@ -1,11 +1,16 @@
 // src/services/api.ts
-import type { Shift } from '../types';
+import type { Shift, ShiftBatchOperation, ShiftBatchResult, ShiftChanges, MonthSummary } from '../types';
 import { isBackendOnline } from '@/utils/healthCheck';
 
 const API_BASE_URL = import.meta.env.PROD 
   ? 'https://kalikrit.pythonanywhere.com'
   : 'https://kalikrit.pythonanywhere.com';
 
+// SSE поток изменений отдаёт FastAPI приложение (backend/main.py). Сборка без
+// VITE_STREAM_URL потока не открывает: изменения подтягивает /shifts/changes
+const STREAM_BASE_URL: string | null =
+  import.meta.env.VITE_STREAM_URL || (import.meta.env.PROD ? null : 'http://localhost:8000');
+
 interface LoginRequest {
   username: string;
   password: string;
@@ -94,6 +99,22 @@ class ApiClient {
     return shifts;
   }
 
+  async getShiftsInRange(startDate: string, endDate: string): Promise<Shift[]> {
+    const params = new URLSearchParams({ from: startDate, to: endDate });
+    return this.request(`/shifts?${params}`);
+  }
+
+  // Итоги дней месяца (число смен, часы по ролям, покрытие) вместо всех смен
+  async getMonthSummary(month: string): Promise<MonthSummary> {
+    return this.request(`/summary/month/${month}`);
+  }
+
+  // Изменения после версии клиента; reset - нужно перечитать смены целиком
+  async getShiftChanges(since?: string): Promise<ShiftChanges> {
+    const params = since ? `?${new URLSearchParams({ since })}` : '';
+    return this.request(`/shifts/changes${params}`);
+  }
+
   async createShift(shift: Omit<Shift, 'id'>): Promise<Shift> {
     return this.request('/shifts', {
       method: 'POST',
@@ -114,12 +135,30 @@ class ApiClient {
     });
   }
 
+  // Несколько изменений одним запросом: применяются все или ни одно
+  async batchShifts(operations: ShiftBatchOperation[]): Promise<{ results: ShiftBatchResult[] }> {
+    return this.request('/shifts/batch', {
+      method: 'POST',
+      body: JSON.stringify({ operations }),
+    });
+  }
+
   async generateOptimalShifts(date: string): Promise<any> {
     return this.request(`/shifts/generate/${date}`, {
       method: 'POST'
     });
   }
 
+  // Поток изменений смен за период; токен в query, т.к. EventSource не шлёт заголовки
+  openShiftStream(startDate?: string, endDate?: string): EventSource | null {
+    const token = localStorage.getItem('token');
+    if (!token || !STREAM_BASE_URL) return null;
+    const params = new URLSearchParams({ token });
+    if (startDate) params.set('from', startDate);
+    if (endDate) params.set('to', endDate);
+    return new EventSource(`${STREAM_BASE_URL}/shifts/stream?${params}`);
+  }
+
   // Добавляем метод для проверки здоровья
   async healthCheck(): Promise<{ status: string }> {
     return this.request('/health');
@@ -1,6 +1,6 @@
 import { defineStore } from 'pinia';
 import { ref } from 'vue';
-import type { Shift } from '../types';
+import type { Shift, ShiftBatchOperation } from '../types';
 import { api } from '@/services/api'
 
 export const useScheduleStore = defineStore('schedule', () => {
@@ -17,7 +17,11 @@ export const useScheduleStore = defineStore('schedule', () => {
   };
 
   // Загружаем смены из API
+  // Что загружено сейчас: дата, период или всё
+  const loadedRange = ref<[string?, string?]>([]);
+
   const loadShifts = async (startDate?: string, endDate?: string): Promise<void> => {
+    loadedRange.value = [startDate, endDate];
     try {
       // Если передана одна дата - загружаем смены за эту дату
       if (startDate && !endDate) {
@@ -25,12 +29,7 @@ export const useScheduleStore = defineStore('schedule', () => {
       }
       // Если передан период - загружаем смены за период
       else if (startDate && endDate) {
-        // TODO: Реализовать загрузку по периоду когда бэкенд поддержит
-        // Пока загружаем все и фильтруем локально
-        const allShifts = await api.getShifts();
-        shifts.value = allShifts.filter(shift => 
-          shift.date >= startDate && shift.date <= endDate
-        );
+        shifts.value = await api.getShiftsInRange(startDate, endDate);
       } else {
         // Загружаем все смены (для MonthView)
         shifts.value = await api.getShifts();
@@ -41,6 +40,113 @@ export const useScheduleStore = defineStore('schedule', () => {
     }
   };
 
+  // Версия данных сервера для дельта-синхронизации
+  const syncVersion = ref<string | null>(null);
+
+  // Подтягивает только изменения с прошлой синхронизации вместо полной загрузки
+  const syncShifts = async (): Promise<void> => {
+    try {
+      const delta = await api.getShiftChanges(syncVersion.value ?? undefined);
+      const firstSync = syncVersion.value === null;
+      syncVersion.value = delta.version;
+      if (firstSync) return;
+      if (delta.reset) {
+        await loadShifts(...loadedRange.value);
+        return;
+      }
+
+      const [start, end] = loadedRange.value;
+      const inRange = (shift: Shift) =>
+        !start || (end ? shift.date >= start && shift.date <= end : shift.date === start);
+
+      for (const change of delta.changes) {
+        const index = shifts.value.findIndex(s => s.id === change.id);
+        if (change.op === 'delete' || !change.shift || !inRange(change.shift)) {
+          if (index !== -1) shifts.value.splice(index, 1);
+        } else if (index !== -1) {
+          shifts.value[index] = change.shift;
+        } else {
+          shifts.value.push(change.shift);
+        }
+      }
+    } catch (error) {
+      console.error('Failed to sync shifts:', error);
+    }
+  };
+
+  // Живые обновления от других менеджеров вместо опроса
+  let eventSource: EventSource | null = null;
+
+  // Дельта-синхронизация догоняет пропущенное: поток есть только у FastAPI
+  // и теряет события, пока переподключается
+  const SYNC_INTERVAL = 30000;
+  let syncTimer: ReturnType<typeof setInterval> | null = null;
+
+  const syncWhenVisible = () => {
+    if (document.visibilityState === 'visible') syncShifts();
+  };
+
+  const upsertShift = (shift: Shift) => {
+    const index = shifts.value.findIndex(s => s.id === shift.id);
+    if (index !== -1) {
+      shifts.value[index] = shift;
+    } else {
+      shifts.value.push(shift);
+    }
+  };
+
+  // Поток один на все виды: у каждого подписчика свой диапазон, поток
+  // открыт на диапазон последнего и закрывается, когда подписчиков не осталось
+  const subscribers = new Map<number, [string?, string?]>();
+  let nextSubscriber = 0;
+
+  const openStream = (startDate?: string, endDate?: string): void => {
+    closeStream();
+    syncShifts();
+    syncTimer = setInterval(syncShifts, SYNC_INTERVAL);
+    document.addEventListener('visibilitychange', syncWhenVisible);
+
+    eventSource = api.openShiftStream(startDate, endDate);
+    if (!eventSource) return;
+
+    eventSource.addEventListener('create', (e) => upsertShift(JSON.parse((e as MessageEvent).data).shift));
+    eventSource.addEventListener('update', (e) => upsertShift(JSON.parse((e as MessageEvent).data).shift));
+    eventSource.addEventListener('generate', (e) => {
+      JSON.parse((e as MessageEvent).data).shifts.forEach(upsertShift);
+    });
+    eventSource.addEventListener('delete', (e) => {
+      const { id } = JSON.parse((e as MessageEvent).data);
+      shifts.value = shifts.value.filter(s => s.id !== id);
+    });
+    // Сервер отключил отстающего клиента: перечитываем данные
+    eventSource.addEventListener('reset', () => loadShifts(...loadedRange.value));
+  };
+
+  const closeStream = (): void => {
+    eventSource?.close();
+    eventSource = null;
+    if (syncTimer !== null) clearInterval(syncTimer);
+    syncTimer = null;
+    document.removeEventListener('visibilitychange', syncWhenVisible);
+  };
+
+  // Возвращает функцию отписки этого подписчика
+  const subscribeToChanges = (startDate?: string, endDate?: string): (() => void) => {
+    const id = nextSubscriber++;
+    subscribers.set(id, [startDate, endDate]);
+    openStream(startDate, endDate);
+
+    return () => {
+      if (!subscribers.delete(id)) return;
+      if (subscribers.size === 0) {
+        closeStream();
+      } else if (![...subscribers.keys()].some(key => key > id)) {
+        // Поток был открыт на диапазон ушедшего подписчика
+        openStream(...[...subscribers.values()].pop()!);
+      }
+    };
+  };
+
   const getShiftsByDate = (date: string): Shift[] => {
     return shifts.value.filter(shift => shift.date === date);
   };
@@ -78,6 +184,71 @@ export const useScheduleStore = defineStore('schedule', () => {
     }
   };
 
+  // Применяет несколько изменений одним запросом и обновляет локальный список
+  const applyBatch = async (operations: ShiftBatchOperation[]): Promise<void> => {
+    if (operations.length === 0) return;
+    try {
+      const { results } = await api.batchShifts(operations);
+      results.forEach((result, i) => {
+        const operation = operations[i];
+        if (operation?.op === 'delete') {
+          shifts.value = shifts.value.filter(s => s.id !== operation.id);
+        } else if (result.shift) {
+          const index = shifts.value.findIndex(s => s.id === result.shift!.id);
+          if (index !== -1) {
+            shifts.value[index] = result.shift;
+          } else {
+            shifts.value.push(result.shift);
+          }
+        }
+      });
+    } catch (error) {
+      console.error('Failed to apply batch:', error);
+      throw error;
+    }
+  };
+
+  // Перетаскивания копятся и уходят одним пакетом после паузы
+  const BATCH_DELAY_MS = 400;
+  const pendingMoves = new Map<number, Shift>();
+  let pendingWaiters: Array<{ resolve: () => void; reject: (error: unknown) => void }> = [];
+  let pendingTimer: ReturnType<typeof setTimeout> | null = null;
+
+  const flushShiftMoves = async (): Promise<void> => {
+    if (pendingTimer) {
+      clearTimeout(pendingTimer);
+      pendingTimer = null;
+    }
+    const operations: ShiftBatchOperation[] = [...pendingMoves.values()].map(shift => ({
+      op: 'update',
+      id: shift.id,
+      changes: { date: shift.date, start_time: shift.start_time, end_time: shift.end_time },
+      version: shift.version,
+    }));
+    const waiters = pendingWaiters;
+    pendingMoves.clear();
+    pendingWaiters = [];
+
+    try {
+      await applyBatch(operations);
+      waiters.forEach(waiter => waiter.resolve());
+    } catch (error) {
+      waiters.forEach(waiter => waiter.reject(error));
+      throw error;
+    }
+  };
+
+  const queueShiftMove = (shift: Shift): Promise<void> => {
+    pendingMoves.set(shift.id, shift);
+    if (pendingTimer) clearTimeout(pendingTimer);
+    pendingTimer = setTimeout(() => {
+      flushShiftMoves().catch(() => {});
+    }, BATCH_DELAY_MS);
+    return new Promise((resolve, reject) => {
+      pendingWaiters.push({ resolve, reject });
+    });
+  };
+
   const generateOptimalShifts = async (date: string): Promise<Shift[]> => {
     try {
       const response = await api.generateOptimalShifts(date);
@@ -94,9 +265,14 @@ export const useScheduleStore = defineStore('schedule', () => {
     loadCoverageRules,
     loadShifts,
     getShiftsByDate,
+    syncShifts,
+    subscribeToChanges,
     createShift,
     updateShift,
     deleteShift,
+    applyBatch,
+    queueShiftMove,
+    flushShiftMoves,
     generateOptimalShifts
   };
 });
\ No newline at end of file
@@ -19,6 +19,47 @@ export interface Shift {
   employee: string;
   role: 'cashier' | 'manager' | 'technician';
   required?: boolean;
+  version?: number; // для защиты от одновременного редактирования (409 Conflict)
+}
+
+// Операция пакетного изменения смен (POST /shifts/batch)
+export type ShiftBatchOperation =
+  | { op: 'create'; shift: Omit<Shift, 'id'> }
+  | { op: 'update'; id: number; changes: Partial<Shift>; version?: number }
+  | { op: 'delete'; id: number; version?: number };
+
+export interface ShiftBatchResult {
+  op: ShiftBatchOperation['op'];
+  status: number;
+  shift?: Shift;
+  id?: number;
+}
+
+// Ответ GET /shifts/changes
+export interface ShiftChanges {
+  version: string;
+  reset: boolean;
+  changes: Array<{ op: 'create' | 'update' | 'delete'; id: number; shift: Shift | null }>;
+}
+
+// Ответ GET /summary/month/{yyyy-mm}: итоги дней для календаря
+export interface RoleSummary {
+  shifts: number;
+  hours: number;
+}
+
+export interface MonthSummaryDay {
+  date: string;
+  shift_count: number;
+  roles: Partial<Record<Shift['role'], RoleSummary>>;
+  coverage: 'good' | 'critical';
+  issues: number;
+}
+
+export interface MonthSummary {
+  month: string; // YYYY-MM
+  days: MonthSummaryDay[];
+  totals: { shift_count: number; roles: Partial<Record<Shift['role'], RoleSummary>> };
 }
 
 // Типы для пользователей
@@ -27,6 +68,7 @@ export interface User {
   username: string;
   role: 'admin' | 'user';
   employee_name: string | null;
+  store?: string;
 }
 
 // Типы для аутентификации